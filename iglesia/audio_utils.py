@@ -1,14 +1,33 @@
+import glob
 import json
+import logging
 import os
-import re
 from collections import defaultdict
 from datetime import datetime, timedelta
-from math import ceil
+from urllib.parse import urlparse
 
 import boto3
-from botocore.exceptions import NoCredentialsError
+from botocore.config import Config
+from botocore.exceptions import ClientError, NoCredentialsError
 
+from iglesia.catalogo import CatalogoEpisodios
 from iglesia.clean_text import extract_clean_text
+from iglesia.http_utils import mapear_en_paralelo
+from iglesia.llm_batch import LoteLLM
+from iglesia.llm_utils import (
+    LLM_MAX_WORKERS,
+    estimar_tokens,
+    extraer_json,
+    llamar_llm_cacheado,
+    nombre_modelo,
+)
+from iglesia.mp3_utils import BYTES_CABECERA_MP3, duracion_mp3
+from iglesia.s3_utils import InventarioS3, leer_inicio, subir_en_partes, url_publica
+from iglesia.tts_utils import a_ssml, split_text
+
+# Cambiar la versión al modificar el prompt invalida la caché de respuestas
+PROMPT_METADATOS_VERSION = "metadatos-episodio-v1"
+CLAVES_METADATOS = ("titulo_spotify", "descripcion_spotify")
 
 # --- Lógica de cálculo de la semana de pontificado ---
 PONTIFICATE_START_DATE = datetime(2025, 5, 8)
@@ -25,19 +44,15 @@ def calculate_pontificate_week(run_date_str):
 
 
 # --- FUNCIÓN 1: Generación de Metadatos con IA ---
-def generar_metadatos_episodio(texto_limpio, episodio_info, llm_client):
-    """
-    Usa un LLM para generar un título dinámico y una descripción para un episodio.
-    """
-    print("🎙️  Generando título y descripción con IA...")
-    try:
-        fecha_dt = datetime.strptime(episodio_info["fecha"], "%Y-%m-%d")
-        fecha_simple = fecha_dt.strftime("%d/%m")
-        numero_formateado = (
-            f"[{episodio_info['pontificate_week']}.{episodio_info['sub_index']}]"
-        )
+def prompt_metadatos_episodio(texto_limpio, episodio_info):
+    """Prompt del LLM para el título y la descripción de un episodio."""
+    fecha_dt = datetime.strptime(episodio_info["fecha"], "%Y-%m-%d")
+    fecha_simple = fecha_dt.strftime("%d/%m")
+    numero_formateado = (
+        f"[{episodio_info['pontificate_week']}.{episodio_info['sub_index']}]"
+    )
 
-        prompt = f"""
+    return f"""
         Eres un experto en comunicación para podcasts religiosos. 
         Basado en el siguiente texto, genera un título y una descripción optimizados para Spotify.
         El formato de salida DEBE ser un JSON válido con las claves "titulo_spotify" y "descripcion_spotify".
@@ -52,12 +67,25 @@ def generar_metadatos_episodio(texto_limpio, episodio_info, llm_client):
         {texto_limpio[:4000]}
         ---
         """
-        respuesta_llm = llm_client.call(prompt)
-        json_match = re.search(r"\{.*\}", respuesta_llm, re.DOTALL)
-        if not json_match:
-            raise ValueError("La respuesta del LLM no contenía un JSON válido.")
 
-        metadata = json.loads(json_match.group(0))
+
+def generar_metadatos_episodio(texto_limpio, episodio_info, llm_client):
+    """
+    Usa un LLM para generar un título dinámico y una descripción para un episodio.
+    """
+    print("🎙️  Generando título y descripción con IA...")
+    try:
+        prompt = prompt_metadatos_episodio(texto_limpio, episodio_info)
+        respuesta_llm = llamar_llm_cacheado(
+            lambda: llm_client.call(prompt),
+            modelo=nombre_modelo(llm_client),
+            version=PROMPT_METADATOS_VERSION,
+            entrada=prompt,
+            tokens=estimar_tokens(prompt),
+            # Un JSON truncado o incompleto no se guarda en la caché
+            validar=lambda r: extraer_json(r, CLAVES_METADATOS),
+        )
+        metadata = extraer_json(respuesta_llm)
         print(f"  -> Título generado: {metadata['titulo_spotify']}")
         return metadata
 
@@ -75,6 +103,55 @@ def generar_metadatos_episodio(texto_limpio, episodio_info, llm_client):
 
 MIN_CHARS_FOR_AUDIO = 750
 
+# Fragmentos de texto que se sintetizan a la vez (límite TPS de Polly)
+POLLY_MAX_WORKERS = int(os.environ.get("POLLY_MAX_WORKERS", "4"))
+# Fragmentos en SSML con pausas entre párrafos (POLLY_SSML=1)
+POLLY_SSML = os.environ.get("POLLY_SSML", "0") == "1"
+# Reintentos adaptativos ante ThrottlingException al sintetizar en paralelo
+POLLY_CONFIG = Config(retries={"max_attempts": 8, "mode": "adaptive"})
+
+
+def sintetizar_fragmento(polly_client, texto, ssml=False):
+    """Audio MP3 de un fragmento de texto (una llamada a Polly)."""
+    response = polly_client.synthesize_speech(
+        Text=a_ssml(texto) if ssml else texto,
+        TextType="ssml" if ssml else "text",
+        LanguageCode="es-ES",
+        OutputFormat="mp3",
+        VoiceId="Raul",
+        Engine="long-form",
+    )
+    return response["AudioStream"].read()
+
+
+def sintetizar_en_streaming(
+    text, polly_client, max_workers=POLLY_MAX_WORKERS, ssml=POLLY_SSML
+):
+    """
+    Genera el audio de los fragmentos del texto (frases y párrafos completos)
+    en orden, sintetizando como mucho 'max_workers' a la vez y adelantando
+    como mucho el doble al consumidor. Un error de Polly se propaga.
+    """
+    return mapear_en_paralelo(
+        lambda fragmento: sintetizar_fragmento(polly_client, fragmento, ssml),
+        split_text(text),
+        max_workers=max_workers,
+        max_pendientes=2 * max_workers,
+    )
+
+
+def synthesize_speech(
+    text, polly_client, max_workers=POLLY_MAX_WORKERS, ssml=POLLY_SSML
+):
+    """Audio completo del texto en memoria. None si falla algún fragmento."""
+    try:
+        return b"".join(
+            sintetizar_en_streaming(text, polly_client, max_workers, ssml)
+        )
+    except Exception as e:
+        print(f"  -> Error con Polly al sintetizar: {e}")
+        return None
+
 
 def sintetizar_y_subir_audio(
     texto_limpio,
@@ -91,70 +168,168 @@ def sintetizar_y_subir_audio(
         )
         return None  # Devuelve None, indicando que no hay audio generado/subido
 
-    def synthesize_speech(text):
-        # ... (código interno de synthesize_speech se mantiene igual)
-        def split_text(t, max_length=3000):
-            return [
-                t[i * max_length : (i + 1) * max_length]
-                for i in range(ceil(len(t) / max_length))
-            ]
-
-        audio_streams = []
-        for chunk in split_text(text):
-            try:
-                response = polly_client.synthesize_speech(
-                    Text=chunk,
-                    LanguageCode="es-ES",
-                    OutputFormat="mp3",
-                    VoiceId="Raul",
-                    Engine="long-form",
-                )
-                audio_streams.append(response["AudioStream"].read())
-            except Exception as e:
-                print(f"  -> Error con Polly al sintetizar: {e}")
-                return None
-        return b"".join(audio_streams)
-
     print("🔊 Generando audio con Polly...")
     filename_mp3 = filename_base + ".mp3"
+    audio = {"url_audio": url_publica(s3_client, bucket_name, filename_mp3)}
 
     if not only_metadata:
-        audio_data = synthesize_speech(texto_limpio)
-        if not audio_data:
-            return None
+        # El audio de cada fragmento se sube a S3 (multiparte) según llega; del
+        # principio se lee el bitrate para calcular la duración
+        cabecera = bytearray()
+
+        def _bloques():
+            for bloque in sintetizar_en_streaming(texto_limpio, polly_client):
+                if len(cabecera) < BYTES_CABECERA_MP3:
+                    cabecera.extend(bloque[: BYTES_CABECERA_MP3 - len(cabecera)])
+                yield bloque
+
         try:
-            print(f"☁️  Subiendo '{filename_mp3}' a S3...")
-            s3_client.put_object(
-                Bucket=bucket_name,
-                Key=filename_mp3,
-                Body=audio_data,
-                ContentType="audio/mpeg",
-            )
+            print(f"☁️  Sintetizando y subiendo '{filename_mp3}' a S3...")
+            tamano = subir_en_partes(s3_client, bucket_name, filename_mp3, _bloques())
         except Exception as e:
-            print(f"❌ Error al subir a S3: {e}")
+            print(f"❌ Error al sintetizar o subir a S3: {e}")
             return None
+        audio["audio_bytes"] = tamano
+        audio["audio_duracion"] = duracion_mp3(bytes(cabecera), tamano)
 
-    region = (
-        s3_client.get_bucket_location(Bucket=bucket_name)["LocationConstraint"]
-        or "us-east-1"
-    )
-    url = f"https://{bucket_name}.s3.{region}.amazonaws.com/{filename_mp3}"
-    print(f"  -> Audio disponible en: {url}")
-    return url
+    print(f"  -> Audio disponible en: {audio['url_audio']}")
+    return audio
+
+
+def datos_audio_existente(s3_client, bucket_name, key, inventario, previo=None):
+    """
+    Tamaño y duración de un audio que ya está en S3: se reutilizan los de
+    'previo' (metadatos de una ejecución anterior) si el tamaño coincide con
+    el del inventario; si no, se lee la cabecera del MP3 (una petición).
+    """
+    tamano = inventario.tamano(key)
+    previo = previo or {}
+    if tamano is None:
+        return {}
+    if previo.get("audio_bytes") == tamano and previo.get("audio_duracion"):
+        return {"audio_bytes": tamano, "audio_duracion": previo["audio_duracion"]}
+    cabecera = leer_inicio(s3_client, bucket_name, key, BYTES_CABECERA_MP3)
+    return {"audio_bytes": tamano, "audio_duracion": duracion_mp3(cabecera, tamano)}
+
+
+def completar_datos_audio(json_base_dir="json-rss", max_workers=8):
+    """
+    Añade 'audio_bytes' y 'audio_duracion' a los episodios de los
+    episodes_metadata.json que no los tienen (episodios anteriores a que se
+    guardaran al subir el audio). Un listado por bucket y una petición con
+    Range por episodio.
+    """
+    s3 = boto3.client("s3")
+    patron = os.path.join(json_base_dir, "**", "episodes_metadata.json")
+    ficheros = {}
+    pendientes = []
+    for ruta in sorted(glob.glob(patron, recursive=True)):
+        with open(ruta, encoding="utf-8") as f:
+            episodios = json.load(f)
+        faltan = [
+            (ruta, e)
+            for e in episodios
+            if e.get("url_audio")
+            and not (e.get("audio_bytes") and e.get("audio_duracion"))
+        ]
+        if faltan:
+            ficheros[ruta] = episodios
+            pendientes.extend(faltan)
+
+    def _bucket_y_clave(episodio):
+        url = urlparse(episodio["url_audio"])
+        return url.netloc.split(".")[0], url.path.lstrip("/")
+
+    buckets = {_bucket_y_clave(e)[0] for _, e in pendientes}
+    inventarios = {b: InventarioS3(s3, b, ruta_cache="") for b in buckets}
+
+    def _completar(pendiente):
+        _, episodio = pendiente
+        bucket, key = _bucket_y_clave(episodio)
+        try:
+            episodio.update(
+                datos_audio_existente(s3, bucket, key, inventarios[bucket])
+            )
+        except ClientError as e:
+            print(f"⚠️ No se pudo leer {key}: {e}")
+
+    print(f"Completando tamaño y duración de {len(pendientes)} episodios...")
+    list(mapear_en_paralelo(_completar, pendientes, max_workers=max_workers))
+
+    catalogo = CatalogoEpisodios(json_base_dir=json_base_dir)
+    for ruta, episodios in ficheros.items():
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(episodios, f, ensure_ascii=False, indent=4)
+        catalogo.registrar(os.path.basename(os.path.dirname(ruta)), episodios)
+    completos = sum(1 for _, e in pendientes if e.get("audio_duracion"))
+    print(f"✅ {completos}/{len(pendientes)} episodios completados.")
+    return completos
 
 
 # --- FUNCIÓN PRINCIPAL ORQUESTADORA ---
+
+# Longitud del texto limpio (en caracteres) para generar un episodio
+MIN_CHARS_EPISODIO = 900
+# Los fragmentos respetan frases, así que por defecto (0 = sin límite) también
+# se sintetizan encíclicas y catequesis largas; MAX_CHARS_EPISODIO limita el
+# coste de Polly si hace falta
+MAX_CHARS_EPISODIO = int(os.environ.get("MAX_CHARS_EPISODIO", "0"))
+
+
+def longitud_valida(texto_limpio) -> bool:
+    if len(texto_limpio) < MIN_CHARS_EPISODIO:
+        return False
+    return not MAX_CHARS_EPISODIO or len(texto_limpio) <= MAX_CHARS_EPISODIO
+
+
+def generar_metadatos_en_lote(episodios, llm_client, nombre_lote):
+    """
+    Genera con la Batch API los metadatos de todos los episodios de una vez.
+    Las respuestas quedan en la caché del LLM, donde las encuentra
+    generar_metadatos_episodio.
+    """
+    prompts = []
+    for episodio in episodios:
+        texto_limpio = extract_clean_text(episodio["texto"])
+        if longitud_valida(texto_limpio):
+            prompts.append(prompt_metadatos_episodio(texto_limpio, episodio))
+    lote = LoteLLM(nombre_lote, llm_client, PROMPT_METADATOS_VERSION)
+    lote.ejecutar(prompts)
+
+
+# Episodios que se sintetizan y suben a la vez (cada uno con POLLY_MAX_WORKERS
+# llamadas a Polly en paralelo)
+EPISODIOS_AUDIO_WORKERS = int(os.environ.get("EPISODIOS_AUDIO_WORKERS", "3"))
+
+
+def mapear_en_etapa(funcion, elementos, max_workers):
+    """
+    Etapa del pipeline de episodios: aplica 'funcion' en paralelo a los
+    elementos que llegan de la etapa anterior, en orden y con como mucho
+    2 * max_workers resultados en cola. Cada resultado pasa a la etapa
+    siguiente en cuanto está listo, aunque la ventana no se haya llenado
+    (semanas con pocos episodios). Los descartados (None) pasan sin más.
+    """
+    return mapear_en_paralelo(
+        lambda elemento: None if elemento is None else funcion(elemento),
+        elementos,
+        max_workers=max_workers,
+        max_pendientes=2 * max_workers,
+    )
+
+
 def procesar_y_generar_episodios(
     json_file_path,
     llm_client,
     only_metadata=False,
     force_create_audio=False,
     index_files: list = None,
+    modo_batch: bool = False,
 ):
     print("Iniciando proceso de generación de episodios...")
     try:
         S3_BUCKET_NAME = os.environ["S3_BUCKET_NAME"]
-        polly = boto3.client("polly", region_name="us-east-1")
+        polly = boto3.client("polly", region_name="us-east-1", config=POLLY_CONFIG)
         s3 = boto3.client("s3")
     except (KeyError, NoCredentialsError) as e:
         print(f"❌ Error de configuración de AWS: {e}")
@@ -177,7 +352,6 @@ def procesar_y_generar_episodios(
         for i, episodio in enumerate(episodios_por_semana[semana]):
             episodio["sub_index"] = i + 1
 
-    episodios_procesados = []
     todos_los_episodios = [
         ep for semana in episodios_por_semana.values() for ep in semana
     ]
@@ -190,86 +364,115 @@ def procesar_y_generar_episodios(
             ep for i, ep in enumerate(todos_los_episodios) if i in index_files
         ]
 
-    for episodio in todos_los_episodios:
+    # Con modo_batch los metadatos se piden todos juntos a la Batch API
+    if modo_batch:
+        nombre_lote = "episodios_" + os.path.basename(os.path.dirname(json_file_path))
+        generar_metadatos_en_lote(todos_los_episodios, llm_client, nombre_lote)
+
+    # Un solo listado de S3 para todos los episodios en vez de un head_object
+    # por episodio
+    prefijo = os.path.commonprefix([ep["filename"] for ep in todos_los_episodios])
+    inventario = InventarioS3(s3, S3_BUCKET_NAME, prefijo)
+
+    # Tamaño y duración ya calculados en una ejecución anterior
+    metadatos_previos = {}
+    ruta_previa = os.path.join(
+        os.path.dirname(json_file_path), "episodes_metadata.json"
+    )
+    if os.path.exists(ruta_previa):
+        with open(ruta_previa, encoding="utf-8") as f:
+            metadatos_previos = {e["filename"]: e for e in json.load(f)}
+
+    def _limpiar(episodio):
         print(
             f"\n--- Procesando episodio {episodio['pontificate_week']}.{episodio['sub_index']}: {episodio['filename']} ---"
         )
 
         texto_original = episodio["texto"]
-
-        # print texto original for debugging
-        print(f"Texto original:\n{texto_original}\n--- Fin del texto original ---\n")
+        logging.debug("Texto original de %s:\n%s", episodio["filename"], texto_original)
 
         texto_limpio = extract_clean_text(texto_original)
-        print(f"Texto limpio:\n{texto_limpio}\n--- Fin del texto limpio ---\n")
+        logging.debug("Texto limpio de %s:\n%s", episodio["filename"], texto_limpio)
 
-        # ✅ Regla 2: Saltar episodios demasiado largos (>20k caracteres)
-        if len(texto_limpio) > 20000:
+        # ✅ Regla 2: Saltar episodios demasiado largos (MAX_CHARS_EPISODIO)
+        if MAX_CHARS_EPISODIO and len(texto_limpio) > MAX_CHARS_EPISODIO:
             print(
                 f"⚠️ Episodio demasiado largo ({len(texto_limpio)} caracteres). Saltando..."
             )
-            continue
+            return None
 
-        if len(texto_limpio) < 900:
+        if len(texto_limpio) < MIN_CHARS_EPISODIO:
             print(
                 f"⚠️ Episodio demasiado corto ({len(texto_limpio)} caracteres). Saltando..."
             )
-            continue
+            return None
+        return episodio, texto_limpio
 
+    def _metadatos(limpio):
+        episodio, texto_limpio = limpio
         metadata = generar_metadatos_episodio(texto_limpio, episodio, llm_client)
+        return episodio, texto_limpio, metadata
 
+    def _audio(con_metadatos):
+        episodio, texto_limpio, metadata = con_metadatos
         filename_mp3 = episodio["filename"] + ".mp3"
 
-        is_new = False
-        # ✅ Regla 1: Saltar si el archivo ya está en S3
-        if force_create_audio:
-            # Forzar generación de audio aunque ya exista en S3
-            url_audio = sintetizar_y_subir_audio(
+        # ✅ Regla 1: Saltar si el archivo ya está en S3 (salvo force_create_audio)
+        existe = False
+        if not force_create_audio:
+            try:
+                existe = filename_mp3 in inventario
+            except ClientError as e:
+                print(f"❌ Error al comprobar S3: {e}")
+                return None
+        if existe:
+            print(f"☁️ Episodio ya existe en S3: {filename_mp3}. Saltando...")
+            audio = {"url_audio": url_publica(s3, S3_BUCKET_NAME, filename_mp3)}
+            previo = metadatos_previos.get(episodio["filename"])
+            try:
+                audio.update(
+                    datos_audio_existente(
+                        s3, S3_BUCKET_NAME, filename_mp3, inventario, previo
+                    )
+                )
+            except ClientError as e:
+                print(f"⚠️ No se pudo leer la duración de {filename_mp3}: {e}")
+            is_new = False
+        else:
+            audio = sintetizar_y_subir_audio(
                 texto_limpio,
                 episodio["filename"],
                 s3,
                 polly,
                 S3_BUCKET_NAME,
                 only_metadata,
-            )
+            ) or {"url_audio": None}
+            if audio["url_audio"] and not only_metadata:
+                inventario.anadir(filename_mp3, audio["audio_bytes"])
             is_new = True
-        else:
-            # Comprobar si el archivo ya existe en S3
-            try:
-                s3.head_object(Bucket=S3_BUCKET_NAME, Key=filename_mp3)
-                print(f"☁️ Episodio ya existe en S3: {filename_mp3}. Saltando...")
-                url_audio = f"https://{S3_BUCKET_NAME}.s3.{s3.get_bucket_location(Bucket=S3_BUCKET_NAME)['LocationConstraint'] or 'us-east-1'}.amazonaws.com/{filename_mp3}"
-                is_new = False
-            except s3.exceptions.ClientError as e:
-                if e.response["Error"]["Code"] == "404":
-                    # No existe → generamos audio
-                    url_audio = sintetizar_y_subir_audio(
-                        texto_limpio,
-                        episodio["filename"],
-                        s3,
-                        polly,
-                        S3_BUCKET_NAME,
-                        only_metadata,
-                    )
-                    is_new = True
-                else:
-                    print(f"❌ Error al comprobar S3: {e}")
-                    continue
-
-        episodios_procesados.append(
-            {
-                "titulo_original": episodio["titulo"],
-                "titulo_spotify": metadata["titulo_spotify"],
-                "descripcion_spotify": metadata["descripcion_spotify"],
-                "url_audio": url_audio,
-                "fecha": episodio["fecha"],
-                "filename": episodio["filename"],
-                "tipo": episodio["tipo"],
-                "numero_episodio": f"{episodio['pontificate_week']}.{episodio['sub_index']}",
-                "vatican_url": episodio["url"],
-                "is_new": is_new,
-            }
-        )
+
+        return {
+            "titulo_original": episodio["titulo"],
+            "titulo_spotify": metadata["titulo_spotify"],
+            "descripcion_spotify": metadata["descripcion_spotify"],
+            "url_audio": audio["url_audio"],
+            "audio_bytes": audio.get("audio_bytes"),
+            "audio_duracion": audio.get("audio_duracion"),
+            "fecha": episodio["fecha"],
+            "filename": episodio["filename"],
+            "tipo": episodio["tipo"],
+            "numero_episodio": f"{episodio['pontificate_week']}.{episodio['sub_index']}",
+            "vatican_url": episodio["url"],
+            "is_new": is_new,
+        }
+
+    # Pipeline por etapas (limpieza → metadatos → síntesis y subida), cada una
+    # con su propio pool y una cola acotada: mientras un episodio se sintetiza,
+    # los siguientes ya se están limpiando. El orden de salida se mantiene.
+    limpios = mapear_en_etapa(_limpiar, todos_los_episodios, LLM_MAX_WORKERS)
+    con_metadatos = mapear_en_etapa(_metadatos, limpios, LLM_MAX_WORKERS)
+    resultados = mapear_en_etapa(_audio, con_metadatos, EPISODIOS_AUDIO_WORKERS)
+    episodios_procesados = [r for r in resultados if r is not None]
 
     print("\nProceso finalizado.")
     return episodios_procesados
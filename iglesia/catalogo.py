@@ -0,0 +1,264 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+# Catálogo de episodios: es un índice derivado de los episodes_metadata.json,
+# así que vive en la caché local (no se versiona) y se resincroniza con ellos
+CATALOGO_PATH = os.environ.get("CATALOGO_PATH", "cache/episodios.sqlite")
+JSON_BASE_DIR = "json-rss"
+FICHERO_EPISODIOS = "episodes_metadata.json"
+
+COLUMNAS = [
+    "filename",
+    "numero_episodio",
+    "semana",
+    "sub_index",
+    "fecha",
+    "tipo",
+    "vatican_url",
+    "url_audio",
+    "audio_bytes",
+    "audio_duracion",
+    "run_date",
+    "datos",
+]
+
+
+def _numero(numero_episodio: str) -> tuple:
+    semana, _, sub_index = (numero_episodio or "0.0").partition(".")
+    return int(semana), int(sub_index or 0)
+
+
+class CatalogoEpisodios:
+    """
+    Catálogo (SQLite) de todos los episodios publicados, con índices por
+    número de episodio, fecha y vatican_url. generar_audios lo mantiene al
+    guardar cada episodes_metadata.json, así que el RSS, Supabase y Telegram
+    lo consultan en lugar de recorrer y parsear json-rss/ entero.
+
+    Al abrirlo se guarda el mtime y el tamaño de cada JSON importado y se
+    vuelven a importar los que han cambiado (o desaparecido) desde entonces,
+    p. ej. tras un 'git pull' (ver 'sincronizar').
+    """
+
+    def __init__(self, path: str = None, json_base_dir: str = JSON_BASE_DIR):
+        path = path or CATALOGO_PATH
+        self.path = path
+        self.json_base_dir = json_base_dir
+        nuevo = not os.path.exists(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS episodios (
+                    filename TEXT PRIMARY KEY,
+                    numero_episodio TEXT NOT NULL,
+                    semana INTEGER NOT NULL,
+                    sub_index INTEGER NOT NULL,
+                    fecha TEXT,
+                    tipo TEXT,
+                    vatican_url TEXT,
+                    url_audio TEXT,
+                    audio_bytes INTEGER,
+                    audio_duracion INTEGER,
+                    run_date TEXT,
+                    datos TEXT NOT NULL,
+                    notificado TEXT
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_episodios_numero "
+                "ON episodios (semana, sub_index)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_episodios_fecha ON episodios (fecha)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_episodios_vatican_url "
+                "ON episodios (vatican_url)"
+            )
+            # mtime y tamaño de cada episodes_metadata.json ya importado
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ficheros (
+                    run_date TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    tamano INTEGER NOT NULL
+                )
+                """
+            )
+        if os.path.isdir(json_base_dir):
+            self.sincronizar(verbose=nuevo)
+
+    def _ruta_json(self, run_date: str) -> str:
+        return os.path.join(self.json_base_dir, run_date, FICHERO_EPISODIOS)
+
+    def _firmas_json(self) -> dict:
+        """run_date -> (mtime_ns, tamaño) de los JSON que hay en json_base_dir."""
+        firmas = {}
+        with os.scandir(self.json_base_dir) as entradas:
+            for entrada in entradas:
+                if not entrada.is_dir():
+                    continue
+                try:
+                    info = os.stat(os.path.join(entrada.path, FICHERO_EPISODIOS))
+                except OSError:
+                    continue
+                firmas[entrada.name] = (info.st_mtime_ns, info.st_size)
+        return firmas
+
+    def _guardar_firma(self, run_date: str):
+        try:
+            info = os.stat(self._ruta_json(run_date))
+        except OSError:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO ficheros (run_date, mtime_ns, tamano) "
+            "VALUES (?, ?, ?)",
+            (run_date, info.st_mtime_ns, info.st_size),
+        )
+
+    def sincronizar(self, verbose: bool = False) -> int:
+        """
+        Vuelve a importar los episodes_metadata.json nuevos o modificados y
+        quita los episodios de los que ya no existen. Los episodios que llegan
+        así ya estaban publicados, por lo que se dan por notificados; solo
+        los que registra generar_audios quedan pendientes de notificar.
+        """
+        firmas = self._firmas_json()
+        with self._lock:
+            guardadas = {
+                fila["run_date"]: (fila["mtime_ns"], fila["tamano"])
+                for fila in self._db.execute("SELECT * FROM ficheros")
+            }
+        cambiados = [r for r, firma in firmas.items() if guardadas.get(r) != firma]
+        borrados = set(guardadas) - set(firmas)
+        total = 0
+        for run_date in sorted(cambiados):
+            ruta = self._ruta_json(run_date)
+            try:
+                with open(ruta, encoding="utf-8") as f:
+                    episodios = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error al leer el archivo {ruta}: {e}")
+                continue
+            if isinstance(episodios, dict):
+                episodios = [episodios]
+            self.registrar(run_date, episodios, notificados=True)
+            total += len(episodios)
+        if borrados:
+            with self._lock, self._db:
+                for run_date in borrados:
+                    self._db.execute(
+                        "DELETE FROM episodios WHERE run_date = ?", (run_date,)
+                    )
+                    self._db.execute(
+                        "DELETE FROM ficheros WHERE run_date = ?", (run_date,)
+                    )
+        if verbose or cambiados or borrados:
+            print(
+                f"📚 Catálogo: {total} episodios importados de {len(cambiados)} "
+                f"JSON de '{self.json_base_dir}' ({len(borrados)} eliminados)."
+            )
+        return total
+
+    def _fila(self, episodio: dict, run_date: str) -> tuple:
+        semana, sub_index = _numero(episodio.get("numero_episodio"))
+        return (
+            episodio["filename"],
+            episodio.get("numero_episodio", f"{semana}.{sub_index}"),
+            semana,
+            sub_index,
+            episodio.get("fecha"),
+            episodio.get("tipo"),
+            episodio.get("vatican_url"),
+            episodio.get("url_audio"),
+            episodio.get("audio_bytes"),
+            episodio.get("audio_duracion"),
+            run_date,
+            json.dumps(episodio, ensure_ascii=False),
+        )
+
+    def registrar(self, run_date: str, episodios: list, notificados: bool = False):
+        """
+        Sustituye los episodios de 'run_date' (una carpeta de json-rss) por
+        'episodios'. Se llama después de escribir su episodes_metadata.json,
+        cuya firma se guarda para no volver a importarlo. Se conserva la
+        marca de notificación de los que ya estaban.
+        """
+        filas = [self._fila(e, run_date) for e in episodios]
+        ahora = datetime.now().isoformat(timespec="seconds") if notificados else None
+        marcadores = ", ".join("?" * len(COLUMNAS))
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM episodios WHERE run_date = ? AND filename NOT IN "
+                f"({', '.join('?' * len(filas))})",
+                (run_date, *(f[0] for f in filas)),
+            )
+            self._db.executemany(
+                f"INSERT INTO episodios ({', '.join(COLUMNAS)}, notificado) "
+                f"VALUES ({marcadores}, ?) "
+                "ON CONFLICT (filename) DO UPDATE SET "
+                + ", ".join(f"{c} = excluded.{c}" for c in COLUMNAS[1:])
+                + ", notificado = COALESCE(notificado, excluded.notificado)",
+                [fila + (ahora,) for fila in filas],
+            )
+            self._guardar_firma(run_date)
+
+    def reconstruir(self) -> int:
+        """Vuelve a importar todos los episodes_metadata.json de json_base_dir."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM ficheros")
+        return self.sincronizar(verbose=True)
+
+    def episodios(self, descendente: bool = True, **filtros) -> list:
+        """
+        Metadatos de los episodios ordenados por número de episodio. Los
+        filtros son igualdades sobre columnas indexadas (p. ej. fecha=...).
+        """
+        desconocidas = set(filtros) - set(COLUMNAS)
+        if desconocidas:
+            raise ValueError(f"Columnas desconocidas: {sorted(desconocidas)}")
+        condiciones = [f"{c} = ?" for c in filtros]
+        donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        orden = "DESC" if descendente else "ASC"
+        with self._lock:
+            filas = self._db.execute(
+                f"SELECT datos FROM episodios {donde} "
+                f"ORDER BY semana {orden}, sub_index {orden}",
+                list(filtros.values()),
+            ).fetchall()
+        return [json.loads(fila["datos"]) for fila in filas]
+
+    def por_vatican_url(self, vatican_url: str):
+        episodios = self.episodios(vatican_url=vatican_url)
+        return episodios[0] if episodios else None
+
+    def pendientes_de_notificar(self, filenames) -> list:
+        """Episodios de 'filenames' que aún no se han notificado por Telegram."""
+        filenames = list(filenames)
+        with self._lock:
+            filas = self._db.execute(
+                "SELECT datos FROM episodios WHERE notificado IS NULL "
+                f"AND filename IN ({', '.join('?' * len(filenames))}) "
+                "ORDER BY semana, sub_index",
+                filenames,
+            ).fetchall()
+        return [json.loads(fila["datos"]) for fila in filas]
+
+    def marcar_notificado(self, filename: str):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE episodios SET notificado = ? WHERE filename = ?",
+                (datetime.now().isoformat(timespec="seconds"), filename),
+            )
+
+    def close(self):
+        self._db.close()
@@ -1,9 +1,27 @@
+import os
 import re
 
 from openai import OpenAI
 from pydantic import BaseModel
 
-client = OpenAI()
+from iglesia.llm_utils import estimar_tokens, llamar_llm_cacheado
+
+MODELO = "gpt-4o"
+# Cambiar la versión al modificar el prompt invalida la caché de respuestas
+PROMPT_VERSION = "inicio-discurso-v1"
+
+# Por debajo de esta confianza del detector por reglas se consulta al LLM
+UMBRAL_CONFIANZA = float(os.environ.get("CLEAN_TEXT_UMBRAL", "0.75"))
+
+_client = None
+
+
+def obtener_cliente() -> OpenAI:
+    """Cliente de OpenAI, creado solo cuando hace falta llamar al LLM."""
+    global _client
+    if _client is None:
+        _client = OpenAI()
+    return _client
 
 
 class DiscursoBoundaries(BaseModel):
@@ -14,28 +32,137 @@ class DiscursoBoundaries(BaseModel):
     frase_inicio_discurso: str
 
 
-# --- PALABRAS CLAVE PARA EL CORTE FINAL ---
+# --- DETECTOR DEL INICIO POR REGLAS ---
+# La cabecera de vatican.va (título, lugar y fecha, "[ Multimedia ]") termina
+# casi siempre en una línea de guiones bajos, y el discurso empieza con un
+# saludo reconocible. Las encíclicas no tienen separador: se salta el bloque
+# de títulos en mayúsculas hasta el saludo o el primer párrafo.
+SEPARADOR = re.compile(r"_{3,}")
+MULTIMEDIA = re.compile(r"\[\s*Multimedia\s*\]", re.IGNORECASE)
+SALUDO = re.compile(
+    r"[¡¿«“\"]*\s*("
+    r"(mis |my )?(muy )?(querid|estimad|amad|venerabl|dear|beloved)"
+    r"|(hermanos|hermanas|brothers|sisters)\b"
+    r"|(en el|in the) nombre del padre|in the name of the father"
+    r"|comencemos|comenzamos|empecemos|empezamos|let us begin|we begin"
+    r"|(señor|señora|señores|eminencia|eminencias|excelencia|excelencias)\b"
+    r"|your (eminence|excellenc|majesty|holiness|beatitude)|mr\.? |madam|ladies"
+    r"|distinguid|distinguished"
+    r"|(muy )?buen[oa]s (días|tardes|noches)|good (morning|afternoon|evening)"
+    r"|(la )?paz (esté|a vosotros)|peace be with|(muchas )?gracias|thank you"
+    r")",
+    re.IGNORECASE,
+)
+# Encabezados que preceden al saludo tras el separador (ciclo de catequesis...)
+ENCABEZADO = re.compile(
+    r"\[|(ciclo de )?catequesis|(cycle of )?catechesis|audiencia|audience"
+    r"|(daily )?bulletin|boletín|from the vatican|desde el vaticano"
+    r"|summary|resumen",
+    re.IGNORECASE,
+)
+# Dedicatorias y subtítulos de las encíclicas ("A los venerables hermanos...")
+DEDICATORIA = re.compile(
+    r"(a (los|las|nuestros|todos)|to (the|all|our)|sobre)\b", re.IGNORECASE
+)
+# Rótulos que no son del Papa: quién habla ("Monseñor Fisichella: ...") o una
+# entradilla corta ("Primeras palabras antes de la celebración:")
+ROTULO = re.compile(r"(\w+\.? ){0,3}\w+:\s.|.{0,60}:$")
+# Apartados numerados de las encíclicas ("1. Motivo: 25.º aniversario...")
+APARTADO = re.compile(r"\d+\.\s.{0,70}$")
+
+
+def _lineas(texto: str, limite: int):
+    """(posición, línea sin espacios) de las líneas no vacías de texto[:limite]."""
+    posicion = 0
+    for linea in texto[:limite].split("\n"):
+        contenido = linea.strip()
+        if contenido:
+            yield posicion + linea.index(contenido[0]), contenido
+        posicion += len(linea) + 1
 
 
-def extract_clean_text(texto_original: str, max_tokens_chars: int = 4000) -> str:
+def _en_mayusculas(linea: str) -> bool:
+    letras = [c for c in linea if c.isalpha()]
+    return bool(letras) and sum(c.isupper() for c in letras) >= 0.8 * len(letras)
+
+
+def _es_parrafo(linea: str) -> bool:
+    """Prosa: una línea larga o una frase terminada en puntuación."""
+    if _en_mayusculas(linea):
+        return False
+    return len(linea) >= 100 or (len(linea) >= 40 and linea[-1] in ".!?:;»”\"")
+
+
+def _es_titulo(linea: str) -> bool:
+    """Líneas de cabecera: mayúsculas, títulos cortos, dedicatorias o apartados."""
+    return (
+        not _es_parrafo(linea)
+        or DEDICATORIA.match(linea) is not None
+        or APARTADO.match(linea) is not None
+    )
+
+
+def detectar_inicio_discurso(texto: str, limite: int = 3000) -> tuple:
     """
-    Extrae el texto principal limpio de un discurso papal.
-    1. Usa LLM para encontrar el inicio.
-    2. Usa Regex (STOP_WORDS) para cortar el final.
+    Localiza sin LLM dónde empieza a hablar el Papa. Devuelve
+    (posición en 'texto', confianza entre 0 y 1). Con confianza baja la
+    posición es conservadora (justo tras la cabecera, o 0).
     """
+    lineas = list(_lineas(texto, limite))
+    # La cabecera acaba en el primer separador (o, sin él, en "[ Multimedia ]")
+    separadores = [
+        i for i, (_, linea) in enumerate(lineas[:15]) if SEPARADOR.fullmatch(linea)
+    ] or [i for i, (_, linea) in enumerate(lineas[:15]) if MULTIMEDIA.fullmatch(linea)]
 
-    # -----------------------
-    # 1️⃣ Recortar el texto de entrada para el LLM
-    # -----------------------
+    if separadores:
+        resto = lineas[separadores[0] + 1 :]
+        if not resto:
+            return 0, 0.0
+        # Se saltan hasta dos encabezados (catequesis, notas entre corchetes,
+        # títulos sin puntuación final)
+        for j, (posicion, linea) in enumerate(resto[:3]):
+            if SALUDO.match(linea):
+                return posicion, 0.9 if j else 0.95
+            es_titulo = _es_titulo(linea) and linea[-1] not in ".,:;!?"
+            if not (ENCABEZADO.search(linea[:60]) or es_titulo):
+                break
+        posicion, primera = resto[0]
+        if (
+            _es_parrafo(primera)
+            and not ENCABEZADO.search(primera[:60])
+            and not ROTULO.match(primera)
+        ):
+            return posicion, 0.8
+        return posicion, 0.4
+
+    # Sin separador: bloque de títulos (encíclicas) y después saludo o párrafo
+    for i, (posicion, linea) in enumerate(lineas[:12]):
+        if SALUDO.match(linea) and len(linea) >= 15:
+            return posicion, 0.9
+        if not _es_titulo(linea):
+            return posicion, 0.8 if i else 0.5
+    return 0, 0.0
+
+
+def _texto_para_llm(texto_original: str, max_tokens_chars: int) -> str:
+    """Recorta el texto de entrada para el LLM (principio y final)."""
     if len(texto_original) > max_tokens_chars:
         mitad = max_tokens_chars // 2
-        texto_input = (
+        return (
             texto_original[:mitad]
             + "\n...\n[TEXTO RECORTADO]\n...\n"
             + texto_original[-mitad:]
         )
-    else:
-        texto_input = texto_original
+    return texto_original
+
+
+def _inicio_con_llm(texto_original: str, max_tokens_chars: int):
+    """Posición de la frase de inicio que devuelve el LLM, o None."""
+
+    # -----------------------
+    # 1️⃣ Recortar el texto de entrada para el LLM
+    # -----------------------
+    texto_input = _texto_para_llm(texto_original, max_tokens_chars)
 
     # -----------------------
     # 2️⃣ Prompt para LLM (Simplificado: solo busca el inicio)
@@ -74,48 +201,58 @@ Texto de entrada:
     # -----------------------
     # 3️⃣ Llamada al LLM con Pydantic
     # -----------------------
-    try:
-        response = client.responses.parse(
-            model="gpt-4o",  # Usando un modelo válido
+    phrase = llamar_llm_cacheado(
+        lambda: obtener_cliente()
+        .responses.parse(
+            model=MODELO,
             input=prompt_messages,
             text_format=DiscursoBoundaries,
         )
-        boundaries = response.output_parsed
+        .output_parsed.frase_inicio_discurso,
+        modelo=MODELO,
+        version=PROMPT_VERSION,
+        entrada=texto_input,
+        tokens=estimar_tokens(texto_input, salida=100),
+    )
+    return buscar_frase(phrase, texto_original)
 
-        # -----------------------
-        # 4️⃣ Lógica de Corte (Inicio con LLM)
-        # -----------------------
-        if boundaries.frase_inicio_discurso:
-            # 1. Obtenemos la frase del LLM
-            phrase = boundaries.frase_inicio_discurso
 
-            # 2. Escapamos caracteres especiales de Regex (ej. "¡" o ".")
-            pattern_escaped = re.escape(phrase)
+def buscar_frase(phrase: str, texto: str):
+    """Posición de 'phrase' en 'texto' (ignorando mayúsculas y espacios), o None."""
+    if not phrase:
+        return None
+    # Escapamos caracteres especiales de Regex (ej. "¡" o ".") y reemplazamos
+    # los espacios por \s+ (uno o más espacios, INCLUYENDO saltos de línea)
+    pattern_flexible = re.sub(r"\\ ", r"\\s+", re.escape(phrase))
+    match = re.search(pattern_flexible, texto, flags=re.IGNORECASE)
+    return match.start() if match else None
 
-            # 3. Reemplazamos los espacios por \s+
-            #    \s+ significa "uno o más espacios, INCLUYENDO saltos de línea (\n) o tabs (\t)"
-            pattern_flexible = re.sub(r"\\ ", r"\\s+", pattern_escaped)
 
-            # 4. Buscamos el patrón (ignorando mayúsculas/minúsculas)
-            match = re.search(pattern_flexible, texto_original, flags=re.IGNORECASE)
-
-            if match:
-                # 5. Encontrado. Cortamos desde el inicio del 'match'.
-                start_index = match.start()
-                texto_limpio = texto_original[start_index:]
+def extract_clean_text(
+    texto_original: str, max_tokens_chars: int = 4000, usar_llm: bool = True
+) -> str:
+    """
+    Extrae el texto principal limpio de un discurso papal.
+    1. Busca el inicio con reglas (detectar_inicio_discurso) y, si la
+       confianza es baja, con el LLM.
+    2. Usa Regex (STOP_WORDS) para cortar el final.
+    """
+    inicio, confianza = detectar_inicio_discurso(texto_original)
 
+    if confianza < UMBRAL_CONFIANZA and usar_llm:
+        try:
+            inicio_llm = _inicio_con_llm(texto_original, max_tokens_chars)
+            if inicio_llm is not None:
+                inicio = inicio_llm
             else:
                 # Fallback si la frase no se encuentra
                 print(
-                    "ADVERTENCIA: Frase de inicio no encontrada. Usando texto original."
+                    "ADVERTENCIA: Frase de inicio no encontrada. Usando el inicio por reglas."
                 )
-                texto_limpio = texto_original
-        else:
-            texto_limpio = texto_original
+        except Exception as e:
+            print(f"Error llamando a la API o procesando: {e}")
 
-    except Exception as e:
-        print(f"Error llamando a la API o procesando: {e}")
-        texto_limpio = texto_original
+    texto_limpio = texto_original[inicio:]
 
     # -----------------------
     # 5️⃣ Lógica de Corte (Final con Regex) - ¡NUEVA ESTRATEGIA!
@@ -143,3 +280,157 @@ Texto de entrada:
     texto_limpio = texto_limpio.replace("[...]", "")
 
     return texto_limpio.strip()
+
+
+def linea_de_etiqueta(etiqueta: str, texto: str):
+    """Posición de la línea de 'texto' que empieza por 'etiqueta', o None."""
+    etiqueta = " ".join(etiqueta.split())
+    posicion = 0
+    for linea in texto.split("\n"):
+        if " ".join(linea.split()).startswith(etiqueta):
+            return posicion + len(linea) - len(linea.lstrip())
+        posicion += len(linea) + 1
+    return None
+
+
+if __name__ == "__main__":
+    # Precisión del detector por reglas por nivel de confianza:
+    #   python -m iglesia.clean_text [carpeta] [--etiquetas=ruta.json] [--llm]
+    # La referencia es el inicio etiquetado a mano (por defecto
+    # inicio_discurso_etiquetado.json junto a la carpeta) o, si el documento
+    # no está etiquetado, la respuesta del LLM guardada en la caché; con --llm
+    # se pide al LLM para los que no la tengan.
+    #
+    # El umbral no se elige y se mide con los mismos documentos: validación
+    # cruzada en PLIEGUES partes fijas (por hash de la ruta). En cada pliegue
+    # el umbral se elige con el resto (el más bajo con una precisión de al
+    # menos PRECISION_MINIMA) y se mide con los documentos apartados.
+    import glob
+    import hashlib
+    import json
+    import sys
+    import time
+    from collections import Counter
+
+    from iglesia.html_utils import extraer_texto_documento
+    from iglesia.llm_utils import CacheLLM, obtener_cache_llm
+
+    PLIEGUES = 5
+    PRECISION_MINIMA = 0.99
+
+    argumentos = [a for a in sys.argv[1:] if not a.startswith("--")]
+    carpeta = argumentos[0] if argumentos else "vatican-archiver/documents/vatican_html"
+    pedir_al_llm = "--llm" in sys.argv
+    ruta_etiquetas = next(
+        (a.split("=", 1)[1] for a in sys.argv if a.startswith("--etiquetas=")),
+        os.path.join(os.path.dirname(carpeta), "inicio_discurso_etiquetado.json"),
+    )
+    etiquetas = {}
+    if os.path.exists(ruta_etiquetas):
+        with open(ruta_etiquetas, encoding="utf-8") as f:
+            etiquetas = json.load(f)
+    rutas = sorted(glob.glob(os.path.join(carpeta, "**", "*.html"), recursive=True))
+
+    cache = obtener_cache_llm()
+    tiempo = 0.0
+    # (pliegue, confianza, coincide) de cada documento con referencia
+    resultados = []
+    fallos = []
+    for ruta in rutas:
+        with open(ruta, "rb") as f:
+            texto = extraer_texto_documento(f.read())
+
+        t0 = time.perf_counter()
+        inicio, confianza = detectar_inicio_discurso(texto)
+        tiempo += time.perf_counter() - t0
+
+        relativa = os.path.relpath(ruta, carpeta)
+        etiqueta = etiquetas.get(relativa)
+        if etiqueta is not None:
+            referencia = linea_de_etiqueta(etiqueta, texto)
+        else:
+            entrada = _texto_para_llm(texto, 4000)
+            frase = cache.get(CacheLLM.clave(MODELO, PROMPT_VERSION, entrada))
+            if frase is not None:
+                referencia = buscar_frase(frase, texto)
+            elif pedir_al_llm:
+                referencia = _inicio_con_llm(texto, 4000)
+            else:
+                continue
+        if referencia is None:
+            continue
+        # Se compara la línea en la que empieza cada uno
+        coincide = texto.count("\n", 0, inicio) == texto.count("\n", 0, referencia)
+        pliegue = int(hashlib.sha1(relativa.encode()).hexdigest(), 16) % PLIEGUES
+        resultados.append((pliegue, confianza, coincide))
+        if not coincide and confianza >= UMBRAL_CONFIANZA:
+            primera_linea = lambda i: texto[i:].split("\n")[0][:60]  # noqa: E731
+            fallos.append((ruta, primera_linea(inicio), primera_linea(referencia)))
+
+    def _sin_llm(resultados, umbral):
+        """(documentos con confianza >= umbral, cuántos coinciden)."""
+        aceptados = [coincide for _, c, coincide in resultados if c >= umbral]
+        return len(aceptados), sum(aceptados)
+
+    def _elegir_umbral(resultados):
+        """El umbral más bajo cuya precisión llega a PRECISION_MINIMA."""
+        elegido = None
+        for umbral in sorted({c for _, c, _ in resultados}, reverse=True):
+            n, ok = _sin_llm(resultados, umbral)
+            if ok < PRECISION_MINIMA * n:
+                break
+            elegido = umbral
+        return elegido
+
+    total = len(rutas)
+    comparados = len(resultados)
+    print(f"Documentos: {total} en '{carpeta}', {comparados} con referencia")
+    print(f"Tiempo del detector: {1000 * tiempo / max(total, 1):.2f} ms/documento")
+    if not comparados:
+        print("Sin etiquetas ni respuestas del LLM en caché (usa --llm).")
+        sys.exit()
+    documentos = Counter(c for _, c, _ in resultados)
+    aciertos = Counter(c for _, c, coincide in resultados if coincide)
+    print("Confianza  Documentos  Coinciden")
+    for confianza in sorted(documentos, reverse=True):
+        n, ok = documentos[confianza], aciertos[confianza]
+        print(f"{confianza:>9}  {n:>10}  {ok:>4} ({ok / n:.0%})")
+    # Con cada umbral posible: documentos resueltos sin LLM y su precisión
+    # (con todos los documentos: sirve para ver los niveles, no para medir)
+    for umbral in sorted(documentos, reverse=True):
+        n, ok = _sin_llm(resultados, umbral)
+        actual = min((c for c in documentos if c >= UMBRAL_CONFIANZA), default=None)
+        marca = "  <- UMBRAL_CONFIANZA" if umbral == actual else ""
+        print(
+            f"Umbral {umbral}: {n}/{comparados} sin LLM ({n / comparados:.0%}), "
+            f"coinciden {ok}/{n} ({ok / n:.1%}){marca}"
+        )
+
+    print(
+        f"Validación cruzada ({PLIEGUES} pliegues, "
+        f"precisión >= {PRECISION_MINIMA:.0%}):"
+    )
+    apartados_n = apartados_ok = apartados_total = 0
+    for pliegue in range(PLIEGUES):
+        ajuste = [r for r in resultados if r[0] != pliegue]
+        apartados = [r for r in resultados if r[0] == pliegue]
+        umbral = _elegir_umbral(ajuste)
+        n, ok = _sin_llm(apartados, umbral) if umbral is not None else (0, 0)
+        apartados_n, apartados_ok = apartados_n + n, apartados_ok + ok
+        apartados_total += len(apartados)
+        print(
+            f"  Pliegue {pliegue}: umbral {umbral}, {n}/{len(apartados)} sin LLM, "
+            f"coinciden {ok}/{n}"
+        )
+    if apartados_n:
+        print(
+            f"Apartados: {apartados_n}/{apartados_total} sin LLM "
+            f"({apartados_n / apartados_total:.0%}), coinciden "
+            f"{apartados_ok}/{apartados_n} ({apartados_ok / apartados_n:.1%})"
+        )
+
+    for ruta, reglas, referencia in fallos:
+        print(
+            f"  {os.path.basename(ruta)}\n    reglas:     {reglas!r}"
+            f"\n    referencia: {referencia!r}"
+        )
@@ -0,0 +1,184 @@
+import os
+
+from bs4 import BeautifulSoup, UnicodeDammit
+
+try:
+    import lxml.html
+
+    LXML_DISPONIBLE = True
+except ImportError:  # pragma: no cover - lxml es una dependencia del proyecto
+    LXML_DISPONIBLE = False
+
+# Backend de parseo: "lxml" (rápido, en C) o "html.parser" (BeautifulSoup puro,
+# el comportamiento histórico). Se puede forzar con la variable HTML_PARSER.
+HTML_PARSER = os.environ.get("HTML_PARSER", "lxml" if LXML_DISPONIBLE else "html.parser")
+
+BACKENDS = ("lxml", "html.parser")
+
+
+def _backend(backend=None):
+    backend = backend or HTML_PARSER
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de parseo desconocido: {backend}")
+    if backend == "lxml" and not LXML_DISPONIBLE:
+        return "html.parser"
+    return backend
+
+
+# --- Helpers del backend lxml ---
+def _xpath_clase(tag, clase):
+    return (
+        f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {clase} ')]"
+    )
+
+
+def _textos(elemento):
+    """Equivalente a los 'strings' de BeautifulSoup: texto sin comentarios."""
+    if elemento.text:
+        yield elemento.text
+    for hijo in elemento:
+        if isinstance(hijo.tag, str) and hijo.tag not in ("script", "style"):
+            yield from _textos(hijo)
+        if hijo.tail:
+            yield hijo.tail
+
+
+def _get_text(elemento, separator=""):
+    """Equivalente a Tag.get_text(separator=..., strip=True)."""
+    return separator.join(t.strip() for t in _textos(elemento) if t.strip())
+
+
+def _lxml_documento(html):
+    # Se decodifica igual que BeautifulSoup: UTF-8 y, si falla, detección
+    if isinstance(html, bytes):
+        try:
+            html = html.decode("utf-8")
+        except UnicodeDecodeError:
+            html = UnicodeDammit(html, is_html=True).unicode_markup
+    return lxml.html.document_fromstring(html)
+
+
+# --- API pública ---
+def extraer_enlaces_indice(html, backend=None) -> list:
+    """
+    Devuelve [{'titulo', 'href'}] de las entradas <li><a> de div.vaticanindex,
+    o None si la página no tiene ese contenedor.
+    """
+    if _backend(backend) == "lxml":
+        contenedores = _lxml_documento(html).xpath(_xpath_clase("div", "vaticanindex"))
+        if not contenedores:
+            return None
+        enlaces = []
+        for li in contenedores[0].iter("li"):
+            enlace = next(li.iter("a"), None)
+            if enlace is not None and enlace.get("href"):
+                enlaces.append({"titulo": _get_text(enlace), "href": enlace.get("href")})
+        return enlaces
+
+    soup = BeautifulSoup(html, "html.parser")
+    contenedor = soup.find("div", class_="vaticanindex")
+    if not contenedor:
+        return None
+    enlaces = []
+    for li in contenedor.find_all("li"):
+        enlace = li.find("a")
+        if enlace and enlace.get("href"):
+            enlaces.append(
+                {"titulo": enlace.get_text(strip=True), "href": enlace["href"]}
+            )
+    return enlaces
+
+
+def extraer_texto_documento(html, backend=None) -> str:
+    """
+    Devuelve el texto de los <p> dentro de div.testo > div.text, un párrafo
+    por línea. Lanza AttributeError si la página no tiene div.testo.
+    """
+    if _backend(backend) == "lxml":
+        testos = _lxml_documento(html).xpath(_xpath_clase("div", "testo"))
+        if not testos:
+            raise AttributeError("La página no contiene <div class='testo'>")
+        return "\n".join(
+            _get_text(p, separator=" ")
+            for div in testos[0].xpath("." + _xpath_clase("div", "text"))
+            for p in div.iter("p")
+        )
+
+    soup = BeautifulSoup(html, "html.parser")
+    div_testo = soup.find("div", class_="testo")
+    texto_container = div_testo.find_all("div", class_="text")
+    return "\n".join(
+        p.get_text(separator=" ", strip=True)
+        for div in texto_container
+        for p in div.find_all("p")
+    )
+
+
+def extraer_enlaces_contenido(html, backend=None) -> list:
+    """
+    Devuelve [(href, titulo)] de todos los <a href> del área de contenido
+    (div.document-container, div#main-container o, en su defecto, <body>).
+    """
+    if _backend(backend) == "lxml":
+        documento = _lxml_documento(html)
+        areas = (
+            documento.xpath(_xpath_clase("div", "document-container"))
+            or documento.xpath("//div[@id='main-container']")
+            or [documento.body]
+        )
+        return [
+            (enlace.get("href"), _get_text(enlace))
+            for enlace in areas[0].iter("a")
+            if enlace.get("href") is not None
+        ]
+
+    soup = BeautifulSoup(html, "html.parser")
+    content_area = (
+        soup.find("div", class_="document-container")
+        or soup.find("div", id="main-container")
+        or soup.body
+    )
+    return [
+        (enlace["href"], enlace.get_text(strip=True))
+        for enlace in content_area.find_all("a", href=True)
+    ]
+
+
+# ==========================================================================
+# BENCHMARK: parseo de los HTML cacheados con cada backend
+# ==========================================================================
+if __name__ == "__main__":
+    import glob
+    import sys
+    import time
+
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else "vatican-archiver/documents/vatican_html"
+    rutas = sorted(glob.glob(os.path.join(carpeta, "**", "*.html"), recursive=True))
+    paginas = []
+    for ruta in rutas:
+        with open(ruta, "rb") as f:
+            paginas.append(f.read())
+    print(f"Parseando {len(paginas)} documentos de '{carpeta}'")
+
+    def _texto(html, backend):
+        try:
+            return extraer_texto_documento(html, backend)
+        except AttributeError:
+            return None
+
+    for nombre, funcion in [
+        ("texto", _texto),
+        ("enlaces", extraer_enlaces_contenido),
+    ]:
+        resultados = {}
+        for backend in BACKENDS:
+            inicio = time.perf_counter()
+            salida = [funcion(html, backend) for html in paginas]
+            resultados[backend] = (time.perf_counter() - inicio, salida)
+            print(f"  [{nombre}] {backend:12s} {resultados[backend][0]:.2f} s")
+
+        iguales = sum(
+            a == b for a, b in zip(resultados["lxml"][1], resultados["html.parser"][1])
+        )
+        aceleracion = resultados["html.parser"][0] / resultados["lxml"][0]
+        print(f"  [{nombre}] paridad {iguales}/{len(paginas)}, aceleración x{aceleracion:.1f}")
@@ -0,0 +1,276 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from iglesia.page_store import PageStore
+
+USER_AGENT = "igles-ia/1.0 (+https://igles-ia.es)"
+
+
+def crear_sesion(pool_maxsize: int = 16, reintentos: int = 3) -> requests.Session:
+    """
+    Crea una sesión de requests con un pool de conexiones reutilizables
+    y reintentos automáticos ante errores transitorios del servidor. Agotados
+    los reintentos se devuelve la última respuesta (p. ej. un 503) en vez de
+    lanzar RetryError, y cada llamador decide qué hacer con ella.
+    """
+    session = requests.Session()
+    retries = Retry(
+        total=reintentos,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_maxsize,
+        pool_maxsize=pool_maxsize,
+        max_retries=retries,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+class LimitadorPorHost:
+    """
+    Limitador de tasa tipo 'token bucket' con un cubo por host.
+
+    Es seguro entre hilos: todos los workers que comparten el limitador
+    respetan juntos la tasa máxima de peticiones por segundo de cada host.
+    """
+
+    def __init__(self, peticiones_por_segundo: float = 4.0, rafaga: int = None):
+        self.tasa = peticiones_por_segundo
+        self.capacidad = float(rafaga or max(1, int(peticiones_por_segundo)))
+        self._cubos = {}
+        self._lock = threading.Lock()
+
+    def pausar(self, url: str, segundos: float) -> None:
+        """
+        Detiene todas las peticiones al host durante 'segundos' (p. ej. tras un
+        Retry-After): el cubo se vacía y no vuelve a llenarse hasta entonces.
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            hasta = time.monotonic() + segundos
+            _, ultimo = self._cubos.get(host, (0.0, 0.0))
+            self._cubos[host] = (0.0, max(ultimo, hasta))
+
+    def esperar(self, url: str) -> None:
+        """Bloquea hasta que haya un token disponible para el host de la URL."""
+        host = urlparse(url).netloc
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                tokens, ultimo = self._cubos.get(host, (self.capacidad, ahora))
+                tokens = min(self.capacidad, tokens + (ahora - ultimo) * self.tasa)
+                if tokens >= 1:
+                    self._cubos[host] = (tokens - 1, ahora)
+                    return
+                self._cubos[host] = (tokens, ahora)
+                espera = (1 - tokens) / self.tasa
+            time.sleep(espera)
+
+
+def segundos_retry_after(valor, por_defecto: float) -> float:
+    """Interpreta la cabecera Retry-After (segundos o fecha HTTP)."""
+    if not valor:
+        return por_defecto
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+        return max(0.0, (fecha - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return por_defecto
+
+
+def get_con_reintentos(
+    session: requests.Session,
+    url: str,
+    limitador: LimitadorPorHost,
+    reintentos: int = 5,
+    backoff: float = 1.0,
+    **kwargs,
+) -> requests.Response:
+    """
+    GET respetando el limitador compartido. Ante 429/503 pausa el host entero
+    el tiempo indicado por Retry-After (o un backoff exponencial con jitter)
+    y vuelve a intentarlo.
+    """
+    for intento in range(reintentos + 1):
+        limitador.esperar(url)
+        resp = session.get(url, **kwargs)
+        if resp.status_code not in (429, 503) or intento == reintentos:
+            return resp
+        espera = segundos_retry_after(
+            resp.headers.get("Retry-After"),
+            backoff * 2**intento + random.uniform(0, backoff),
+        )
+        limitador.pausar(url, espera)
+    return resp
+
+
+def mapear_en_paralelo(
+    funcion, elementos, max_workers: int = 8, max_pendientes: int = None
+):
+    """
+    Aplica 'funcion' a cada elemento con un pool de hilos acotado.
+    Devuelve un iterador con los resultados en el mismo orden de entrada.
+    Con 'max_pendientes' solo se adelantan ese número de elementos al
+    consumidor, lo que acota los resultados que esperan en memoria, los
+    elementos se leen según se necesitan y cada resultado se entrega en
+    cuanto está listo: varias llamadas encadenadas forman un pipeline en el
+    que cada etapa tiene su propio pool y las etapas se solapan.
+    """
+    if max_pendientes is not None:
+        return _mapear_acotado(funcion, elementos, max_workers, max_pendientes)
+    elementos = list(elementos)
+    if max_workers <= 1 or len(elementos) <= 1:
+        return map(funcion, elementos)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _resultados():
+        with executor:
+            yield from executor.map(funcion, elementos)
+
+    return _resultados()
+
+
+# Marca de fin de los elementos en la cola de _mapear_acotado
+_FIN = object()
+
+
+def _mapear_acotado(funcion, elementos, max_workers, max_pendientes):
+    # Un hilo lee los elementos y los envía al pool mientras el consumidor
+    # recoge los resultados: cada resultado sale en cuanto está listo (y le
+    # tocan por orden), sin esperar a que se llene la ventana ni a que la
+    # etapa anterior entregue el siguiente elemento.
+    cupo = threading.Semaphore(max(max_pendientes, 1))
+    cola = queue.Queue()
+    parar = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+
+    def _alimentar():
+        try:
+            for elemento in elementos:
+                while not cupo.acquire(timeout=0.1):
+                    if parar.is_set():
+                        return
+                if parar.is_set():
+                    return
+                cola.put(executor.submit(funcion, elemento))
+        except BaseException as e:  # el error de la etapa anterior se propaga
+            cola.put(e)
+        finally:
+            cola.put(_FIN)
+
+    threading.Thread(target=_alimentar, daemon=True).start()
+    try:
+        while (siguiente := cola.get()) is not _FIN:
+            if isinstance(siguiente, BaseException):
+                raise siguiente
+            try:
+                yield siguiente.result()
+            finally:
+                cupo.release()
+    finally:
+        parar.set()
+        executor.shutdown(cancel_futures=True)
+
+
+class RespuestaCacheada:
+    """Respuesta mínima servida desde la caché en disco (compatible con requests)."""
+
+    def __init__(self, url: str, content: bytes, status_code: int = 200):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.from_cache = True
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+
+class CacheHTTP:
+    """
+    Caché HTTP persistente en disco, indexada por URL.
+
+    Los cuerpos y sus validadores (ETag y Last-Modified) se guardan en un
+    PageStore comprimido y direccionado por contenido, y se revalidan con
+    If-None-Match / If-Modified-Since. Los documentos con fecha anterior a
+    'dias_congelado' se sirven directamente desde disco, sin ninguna petición.
+    """
+
+    def __init__(self, directorio: str = "cache/http", dias_congelado: int = 30):
+        self.directorio = directorio
+        self.dias_congelado = dias_congelado
+        self.store = PageStore(directorio)
+
+    def contiene(self, url: str) -> bool:
+        return url in self.store
+
+    def leer(self, url: str):
+        """Devuelve (metadatos, cuerpo) de la URL cacheada, o (None, None)."""
+        meta = self.store.info(url)
+        cuerpo = self.store.get(url) if meta is not None else None
+        if cuerpo is None:
+            return None, None
+        return meta, cuerpo
+
+    def guardar(self, url: str, cuerpo: bytes, headers) -> None:
+        self.store.put(
+            url,
+            cuerpo,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+
+    def esta_congelado(self, fecha_documento: datetime = None) -> bool:
+        """True si el documento es lo bastante antiguo para no revalidarlo."""
+        if fecha_documento is None:
+            return False
+        return fecha_documento < datetime.now() - timedelta(days=self.dias_congelado)
+
+    def get(
+        self,
+        session: requests.Session,
+        url: str,
+        fecha_documento: datetime = None,
+        timeout: int = 30,
+    ):
+        """
+        GET con caché: sirve desde disco los documentos congelados y revalida
+        el resto con una petición condicional (304 -> se usa la copia local).
+        """
+        meta, cuerpo = self.leer(url)
+        if meta is not None and self.esta_congelado(fecha_documento):
+            return RespuestaCacheada(url, cuerpo)
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and meta is not None:
+            return RespuestaCacheada(url, cuerpo)
+        if response.status_code == 200:
+            self.guardar(url, response.content, response.headers)
+        return response
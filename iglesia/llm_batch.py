@@ -0,0 +1,177 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from openai import OpenAI
+
+from iglesia import llm_utils
+from iglesia.llm_utils import CacheLLM, nombre_modelo, obtener_cache_llm
+
+# Lotes de la Batch API: JSONL de peticiones y estado del lote en curso
+LLM_BATCH_DIR = os.environ.get("LLM_BATCH_DIR", "cache/llm_batches")
+LLM_BATCH_INTERVALO = float(os.environ.get("LLM_BATCH_INTERVALO", "30"))
+ENDPOINT = "/v1/chat/completions"
+ESTADOS_FINALES = {"completed", "failed", "expired", "cancelled"}
+
+
+def peticion_chat(custom_id: str, llm_client, prompt: str) -> dict:
+    """Línea del JSONL de la Batch API equivalente a llm_client.call(prompt)."""
+    cuerpo = {
+        # crewai admite el prefijo del proveedor ("openai/gpt-4.1-nano")
+        "model": llm_client.model.split("/")[-1],
+        "messages": [{"role": "user", "content": prompt}],
+    }
+    temperatura = getattr(llm_client, "temperature", None)
+    if temperatura is not None:
+        cuerpo["temperature"] = temperatura
+    return {"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": cuerpo}
+
+
+class LoteLLM:
+    """
+    Resuelve muchas llamadas al LLM con la Batch API de OpenAI (más barata y
+    sin límites RPM/TPM) en vez de una a una. El custom_id de cada petición es
+    la clave de la caché de llm_utils: las respuestas se guardan ahí y el código
+    síncrono (llamar_llm_cacheado) las reutiliza sin cambios.
+
+    El estado del lote enviado se guarda en disco, así que una ejecución
+    posterior recoge el mismo lote en lugar de enviarlo de nuevo.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        llm_client,
+        version: str,
+        directorio: str = LLM_BATCH_DIR,
+        cliente: OpenAI = None,
+    ):
+        self.llm_client = llm_client
+        self.modelo = nombre_modelo(llm_client)
+        self.version = version
+        self.cliente = cliente
+        os.makedirs(directorio, exist_ok=True)
+        self.ruta_jsonl = os.path.join(directorio, f"{nombre}.jsonl")
+        self.ruta_estado = os.path.join(directorio, f"{nombre}.estado.json")
+
+    def _cliente(self) -> OpenAI:
+        if self.cliente is None:
+            self.cliente = OpenAI()
+        return self.cliente
+
+    def clave(self, prompt: str) -> str:
+        return CacheLLM.clave(self.modelo, self.version, prompt)
+
+    def pendientes(self, prompts) -> dict:
+        """{custom_id: prompt} de los prompts que aún no están en la caché."""
+        cache = obtener_cache_llm()
+        claves = {self.clave(p): p for p in prompts}
+        return {c: p for c, p in claves.items() if cache.get(c) is None}
+
+    def enviar(self, prompts) -> str:
+        """Sube el JSONL de los prompts pendientes y crea el lote. Devuelve su id."""
+        pendientes = self.pendientes(prompts)
+        if not pendientes:
+            return None
+        with open(self.ruta_jsonl, "w", encoding="utf-8") as f:
+            for custom_id, prompt in pendientes.items():
+                peticion = peticion_chat(custom_id, self.llm_client, prompt)
+                f.write(json.dumps(peticion, ensure_ascii=False) + "\n")
+
+        cliente = self._cliente()
+        with open(self.ruta_jsonl, "rb") as f:
+            fichero = cliente.files.create(file=f, purpose="batch")
+        lote = cliente.batches.create(
+            input_file_id=fichero.id, endpoint=ENDPOINT, completion_window="24h"
+        )
+        with open(self.ruta_estado, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "batch_id": lote.id,
+                    "modelo": self.modelo,
+                    "version": self.version,
+                    "peticiones": len(pendientes),
+                    "enviado": datetime.now().isoformat(timespec="seconds"),
+                },
+                f,
+                indent=2,
+            )
+        print(f"📦 Lote {lote.id} enviado con {len(pendientes)} peticiones.")
+        return lote.id
+
+    def en_curso(self):
+        """Id del lote enviado y aún sin recoger, o None."""
+        if not os.path.exists(self.ruta_estado):
+            return None
+        with open(self.ruta_estado, encoding="utf-8") as f:
+            return json.load(f)["batch_id"]
+
+    def recoger(self, esperar: bool = True, intervalo: float = LLM_BATCH_INTERVALO):
+        """
+        Consulta el lote en curso (esperando a que termine si 'esperar') y
+        guarda sus respuestas en la caché. Devuelve {custom_id: respuesta}, o
+        None si el lote aún no ha terminado.
+        """
+        batch_id = self.en_curso()
+        if batch_id is None:
+            return {}
+        cliente = self._cliente()
+        lote = cliente.batches.retrieve(batch_id)
+        while lote.status not in ESTADOS_FINALES:
+            if not esperar:
+                print(f"⏳ Lote {batch_id} en estado '{lote.status}'.")
+                return None
+            time.sleep(intervalo)
+            lote = cliente.batches.retrieve(batch_id)
+
+        respuestas = {}
+        if lote.output_file_id:
+            contenido = cliente.files.content(lote.output_file_id).text
+            respuestas = self._guardar_respuestas(contenido)
+        fallidas = (lote.request_counts.failed if lote.request_counts else 0) or 0
+        print(f"📦 Lote {batch_id} '{lote.status}': {len(respuestas)} respuestas.")
+        if fallidas or lote.status != "completed":
+            print("  -> Las peticiones sin respuesta se harán de forma síncrona.")
+        os.remove(self.ruta_estado)
+        return respuestas
+
+    def _guardar_respuestas(self, contenido: str) -> dict:
+        cache = obtener_cache_llm()
+        respuestas = {}
+        for linea in contenido.splitlines():
+            if not linea.strip():
+                continue
+            resultado = json.loads(linea)
+            respuesta = resultado.get("response") or {}
+            if resultado.get("error") or respuesta.get("status_code") != 200:
+                continue
+            texto = respuesta["body"]["choices"][0]["message"]["content"]
+            custom_id = resultado["custom_id"]
+            cache.put(custom_id, self.modelo, self.version, texto)
+            respuestas[custom_id] = texto
+        return respuestas
+
+    def ejecutar(
+        self, prompts, esperar: bool = True, intervalo: float = LLM_BATCH_INTERVALO
+    ) -> bool:
+        """
+        Envía los prompts pendientes (o retoma el lote ya enviado) y recoge las
+        respuestas. Devuelve False si el lote sigue en curso. Las peticiones
+        fallidas (o los prompts añadidos con un lote ya en curso) se quedan fuera
+        de la caché y se resuelven después con la llamada síncrona.
+
+        Las respuestas llegan al código síncrono a través de la caché, así que
+        con la caché desactivada (USAR_CACHE_LLM = False) se pagarían dos veces:
+        esa combinación se rechaza con ValueError.
+        """
+        if not llm_utils.USAR_CACHE_LLM:
+            raise ValueError(
+                "La Batch API entrega sus respuestas a través de la caché del LLM: "
+                "no se puede usar con la caché desactivada."
+            )
+        prompts = list(prompts)
+        if self.en_curso() is None and self.enviar(prompts) is None:
+            print("📦 Todas las respuestas ya estaban en la caché del LLM.")
+            return True
+        return self.recoger(esperar=esperar, intervalo=intervalo) is not None
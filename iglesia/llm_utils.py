@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from tqdm import tqdm
+
+from iglesia.http_utils import mapear_en_paralelo, segundos_retry_after
+
+# Límites de la cuenta de OpenAI (configurables por entorno)
+LLM_RPM = float(os.environ.get("LLM_RPM", "500"))
+LLM_TPM = float(os.environ.get("LLM_TPM", "200000"))
+LLM_MAX_WORKERS = int(os.environ.get("LLM_MAX_WORKERS", "8"))
+
+# Caché de respuestas del LLM (LLM_CACHE=0 para no leer de ella)
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "cache/llm.sqlite")
+LLM_CACHE_MAX_MB = float(os.environ.get("LLM_CACHE_MAX_MB", "200"))
+USAR_CACHE_LLM = os.environ.get("LLM_CACHE", "1") != "0"
+
+
+class LimitadorLLM:
+    """
+    Limitador de peticiones por minuto (RPM) y tokens por minuto (TPM),
+    compartido por todos los hilos que llaman al LLM. Cada llamada consume
+    una petición y una estimación de sus tokens de los dos cubos.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM):
+        self.tasas = (rpm / 60.0, tpm / 60.0)
+        self.capacidades = (max(1.0, rpm / 60.0), max(1.0, tpm / 60.0))
+        self._cubos = list(self.capacidades)
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def _rellenar(self, ahora: float) -> None:
+        transcurrido = ahora - self._ultimo
+        self._ultimo = ahora
+        for i in range(2):
+            self._cubos[i] = min(
+                self.capacidades[i], self._cubos[i] + transcurrido * self.tasas[i]
+            )
+
+    def pausar(self, segundos: float) -> None:
+        """Detiene todas las llamadas durante 'segundos' (tras un 429)."""
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+
+    def esperar(self, tokens: int = 1) -> None:
+        """Bloquea hasta que haya cupo para una petición de 'tokens' tokens."""
+        # Una petición más grande que el cubo entero se deja pasar con el cubo lleno
+        costes = (1.0, min(float(tokens), self.capacidades[1]))
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._rellenar(ahora)
+                espera = self._pausa_hasta - ahora
+                if espera <= 0:
+                    faltan = [
+                        (coste - cubo) / tasa
+                        for coste, cubo, tasa in zip(costes, self._cubos, self.tasas)
+                    ]
+                    espera = max(faltan)
+                    if espera <= 0:
+                        self._cubos = [c - coste for c, coste in zip(self._cubos, costes)]
+                        return
+            time.sleep(espera)
+
+
+_limitador = None
+_limitador_lock = threading.Lock()
+
+
+def obtener_limitador_llm() -> LimitadorLLM:
+    """Limitador compartido por todo el proceso."""
+    global _limitador
+    with _limitador_lock:
+        if _limitador is None:
+            _limitador = LimitadorLLM()
+    return _limitador
+
+
+def estimar_tokens(*textos, salida: int = 500) -> int:
+    """Estimación rápida de tokens (≈ 4 caracteres por token) más la respuesta."""
+    return sum(len(str(t)) for t in textos) // 4 + salida
+
+
+def es_error_de_cuota(error: Exception) -> bool:
+    """True si el error es un 429 (rate limit) de OpenAI/LiteLLM."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    texto = str(error).lower()
+    return "429" in texto or "rate limit" in texto or "ratelimit" in texto
+
+
+def llamar_llm(funcion, tokens: int, reintentos: int = 6, backoff: float = 2.0):
+    """
+    Ejecuta 'funcion()' (una llamada al LLM) respetando el limitador RPM/TPM.
+    Ante un 429 pausa a todos los hilos el tiempo de Retry-After (o un backoff
+    exponencial con jitter) y reintenta. El resto de errores se propagan.
+    """
+    limitador = obtener_limitador_llm()
+    for intento in range(reintentos + 1):
+        limitador.esperar(tokens)
+        try:
+            return funcion()
+        except Exception as e:
+            if not es_error_de_cuota(e) or intento == reintentos:
+                raise
+            respuesta = getattr(e, "response", None)
+            cabeceras = getattr(respuesta, "headers", None) or {}
+            espera = segundos_retry_after(
+                cabeceras.get("retry-after"),
+                backoff * 2**intento + random.uniform(0, backoff),
+            )
+            print(f"⏳ Límite del LLM alcanzado. Reintentando en {espera:.1f} s...")
+            limitador.pausar(espera)
+
+
+def mapear_llm(
+    funcion, elementos, max_workers: int = LLM_MAX_WORKERS, desc: str = None
+) -> list:
+    """
+    Aplica 'funcion' (que llama al LLM vía llamar_llm) a cada elemento con
+    'max_workers' hilos. Devuelve la lista de resultados en el orden de entrada.
+    """
+    elementos = list(elementos)
+    return list(
+        tqdm(
+            mapear_en_paralelo(funcion, elementos, max_workers=max_workers),
+            total=len(elementos),
+            desc=desc,
+        )
+    )
+
+
+class CacheLLM:
+    """
+    Caché persistente (SQLite) de respuestas del LLM, indexada por el hash de
+    (modelo, versión del prompt, entrada). Cuando supera 'max_bytes' se
+    eliminan las respuestas usadas hace más tiempo.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = None):
+        self.path = path
+        self.max_bytes = max_bytes or int(LLM_CACHE_MAX_MB * 1024 * 1024)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._db:
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS respuestas (
+                    clave TEXT PRIMARY KEY,
+                    modelo TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    valor TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    usado REAL NOT NULL,
+                    creado TEXT NOT NULL
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_respuestas_usado ON respuestas (usado)"
+            )
+
+    @staticmethod
+    def clave(modelo: str, version: str, entrada: str) -> str:
+        datos = "\x00".join((modelo, version, entrada)).encode("utf-8")
+        return hashlib.sha256(datos).hexdigest()
+
+    def get(self, clave: str):
+        """Devuelve la respuesta guardada (y la marca como usada) o None."""
+        with self._lock, self._db:
+            fila = self._db.execute(
+                "SELECT valor FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is not None:
+                self._db.execute(
+                    "UPDATE respuestas SET usado = ? WHERE clave = ?",
+                    (time.time(), clave),
+                )
+        return fila[0] if fila else None
+
+    def put(self, clave: str, modelo: str, version: str, valor: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    clave,
+                    modelo,
+                    version,
+                    valor,
+                    len(valor.encode("utf-8")),
+                    time.time(),
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+            self._desalojar()
+
+    def _desalojar(self) -> None:
+        """Borra las respuestas menos usadas hasta quedar en el 90% del límite."""
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM respuestas"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        objetivo = total - int(self.max_bytes * 0.9)
+        liberado = 0
+        claves = []
+        for clave, bytes_ in self._db.execute(
+            "SELECT clave, bytes FROM respuestas ORDER BY usado"
+        ):
+            if liberado >= objetivo:
+                break
+            claves.append((clave,))
+            liberado += bytes_
+        self._db.executemany("DELETE FROM respuestas WHERE clave = ?", claves)
+
+
+_cache = None
+
+
+def obtener_cache_llm() -> CacheLLM:
+    """Caché de respuestas compartida por todo el proceso."""
+    global _cache
+    with _limitador_lock:
+        if _cache is None:
+            _cache = CacheLLM()
+    return _cache
+
+
+def nombre_modelo(llm_client) -> str:
+    """Identificador del modelo (y su temperatura) de un cliente LLM de crewai."""
+    modelo = getattr(llm_client, "model", "desconocido")
+    temperatura = getattr(llm_client, "temperature", None)
+    return modelo if temperatura is None else f"{modelo}@{temperatura}"
+
+
+def extraer_json(respuesta: str, claves=()) -> dict:
+    """
+    Primer objeto JSON de la respuesta del LLM. Lanza ValueError si no lo
+    hay, está truncado o le falta alguna de 'claves'.
+    """
+    json_match = re.search(r"\{.*\}", respuesta or "", re.DOTALL)
+    if not json_match:
+        raise ValueError("La respuesta del LLM no contenía un JSON válido.")
+    datos = json.loads(json_match.group(0))
+    faltan = [c for c in claves if c not in datos]
+    if faltan:
+        raise ValueError(f"Faltan claves en la respuesta del LLM: {faltan}")
+    return datos
+
+
+def llamar_llm_cacheado(
+    funcion, modelo: str, version: str, entrada: str, tokens: int, validar=None
+) -> str:
+    """
+    Como llamar_llm, pero 'funcion()' debe devolver un str y su respuesta se
+    guarda en la caché con clave (modelo, versión del prompt, entrada). Con
+    USAR_CACHE_LLM = False no se lee de la caché, aunque sí se actualiza.
+
+    'validar(respuesta)' debe lanzar una excepción si la respuesta no sirve
+    (p. ej. un JSON truncado): entonces no se guarda y la excepción se
+    propaga. Las respuestas guardadas que no la superan se vuelven a pedir.
+    """
+    cache = obtener_cache_llm()
+    clave = CacheLLM.clave(modelo, version, entrada)
+    if USAR_CACHE_LLM:
+        valor = cache.get(clave)
+        if valor is not None:
+            try:
+                if validar is not None:
+                    validar(valor)
+                return valor
+            except Exception:
+                pass  # Respuesta inválida guardada antes de validar: se repite
+    valor = llamar_llm(funcion, tokens=tokens)
+    if validar is not None:
+        validar(valor)
+    cache.put(clave, modelo, version, valor)
+    return valor
@@ -0,0 +1,51 @@
+# Bytes del inicio del MP3 que bastan para leer la cabecera del primer frame
+BYTES_CABECERA_MP3 = 4096
+
+# Bitrates (kbps) de Layer III por índice: MPEG-1 y MPEG-2/2.5
+_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+
+def _tamano_id3(datos: bytes) -> int:
+    """Bytes que ocupa la etiqueta ID3v2 al principio del fichero (0 si no hay)."""
+    if len(datos) < 10 or datos[:3] != b"ID3":
+        return 0
+    tamano = 0
+    for byte in datos[6:10]:
+        tamano = (tamano << 7) | (byte & 0x7F)
+    return 10 + tamano
+
+
+def bitrate_mp3(cabecera: bytes) -> int:
+    """Bitrate (bits/s) del primer frame MPEG Layer III de 'cabecera', o None."""
+    inicio = _tamano_id3(cabecera)
+    for i in range(inicio, len(cabecera) - 3):
+        if cabecera[i] != 0xFF or (cabecera[i + 1] & 0xE0) != 0xE0:
+            continue
+        version = (cabecera[i + 1] >> 3) & 0b11  # 00 = 2.5, 10 = 2, 11 = 1
+        capa = (cabecera[i + 1] >> 1) & 0b11  # 01 = Layer III
+        indice = cabecera[i + 2] >> 4
+        if version == 0b01 or capa != 0b01 or indice in (0, 15):
+            continue
+        return _BITRATES[1 if version == 0b11 else 2][indice] * 1000
+    return None
+
+
+def duracion_mp3(cabecera: bytes, tamano: int) -> int:
+    """
+    Duración en segundos de un MP3 de bitrate constante (como los de Polly)
+    a partir de su cabecera y su tamaño total en bytes. None si no se reconoce.
+    """
+    bitrate = bitrate_mp3(cabecera)
+    if not bitrate:
+        return None
+    return round((tamano - _tamano_id3(cabecera)) * 8 / bitrate)
+
+
+def formatear_duracion(segundos: int) -> str:
+    """Duración en el formato HH:MM:SS de itunes:duration."""
+    minutos, segundos = divmod(int(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class PageStore:
+    """
+    Almacén de páginas HTML direccionado por contenido.
+
+    Cada página se guarda una sola vez, comprimida con gzip, en
+    objects/<ab>/<sha256>.gz; un índice SQLite (index.sqlite) relaciona cada
+    URL con el hash de su contenido y sus validadores HTTP (ETag y
+    Last-Modified). Las páginas idénticas servidas desde URLs distintas
+    (p. ej. cambios de idioma sin traducción) comparten el mismo objeto.
+    """
+
+    def __init__(self, root: str = "cache/http", compresslevel: int = 6):
+        self.root = root
+        self.compresslevel = compresslevel
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(root, "index.sqlite"), check_same_thread=False, timeout=30
+        )
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at TEXT NOT NULL
+                )
+                """
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_pages_sha ON pages (sha256)")
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256 + ".gz")
+
+    def put(
+        self,
+        url: str,
+        content: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> str:
+        """Guarda el contenido de la URL y devuelve su hash SHA-256."""
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = self.object_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wb", compresslevel=self.compresslevel) as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    sha256,
+                    len(content),
+                    etag,
+                    last_modified,
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                ),
+            )
+        return sha256
+
+    def info(self, url: str) -> Optional[dict]:
+        """Metadatos de la URL (hash, tamaño, validadores, fecha) o None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sha256, size, etag, last_modified, fetched_at FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("sha256", "size", "etag", "last_modified", "fetched_at"), row))
+
+    def get(self, url: str) -> Optional[bytes]:
+        """Contenido descomprimido de la URL, o None si no está almacenada."""
+        info = self.info(url)
+        if info is None:
+            return None
+        try:
+            with gzip.open(self.object_path(info["sha256"]), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def __contains__(self, url: str) -> bool:
+        info = self.info(url)
+        return info is not None and os.path.exists(self.object_path(info["sha256"]))
+
+    def stats(self) -> dict:
+        """Número de URLs y objetos, y bytes originales frente a bytes en disco."""
+        with self._lock:
+            urls, raw_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages"
+            ).fetchone()
+            hashes = [r[0] for r in self._db.execute("SELECT DISTINCT sha256 FROM pages")]
+        stored = sum(
+            os.path.getsize(self.object_path(h))
+            for h in hashes
+            if os.path.exists(self.object_path(h))
+        )
+        return {
+            "urls": urls,
+            "objects": len(hashes),
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored,
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    store = PageStore(sys.argv[1] if len(sys.argv) > 1 else "cache/http")
+    print(store.stats())
@@ -0,0 +1,167 @@
+import datetime
+import hashlib
+import json
+import os
+from xml.sax.saxutils import escape, quoteattr
+
+from iglesia.mp3_utils import formatear_duracion
+
+ITUNES_NS = "http://www.itunes.com/dtds/podcast-1.0.dtd"
+
+# Fragmentos <item> ya generados, por hash de los metadatos del episodio
+RSS_CACHE_PATH = os.environ.get("RSS_CACHE_PATH", "cache/rss_items.json")
+# Cambiar la versión al modificar el formato de los <item> invalida la caché
+VERSION_ITEM = "item-v2"
+
+
+def cdata(texto: str) -> str:
+    """Sección CDATA; un ']]>' dentro del texto se parte en dos secciones."""
+    return "<![CDATA[" + texto.replace("]]>", "]]]]><![CDATA[>") + "]]>"
+
+
+def elemento(nombre: str, texto=None, sangria: int = 0, **atributos) -> str:
+    """Línea con un elemento XML (texto escapado o vacío si texto es None)."""
+    attrs = "".join(f" {k}={quoteattr(str(v))}" for k, v in atributos.items())
+    prefijo = "  " * sangria
+    if texto is None:
+        return f"{prefijo}<{nombre}{attrs}/>\n"
+    return f"{prefijo}<{nombre}{attrs}>{escape(str(texto))}</{nombre}>\n"
+
+
+def hash_episodio(episodio: dict, extra: str = "") -> str:
+    datos = json.dumps(episodio, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{VERSION_ITEM}\n{extra}\n{datos}".encode()).hexdigest()
+
+
+class FeedPodcast:
+    """
+    Genera el RSS del podcast escribiendo el XML directamente en el fichero
+    (sin construir ni re-parsear un árbol en memoria). El <item> de cada
+    episodio se guarda en una caché en disco por hash de sus metadatos, así
+    que solo se generan los episodios nuevos o modificados.
+    """
+
+    def __init__(
+        self,
+        titulo: str,
+        enlace: str,
+        descripcion: str,
+        idioma: str,
+        autor: str,
+        email: str,
+        imagen: str,
+        categoria: str = "Religion & Spirituality",
+        subcategoria: str = "Christianity",
+        ruta_cache: str = RSS_CACHE_PATH,
+    ):
+        self.titulo = titulo
+        self.enlace = enlace
+        self.descripcion = descripcion
+        self.idioma = idioma
+        self.autor = autor
+        self.email = email
+        self.imagen = imagen
+        self.categoria = categoria
+        self.subcategoria = subcategoria
+        self.ruta_cache = ruta_cache
+        self.generados = 0
+        self.reutilizados = 0
+
+    def cabecera(self) -> str:
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<rss xmlns:itunes="{ITUNES_NS}" version="2.0">\n'
+            "  <channel>\n"
+            + elemento("title", self.titulo, 2)
+            + elemento("link", self.enlace, 2)
+            + elemento("language", self.idioma, 2)
+            + elemento("description", self.descripcion, 2)
+            + elemento("itunes:author", self.autor, 2)
+            + elemento("itunes:image", None, 2, href=self.imagen)
+            + "    <itunes:owner>\n"
+            + elemento("itunes:name", self.autor, 3)
+            + elemento("itunes:email", self.email, 3)
+            + "    </itunes:owner>\n"
+            + f"    <itunes:category text={quoteattr(self.categoria)}>\n"
+            + elemento("itunes:category", None, 3, text=self.subcategoria)
+            + "    </itunes:category>\n"
+        )
+
+    def item(self, episodio: dict) -> str:
+        """Fragmento <item> de un episodio de episodes_metadata.json."""
+        audio_url = episodio["url_audio"]
+        fecha = datetime.datetime.strptime(episodio["fecha"], "%Y-%m-%d")
+        lineas = [
+            "    <item>\n",
+            elemento("title", episodio["titulo_spotify"], 3),
+            "      <description>"
+            + cdata(episodio["descripcion_spotify"])
+            + "</description>\n",
+            elemento("pubDate", fecha.strftime("%a, %d %b %Y 12:00:00 GMT"), 3),
+            elemento(
+                "enclosure",
+                None,
+                3,
+                url=audio_url,
+                type="audio/mpeg",
+                # Como antes de guardar el tamaño: algunos validadores
+                # rechazan length=0
+                length=episodio.get("audio_bytes") or 1,
+            ),
+            elemento("guid", audio_url, 3),
+            elemento("itunes:author", self.autor, 3),
+            elemento("itunes:image", None, 3, href=self.imagen),
+            elemento("itunes:episode", episodio["numero_episodio"], 3),
+        ]
+        if episodio.get("audio_duracion"):
+            duracion = formatear_duracion(episodio["audio_duracion"])
+            lineas.append(elemento("itunes:duration", duracion, 3))
+        lineas.append("    </item>\n")
+        return "".join(lineas)
+
+    def _leer_cache(self) -> dict:
+        if not self.ruta_cache or not os.path.exists(self.ruta_cache):
+            return {}
+        try:
+            with open(self.ruta_cache, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar_cache(self, fragmentos: dict):
+        if not self.ruta_cache:
+            return
+        os.makedirs(os.path.dirname(self.ruta_cache) or ".", exist_ok=True)
+        tmp = self.ruta_cache + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(fragmentos, f, ensure_ascii=False)
+        os.replace(tmp, self.ruta_cache)
+
+    def escribir(self, episodios, ruta_salida: str):
+        """
+        Escribe el feed con los episodios en el orden dado. Se escribe en un
+        fichero temporal que sustituye al anterior al terminar.
+        """
+        cache = self._leer_cache()
+        # Los datos del canal que aparecen en cada <item> también forman la clave
+        extra = f"{self.autor}\n{self.imagen}"
+        usados = {}
+        self.generados = self.reutilizados = 0
+        tmp = ruta_salida + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.cabecera())
+            for episodio in episodios:
+                clave = hash_episodio(episodio, extra)
+                fragmento = cache.get(clave)
+                if fragmento is None:
+                    fragmento = self.item(episodio)
+                    self.generados += 1
+                else:
+                    self.reutilizados += 1
+                usados[clave] = fragmento
+                f.write(fragmento)
+            f.write("  </channel>\n</rss>\n")
+        os.replace(tmp, ruta_salida)
+        # Solo se conservan los fragmentos del feed actual
+        if usados != cache:
+            self._guardar_cache(usados)
@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+
+# Tamaño de cada parte de una subida multiparte (S3 exige >= 5 MiB salvo la última)
+S3_TAM_PARTE = int(os.environ.get("S3_TAM_PARTE", str(8 * 1024 * 1024)))
+S3_TAM_PARTE_MIN = 5 * 1024 * 1024
+
+# Inventario del bucket persistido en disco (opcional, p. ej.
+# S3_INVENTARIO_CACHE=cache/s3_inventario.json para backfills de muchas semanas)
+S3_INVENTARIO_CACHE = os.environ.get("S3_INVENTARIO_CACHE", "")
+S3_INVENTARIO_MAX_HORAS = float(os.environ.get("S3_INVENTARIO_MAX_HORAS", "12"))
+
+_regiones = {}
+_regiones_lock = threading.Lock()
+
+
+def region_bucket(s3_client, bucket_name) -> str:
+    """Región del bucket, consultada una sola vez por proceso."""
+    with _regiones_lock:
+        if bucket_name not in _regiones:
+            ubicacion = s3_client.get_bucket_location(Bucket=bucket_name)
+            _regiones[bucket_name] = ubicacion["LocationConstraint"] or "us-east-1"
+        return _regiones[bucket_name]
+
+
+def url_publica(s3_client, bucket_name, key) -> str:
+    region = region_bucket(s3_client, bucket_name)
+    return f"https://{bucket_name}.s3.{region}.amazonaws.com/{key}"
+
+
+class InventarioS3:
+    """
+    Claves de un bucket bajo un prefijo (con su tamaño en bytes), obtenidas
+    con un único listado paginado (list_objects_v2) en lugar de un head_object
+    por fichero.
+
+    Con 'ruta_cache' el listado se guarda en disco y se reutiliza durante
+    'max_horas' si cubre el prefijo pedido; las claves subidas después se
+    añaden con 'anadir', así que el inventario no se queda atrás.
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        bucket_name,
+        prefijo="",
+        ruta_cache=S3_INVENTARIO_CACHE,
+        max_horas=S3_INVENTARIO_MAX_HORAS,
+    ):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.prefijo = prefijo
+        self.ruta_cache = ruta_cache
+        self.max_horas = max_horas
+        self._claves = None
+        self._lock = threading.RLock()
+
+    def _leer_cache(self):
+        if not self.ruta_cache or not os.path.exists(self.ruta_cache):
+            return None
+        try:
+            with open(self.ruta_cache, encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (
+            datos.get("bucket") != self.bucket_name
+            or not self.prefijo.startswith(datos.get("prefijo", ""))
+            or time.time() - datos.get("listado", 0) > self.max_horas * 3600
+        ):
+            return None
+        claves = datos["claves"]
+        return {c: t for c, t in claves.items() if c.startswith(self.prefijo)}
+
+    def _guardar_cache(self, listado=None):
+        if not self.ruta_cache:
+            return
+        datos = {
+            "bucket": self.bucket_name,
+            "prefijo": self.prefijo,
+            "listado": listado or time.time(),
+            "claves": dict(sorted(self._claves.items())),
+        }
+        if listado is None and os.path.exists(self.ruta_cache):
+            # Conservar la fecha y el prefijo del listado original
+            with open(self.ruta_cache, encoding="utf-8") as f:
+                anterior = json.load(f)
+            if anterior.get("bucket") == self.bucket_name:
+                datos["listado"] = anterior.get("listado", datos["listado"])
+                datos["prefijo"] = anterior.get("prefijo", self.prefijo)
+                claves = {**anterior["claves"], **self._claves}
+                datos["claves"] = dict(sorted(claves.items()))
+        os.makedirs(os.path.dirname(self.ruta_cache) or ".", exist_ok=True)
+        tmp = self.ruta_cache + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+        os.replace(tmp, self.ruta_cache)
+
+    def listar(self) -> dict:
+        """Lista el bucket (una petición por cada 1000 claves) y guarda la caché."""
+        claves = {}
+        paginador = self.s3_client.get_paginator("list_objects_v2")
+        paginas = paginador.paginate(Bucket=self.bucket_name, Prefix=self.prefijo)
+        for pagina in paginas:
+            claves.update((o["Key"], o["Size"]) for o in pagina.get("Contents", []))
+        self._claves = claves
+        self._guardar_cache(listado=time.time())
+        print(f"☁️ Inventario de S3: {len(claves)} ficheros en '{self.prefijo}*'.")
+        return claves
+
+    def claves(self) -> dict:
+        """{clave: tamaño en bytes} de los ficheros del bucket bajo el prefijo."""
+        with self._lock:
+            if self._claves is None:
+                self._claves = self._leer_cache()
+            if self._claves is None:
+                self.listar()
+            return self._claves
+
+    def __contains__(self, key) -> bool:
+        return key in self.claves()
+
+    def tamano(self, key) -> int:
+        return self.claves().get(key)
+
+    def anadir(self, key, tamano=None):
+        """Registra una clave recién subida (también en la caché en disco)."""
+        with self._lock:
+            self.claves()[key] = tamano
+            self._guardar_cache()
+
+
+def leer_inicio(s3_client, bucket_name, key, n_bytes) -> bytes:
+    """Primeros 'n_bytes' de un objeto (petición con Range)."""
+    respuesta = s3_client.get_object(
+        Bucket=bucket_name, Key=key, Range=f"bytes=0-{n_bytes - 1}"
+    )
+    return respuesta["Body"].read()
+
+
+def subir_en_partes(
+    s3_client,
+    bucket_name,
+    key,
+    bloques,
+    content_type="audio/mpeg",
+    tam_parte=S3_TAM_PARTE,
+):
+    """
+    Sube a S3 el contenido de un iterable de bloques de bytes con una subida
+    multiparte, enviando cada parte en cuanto se llenan 'tam_parte' bytes: en
+    memoria solo hay una parte a la vez. Si el iterable o S3 fallan, la subida
+    se aborta y se relanza la excepción. Devuelve el número de bytes subidos.
+    """
+    tam_parte = max(tam_parte, S3_TAM_PARTE_MIN)
+    subida = s3_client.create_multipart_upload(
+        Bucket=bucket_name, Key=key, ContentType=content_type
+    )
+    upload_id = subida["UploadId"]
+    partes = []
+    total = 0
+
+    def _enviar(datos):
+        respuesta = s3_client.upload_part(
+            Bucket=bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=len(partes) + 1,
+            Body=bytes(datos),
+        )
+        partes.append({"ETag": respuesta["ETag"], "PartNumber": len(partes) + 1})
+
+    try:
+        buffer = bytearray()
+        for bloque in bloques:
+            buffer += bloque
+            total += len(bloque)
+            while len(buffer) >= tam_parte:
+                _enviar(buffer[:tam_parte])
+                del buffer[:tam_parte]
+        if buffer or not partes:
+            _enviar(buffer)
+        s3_client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": partes},
+        )
+    except BaseException:
+        s3_client.abort_multipart_upload(
+            Bucket=bucket_name, Key=key, UploadId=upload_id
+        )
+        raise
+    return total
@@ -0,0 +1,17 @@
+import pytest
+
+from iglesia import catalogo, llm_utils
+
+
+@pytest.fixture(autouse=True)
+def cache_llm_temporal(tmp_path, monkeypatch):
+    """Cada test usa su propia caché del LLM en lugar de cache/llm.sqlite."""
+    cache = llm_utils.CacheLLM(str(tmp_path / "llm.sqlite"))
+    monkeypatch.setattr(llm_utils, "_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def catalogo_temporal(tmp_path, monkeypatch):
+    """El catálogo de episodios se crea en tmp_path, no en cache/."""
+    monkeypatch.setattr(catalogo, "CATALOGO_PATH", str(tmp_path / "episodios.sqlite"))
@@ -0,0 +1,151 @@
+import io
+import threading
+import time
+
+from iglesia import audio_utils
+
+
+class PollyFalso:
+    """Imita polly_client.synthesize_speech con una latencia fija por llamada."""
+
+    def __init__(self, latencia=0.05, fallar_en=None):
+        self.latencia = latencia
+        self.fallar_en = fallar_en
+        self.llamadas = []
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self._lock = threading.Lock()
+
+    def synthesize_speech(self, Text, **kwargs):
+        with self._lock:
+            self.llamadas.append(kwargs)
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            time.sleep(self.latencia)
+            if self.fallar_en is not None and self.fallar_en in Text:
+                raise RuntimeError("ThrottlingException")
+            return {"AudioStream": io.BytesIO(f"<{Text[:3]}>".encode())}
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+
+
+def test_synthesize_speech_en_paralelo_y_en_orden():
+    texto = "".join(f"{i:03d}" * 1000 for i in range(6))  # 6 fragmentos
+    polly = PollyFalso()
+
+    inicio = time.monotonic()
+    audio = audio_utils.synthesize_speech(texto, polly, max_workers=6)
+    duracion = time.monotonic() - inicio
+
+    assert audio == b"".join(f"<{i:03d}>".encode() for i in range(6))
+    assert polly.max_en_curso == 6
+    assert duracion < 6 * polly.latencia
+    assert polly.llamadas[0]["Engine"] == "long-form"
+
+
+def test_synthesize_speech_respeta_el_limite_de_hilos():
+    polly = PollyFalso(latencia=0.01)
+    audio_utils.synthesize_speech("x" * 30000, polly, max_workers=3)
+    assert len(polly.llamadas) == 10
+    assert polly.max_en_curso <= 3
+
+
+def test_synthesize_speech_devuelve_none_si_falla_un_fragmento():
+    texto = "a" * 3000 + "b" * 3000
+    assert audio_utils.synthesize_speech(texto, PollyFalso(fallar_en="b")) is None
+
+
+def test_synthesize_speech_en_ssml():
+    polly = PollyFalso(latencia=0)
+    audio_utils.synthesize_speech("Hola & adiós.\nFin.", polly, ssml=True)
+    assert polly.llamadas[0]["TextType"] == "ssml"
+
+
+def test_longitud_valida_sin_limite_maximo_por_defecto(monkeypatch):
+    enciclica = "Frase de una encíclica. " * 5000
+    assert audio_utils.longitud_valida(enciclica)
+    assert not audio_utils.longitud_valida("Demasiado corto.")
+    monkeypatch.setattr(audio_utils, "MAX_CHARS_EPISODIO", 20000)
+    assert not audio_utils.longitud_valida(enciclica)
+
+
+def test_procesar_episodios_en_pipeline_y_en_orden(tmp_path, monkeypatch):
+    import json
+
+    import boto3
+    from moto import mock_aws
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("S3_BUCKET_NAME", "igles-ia-test")
+    latencia = 0.1
+    episodios = {
+        str(i): {
+            "fecha": f"2025-06-{i + 1:02d}",
+            "titulo": f"Homilía {i}",
+            "tipo": "Homilía",
+            "filename": f"2025-06-{i + 1:02d}_homilia_{i}",
+            "url": f"https://www.vatican.va/{i}.html",
+            # El episodio 3 es demasiado corto y se descarta
+            "texto": "Frase. " * (10 if i == 3 else 300),
+        }
+        for i in range(8)
+    }
+    ruta = tmp_path / "episodes.json"
+    ruta.write_text(json.dumps(episodios))
+
+    def limpiar(texto):
+        time.sleep(latencia)
+        return texto.strip()
+
+    def metadatos(texto, episodio, llm_client):
+        time.sleep(latencia)
+        return {"titulo_spotify": episodio["titulo"], "descripcion_spotify": ""}
+
+    monkeypatch.setattr(audio_utils, "extract_clean_text", limpiar)
+    monkeypatch.setattr(audio_utils, "generar_metadatos_episodio", metadatos)
+    polly = PollyFalso(latencia=latencia)
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="igles-ia-test")
+        s3.put_object(Bucket="igles-ia-test", Key="2025-06-01_homilia_0.mp3", Body=b"")
+        clientes = {"s3": s3, "polly": polly}
+        monkeypatch.setattr(
+            audio_utils.boto3, "client", lambda nombre, **kw: clientes[nombre]
+        )
+
+        inicio = time.monotonic()
+        procesados = audio_utils.procesar_y_generar_episodios(str(ruta), None)
+        duracion = time.monotonic() - inicio
+
+    assert [p["titulo_original"] for p in procesados] == [
+        f"Homilía {i}" for i in range(8) if i != 3
+    ]
+    assert [p["is_new"] for p in procesados] == [False] + [True] * 6
+    # Tres etapas de 'latencia' cada una; en serie serían 8 * 3 * latencia
+    assert duracion < 8 * latencia
+
+
+def test_etapas_se_solapan_con_pocos_episodios():
+    # Menos episodios que la ventana de cada etapa: el primero debe llegar a la
+    # última etapa mientras la primera sigue con los demás
+    primero_sintetizado = threading.Event()
+    vistos_durante_la_limpieza = []
+
+    def limpiar(i):
+        if i > 0:
+            vistos_durante_la_limpieza.append(primero_sintetizado.wait(timeout=2))
+        return i
+
+    def sintetizar(i):
+        primero_sintetizado.set()
+        return i
+
+    limpios = audio_utils.mapear_en_etapa(limpiar, range(4), max_workers=8)
+    con_metadatos = audio_utils.mapear_en_etapa(lambda i: i, limpios, max_workers=8)
+    resultados = audio_utils.mapear_en_etapa(sintetizar, con_metadatos, max_workers=2)
+
+    assert list(resultados) == [0, 1, 2, 3]
+    assert vistos_durante_la_limpieza == [True] * 3
@@ -0,0 +1,110 @@
+import json
+import os
+
+import pytest
+
+from iglesia.catalogo import CatalogoEpisodios
+
+
+def _episodio(numero, fecha="2025-08-04", **extra):
+    return {
+        "titulo_spotify": f"[{numero}] Homilía",
+        "url_audio": f"https://audio.example/{numero}.mp3",
+        "fecha": fecha,
+        "filename": f"{fecha}_homilia_{numero}",
+        "tipo": "Homilia",
+        "numero_episodio": numero,
+        "vatican_url": f"https://www.vatican.va/{numero}.html",
+        "is_new": False,
+        **extra,
+    }
+
+
+@pytest.fixture
+def json_rss(tmp_path):
+    for run_date, episodios in {
+        "2025-08-04": [_episodio("13.1"), _episodio("13.2")],
+        "2025-08-11": [_episodio("14.1", "2025-08-11"), _episodio("9.10")],
+    }.items():
+        (tmp_path / run_date).mkdir()
+        (tmp_path / run_date / "episodes_metadata.json").write_text(
+            json.dumps(episodios)
+        )
+    return tmp_path
+
+
+def test_catalogo_nuevo_importa_json_rss_ordenado(json_rss):
+    catalogo = CatalogoEpisodios(json_base_dir=str(json_rss))
+
+    numeros = [e["numero_episodio"] for e in catalogo.episodios()]
+    assert numeros == ["14.1", "13.2", "13.1", "9.10"]
+    assert [e["numero_episodio"] for e in catalogo.episodios(fecha="2025-08-11")] == [
+        "14.1"
+    ]
+    url = "https://www.vatican.va/13.2.html"
+    assert catalogo.por_vatican_url(url)["filename"] == "2025-08-04_homilia_13.2"
+    # Los episodios importados ya estaban publicados: no se notifican
+    assert catalogo.pendientes_de_notificar(["2025-08-04_homilia_13.1"]) == []
+
+
+def test_registrar_sustituye_los_episodios_de_la_fecha(json_rss):
+    catalogo = CatalogoEpisodios(json_base_dir=str(json_rss))
+    nuevo = _episodio("13.3", audio_bytes=1000)
+
+    # Como generar_audios: primero se escribe el JSON y después se registra
+    episodios = [_episodio("13.1"), nuevo]
+    (json_rss / "2025-08-04" / "episodes_metadata.json").write_text(
+        json.dumps(episodios) + "\n"
+    )
+    catalogo.registrar("2025-08-04", episodios)
+
+    numeros = [e["numero_episodio"] for e in catalogo.episodios(descendente=False)]
+    assert numeros == ["9.10", "13.1", "13.3", "14.1"]
+    pendientes = catalogo.pendientes_de_notificar(
+        ["2025-08-04_homilia_13.1", nuevo["filename"]]
+    )
+    assert pendientes == [nuevo]
+    catalogo.marcar_notificado(nuevo["filename"])
+    assert catalogo.pendientes_de_notificar([nuevo["filename"]]) == []
+
+    # Reabrir el catálogo no vuelve a importar el JSON ya registrado
+    catalogo = CatalogoEpisodios(json_base_dir=str(json_rss))
+    assert len(catalogo.episodios()) == 4
+    assert catalogo.pendientes_de_notificar([nuevo["filename"]]) == []
+
+
+def test_catalogo_se_sincroniza_con_los_json_modificados(json_rss):
+    catalogo = CatalogoEpisodios(json_base_dir=str(json_rss))
+    catalogo.close()
+
+    # Otra ejecución (p. ej. un 'git pull') cambia un JSON, añade otro y
+    # borra un tercero sin pasar por el catálogo
+    ruta = json_rss / "2025-08-04" / "episodes_metadata.json"
+    ruta.write_text(json.dumps([_episodio("13.1", audio_bytes=5)]))
+    (json_rss / "2025-08-18").mkdir()
+    (json_rss / "2025-08-18" / "episodes_metadata.json").write_text(
+        json.dumps([_episodio("15.1", "2025-08-18")])
+    )
+    (json_rss / "2025-08-11" / "episodes_metadata.json").unlink()
+
+    catalogo = CatalogoEpisodios(json_base_dir=str(json_rss))
+    numeros = [e["numero_episodio"] for e in catalogo.episodios()]
+    assert numeros == ["15.1", "13.1"]
+    assert catalogo.episodios(fecha="2025-08-04")[0]["audio_bytes"] == 5
+    assert catalogo.pendientes_de_notificar(["2025-08-18_homilia_15.1"]) == []
+
+    # Mismo tamaño, otro mtime: también se vuelve a importar
+    ruta.write_text(json.dumps([_episodio("13.1", audio_bytes=7)]))
+    os.utime(ruta, ns=(1, 1))
+    catalogo = CatalogoEpisodios(json_base_dir=str(json_rss))
+    assert catalogo.episodios(fecha="2025-08-04")[0]["audio_bytes"] == 7
+
+
+def test_consultas_usan_los_indices(json_rss):
+    catalogo = CatalogoEpisodios(json_base_dir=str(json_rss))
+    plan = catalogo._db.execute(
+        "EXPLAIN QUERY PLAN SELECT datos FROM episodios WHERE vatican_url = ?", ("x",)
+    ).fetchall()
+    assert "idx_episodios_vatican_url" in str([tuple(fila) for fila in plan])
+    with pytest.raises(ValueError):
+        catalogo.episodios(titulo="x")
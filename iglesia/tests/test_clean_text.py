@@ -2,6 +2,7 @@ import re
 
 import pytest
 
+from iglesia import clean_text
 from iglesia.clean_text import extract_clean_text
 
 # Ejemplo de texto original (simulado)
@@ -17,10 +18,32 @@ Saludo a los peregrinos de lengua española.
 """
 
 
+class OpenAIFalso:
+    """Imita client.responses.parse devolviendo siempre la misma frase."""
+
+    def __init__(self, frase):
+        self.llamadas = 0
+        self.responses = self
+        self.frase = frase
+
+    def parse(self, **kwargs):
+        self.llamadas += 1
+        salida = clean_text.DiscursoBoundaries(frase_inicio_discurso=self.frase)
+        return type("Respuesta", (), {"output_parsed": salida})
+
+
 # Test básico
-def test_extract_clean_text():
+def test_extract_clean_text(monkeypatch, cache_llm_temporal):
+    cliente = OpenAIFalso("¡Buenos días a todas!")
+    monkeypatch.setattr(clean_text, "obtener_cliente", lambda: cliente)
+
     x = extract_clean_text(TEXTO_EJEMPLO)
-    pass
+    assert x.startswith("¡Buenos días a todas!")
+    assert "Saludo a los peregrinos" in x
+
+    # La segunda vez la respuesta sale de la caché (temporal) del LLM
+    assert extract_clean_text(TEXTO_EJEMPLO) == x
+    assert cliente.llamadas == 1
 
 
 def inc(x):
@@ -29,3 +52,79 @@ def inc(x):
 
 def test_answer():
     assert inc(3) == 4
+
+
+ANGELUS = """POPE LEO XIV
+ANGELUS
+Saint Peter's Square Sunday, 22 June 2025
+[ Multimedia ]
+________________________________________
+Dear brothers and sisters, happy Sunday!
+Today, in many countries, the Solemnity of Corpus Christi is being celebrated.
+Saludos
+After the Angelus
+"""
+
+ENCICLICA = """CARTA ENCÍCLICA
+RERUM NOVARUM
+DEL SUMO PONTÍFICE
+LEÓN XIII
+SOBRE LA SITUACIÓN DE LOS OBREROS
+
+Venerables hermanos: Salud y bendición apostólica.
+1. Despertado el prurito revolucionario que desde hace ya tiempo agita a los pueblos, era de esperar que el afán de cambiarlo todo llegara un día a derramarse desde el campo de la política al terreno, con él colindante, de la economía.
+"""
+
+
+def test_detector_reconoce_saludo_tras_la_cabecera():
+    inicio, confianza = clean_text.detectar_inicio_discurso(ANGELUS)
+    assert ANGELUS[inicio:].startswith("Dear brothers and sisters")
+    assert confianza >= clean_text.UMBRAL_CONFIANZA
+
+
+def test_detector_salta_los_titulos_de_una_enciclica():
+    inicio, confianza = clean_text.detectar_inicio_discurso(ENCICLICA)
+    assert ENCICLICA[inicio:].startswith("Venerables hermanos")
+    assert confianza >= clean_text.UMBRAL_CONFIANZA
+
+
+def test_detector_con_confianza_baja_corta_tras_el_separador():
+    inicio, confianza = clean_text.detectar_inicio_discurso(TEXTO_EJEMPLO)
+    assert TEXTO_EJEMPLO[inicio:].startswith("Ave María Purísima:")
+    assert confianza < clean_text.UMBRAL_CONFIANZA
+
+
+@pytest.mark.parametrize(
+    "rotulo",
+    [
+        'Monseñor Fisichella: "¡Santo Padre, muchas gracias! Sobre todo por '
+        'habernos recibido esta mañana aquí en Tor Vergata."',
+        "Primeras palabras antes de la celebración:",
+    ],
+)
+def test_detector_no_confia_en_rotulos_tras_el_separador(rotulo):
+    texto = f"HOMILÍA\n[ Multimedia ]\n_____\n{rotulo}\nBuenos días y feliz domingo\n"
+    inicio, confianza = clean_text.detectar_inicio_discurso(texto)
+    assert confianza < clean_text.UMBRAL_CONFIANZA
+
+
+def test_detector_salta_los_apartados_numerados_de_una_enciclica():
+    texto = (
+        "CARTA ENCÍCLICA\nEVANGELII PRAECONES\n"
+        "1. Motivo: 25.º aniversario de la «Rerum Ecclesiae»\n"
+        "Los heraldos del Evangelio, que trabajan fatigosamente en la viña del "
+        "Señor, dirigen hoy hacia Nos su mirada.\n"
+    )
+    inicio, confianza = clean_text.detectar_inicio_discurso(texto)
+    assert texto[inicio:].startswith("Los heraldos del Evangelio")
+    assert confianza >= clean_text.UMBRAL_CONFIANZA
+
+
+def test_extract_clean_text_no_llama_al_llm_si_hay_confianza(monkeypatch):
+    def sin_llm(*args):
+        raise AssertionError("No debería consultarse al LLM")
+
+    monkeypatch.setattr(clean_text, "_inicio_con_llm", sin_llm)
+    texto = extract_clean_text(ANGELUS)
+    assert texto.startswith("Dear brothers and sisters, happy Sunday!")
+    assert "After the Angelus" not in texto
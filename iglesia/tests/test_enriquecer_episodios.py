@@ -0,0 +1,145 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# El script importa crewai al cargarse
+pytest.importorskip("crewai")
+
+# vatican-archiver/ no es un paquete: se importa desde su propia carpeta
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "vatican-archiver")
+)
+
+import vatican_archive_enriquecer_episodios as enriquecer  # noqa: E402
+
+
+def _metadatos(i, frases):
+    return {
+        "titulo_spotify": f"Episodio {i}",
+        "descripcion_spotify": "Descripción",
+        "titulo_youtube": f"Vídeo {i}",
+        "mensaje_instagram": "Mensaje",
+        "frases_seleccionadas": frases,
+    }
+
+
+# Respuestas reales del LLM: lista, frase suelta, objeto y valores por defecto
+# (sin frases) cuando la respuesta no era un JSON válido
+METADATOS = [
+    _metadatos(0, ["Paz a vosotros.", "No tengáis miedo."]),
+    _metadatos(1, "Una sola frase."),
+    {**_metadatos(2, [{"frase": "Amaos."}]), "titulo_youtube": ["Dos", "títulos"]},
+    {"titulo_spotify": "[13.4] Homilía", "descripcion_spotify": "Texto..."},
+    _metadatos(4, []),
+]
+
+
+@pytest.fixture
+def entrada(tmp_path):
+    links = pd.DataFrame(
+        {
+            "pope": "leo-xiv",
+            "lang": "es",
+            "link": [f"https://www.vatican.va/doc{i}.html" for i in range(5)],
+            "title_human": [f"Homilía {i}" for i in range(5)],
+            "title": [f"2025060{i + 1}-omelia.html" for i in range(5)],
+            "type": "homilies",
+            "date": [f"2025-06-0{i + 1}" for i in range(5)],
+        }
+    )
+    otro_idioma = links.assign(lang="en", title=links["title"] + ".en")
+    pd.concat([links, otro_idioma]).to_parquet(tmp_path / "all_links.parquet")
+    pd.DataFrame({"type": ["homilies"], "tipo": ["Homilía"]}).to_csv(
+        tmp_path / "types.csv", index=False
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def llm_falso(monkeypatch):
+    """mapear_llm sin LLM: devuelve METADATOS y puede fallar en un lote."""
+    estado = {"fallar_en": None, "lotes": []}
+
+    def mapear_llm(funcion, elementos, max_workers=None, desc=None):
+        elementos = list(elementos)
+        if desc == "Limpiando textos":
+            return [f"Texto limpio {texto}" for texto in elementos]
+        indices = [int(fila["titulo"].split()[-1]) for fila in elementos]
+        estado["lotes"].append(indices)
+        if estado["fallar_en"] in indices:
+            raise RuntimeError("Caída a mitad de la ejecución")
+        return [METADATOS[i] for i in indices]
+
+    monkeypatch.setattr(enriquecer, "mapear_llm", mapear_llm)
+    monkeypatch.setattr(
+        enriquecer, "extraer_homilia", lambda fila: {"texto": fila["titulo"]}
+    )
+    return estado
+
+
+def _enriquecer(entrada):
+    enriquecer.enriquecer_episodios(
+        path_all_links=str(entrada / "all_links.parquet"),
+        path_types_list=str(entrada / "types.csv"),
+        path_output=str(entrada / "salida"),
+        tamano_lote=2,
+        max_workers=1,
+    )
+
+
+def test_guardar_lote_normaliza_los_tipos_del_llm(tmp_path):
+    lote = pd.DataFrame([{"title": f"t{i}", **m} for i, m in enumerate(METADATOS)])
+
+    ruta = enriquecer.guardar_lote(lote, str(tmp_path))
+
+    guardado = pd.read_parquet(ruta)
+    frases = [None if f is None else list(f) for f in guardado["frases_seleccionadas"]]
+    assert frases == [
+        ["Paz a vosotros.", "No tengáis miedo."],
+        ["Una sola frase."],
+        ['{"frase": "Amaos."}'],
+        None,
+        [],
+    ]
+    titulos = guardado["titulo_youtube"]
+    assert titulos.isna().tolist() == [False, False, False, True, False]
+    assert titulos.dropna().tolist() == [
+        "Vídeo 0",
+        "Vídeo 1",
+        '["Dos", "títulos"]',
+        "Vídeo 4",
+    ]
+
+
+def test_reanuda_por_lotes_y_compacta(entrada, llm_falso):
+    llm_falso["fallar_en"] = 2
+    with pytest.raises(RuntimeError):
+        _enriquecer(entrada)
+    # El primer lote quedó guardado en parts/ antes de la caída
+    assert llm_falso["lotes"] == [[0, 1], [2, 3]]
+    partes = enriquecer._partes(str(entrada / "salida"))
+    assert len(partes) == 1
+    assert enriquecer.slugs_enriquecidos(str(entrada / "salida")) == {
+        "20250601-omelia.html",
+        "20250602-omelia.html",
+    }
+
+    llm_falso["fallar_en"] = None
+    _enriquecer(entrada)
+
+    # Solo se piden los episodios que faltaban, y los lotes se consolidan
+    assert llm_falso["lotes"][2:] == [[2, 3], [4]]
+    assert enriquecer._partes(str(entrada / "salida")) == []
+    final = pd.read_parquet(entrada / "salida" / "all_links_enriched.parquet")
+    assert final["titulo"].tolist() == [f"Homilía {i}" for i in range(5)]
+    # La numeración de la semana continúa tras la reanudación
+    assert final["numero_episodio"].tolist() == ["4.1", "5.1", "5.2", "5.3", "5.4"]
+    assert list(final["frases_seleccionadas"][1]) == ["Una sola frase."]
+    json_final = pd.read_json(entrada / "salida" / "all_links_enriched.json")
+    assert len(json_final) == 5
+
+    # Sin homilías nuevas no se vuelve a llamar al LLM
+    _enriquecer(entrada)
+    assert len(llm_falso["lotes"]) == 4
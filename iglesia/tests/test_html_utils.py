@@ -0,0 +1,49 @@
+import glob
+import os
+
+import pytest
+
+from iglesia.html_utils import (
+    BACKENDS,
+    extraer_enlaces_contenido,
+    extraer_enlaces_indice,
+    extraer_texto_documento,
+)
+
+CARPETA_HTML = os.path.join(
+    os.path.dirname(__file__), "..", "..", "vatican-archiver", "documents", "vatican_html"
+)
+# Una muestra de los HTML cacheados para que el test sea rápido
+DOCUMENTOS = sorted(glob.glob(os.path.join(CARPETA_HTML, "**", "*.html"), recursive=True))[::5]
+
+INDICE_HTML = """<html><head><meta charset="utf-8"></head><body>
+<div class="vaticanindex"><ul>
+<li><a href="/content/leo-xiv/es/angelus/2025/documents/20250525-regina-caeli.html">
+  Regina Caeli, <i>25 de mayo</i> de 2025</a></li>
+<li>Sin enlace</li>
+<li><a href="/content/leo-xiv/es/angelus/2025/documents/20250518-regina-caeli.html">Regina Caeli, 18 de mayo</a></li>
+</ul></div></body></html>"""
+
+
+def test_indice_mismo_resultado_en_todos_los_backends():
+    resultados = [extraer_enlaces_indice(INDICE_HTML, backend) for backend in BACKENDS]
+    assert resultados[0] == resultados[1]
+    assert [e["titulo"] for e in resultados[0]] == [
+        "Regina Caeli,25 de mayode 2025",
+        "Regina Caeli, 18 de mayo",
+    ]
+    assert extraer_enlaces_indice("<html><body></body></html>", "lxml") is None
+
+
+@pytest.mark.skipif(not DOCUMENTOS, reason="No hay HTML cacheados del Vaticano")
+@pytest.mark.parametrize("ruta", DOCUMENTOS, ids=os.path.basename)
+def test_paridad_lxml_con_html_parser(ruta):
+    with open(ruta, "rb") as f:
+        html = f.read()
+
+    assert extraer_texto_documento(html, "lxml") == extraer_texto_documento(
+        html, "html.parser"
+    )
+    assert extraer_enlaces_contenido(html, "lxml") == extraer_enlaces_contenido(
+        html, "html.parser"
+    )
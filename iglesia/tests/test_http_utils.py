@@ -0,0 +1,99 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from iglesia.http_utils import (
+    LimitadorPorHost,
+    crear_sesion,
+    get_con_reintentos,
+    mapear_en_paralelo,
+    segundos_retry_after,
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, respuestas):
+        self.respuestas = list(respuestas)
+        self.llamadas = 0
+
+    def get(self, url, **kwargs):
+        self.llamadas += 1
+        return self.respuestas.pop(0)
+
+
+def test_get_con_reintentos_respeta_retry_after():
+    limitador = LimitadorPorHost(1000)
+    session = FakeSession(
+        [FakeResponse(429, {"Retry-After": "0.2"}), FakeResponse(200)]
+    )
+    inicio = time.monotonic()
+    resp = get_con_reintentos(session, "https://www.vatican.va/a.html", limitador)
+
+    assert resp.status_code == 200
+    assert session.llamadas == 2
+    assert time.monotonic() - inicio >= 0.2
+
+
+def test_pausa_se_comparte_entre_urls_del_mismo_host():
+    limitador = LimitadorPorHost(1000)
+    limitador.pausar("https://www.vatican.va/a.html", 0.2)
+    inicio = time.monotonic()
+    limitador.esperar("https://www.vatican.va/b.html")
+    assert time.monotonic() - inicio >= 0.2
+
+    # Otro host no se ve afectado
+    inicio = time.monotonic()
+    limitador.esperar("https://example.org/")
+    assert time.monotonic() - inicio < 0.1
+
+
+def test_segundos_retry_after():
+    assert segundos_retry_after("3", 1.0) == 3.0
+    assert segundos_retry_after(None, 1.5) == 1.5
+    assert segundos_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", 1.0) == 0.0
+
+
+def test_mapear_en_paralelo_acota_los_pendientes():
+    iniciados = []
+
+    def funcion(x):
+        iniciados.append(x)
+        return x * 2
+
+    resultados = mapear_en_paralelo(funcion, range(20), max_workers=2, max_pendientes=3)
+    assert next(resultados) == 0
+    time.sleep(0.05)
+    assert len(iniciados) <= 4
+    assert list(resultados) == [x * 2 for x in range(1, 20)]
+
+
+def test_sesion_devuelve_el_error_tras_agotar_los_reintentos():
+    peticiones = []
+
+    class SiempreCaido(BaseHTTPRequestHandler):
+        def do_GET(self):
+            peticiones.append(self.path)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), SiempreCaido)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    try:
+        # Sin RetryError: el llamador ve el 503 y degrada (p. ej. devuelve [])
+        resp = crear_sesion(reintentos=1).get(
+            f"http://127.0.0.1:{servidor.server_port}/indice.html", timeout=5
+        )
+    finally:
+        servidor.shutdown()
+    assert resp.status_code == 503
+    assert len(peticiones) == 2
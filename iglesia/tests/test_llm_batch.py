@@ -0,0 +1,190 @@
+import json
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from openai import OpenAI
+
+from iglesia import llm_utils
+from iglesia.llm_batch import LoteLLM
+
+
+class ServidorBatch(BaseHTTPRequestHandler):
+    """
+    Imitación local de los endpoints /v1/files y /v1/batches de OpenAI. Cada
+    lote tarda 'consultas_hasta_terminar' consultas en completarse y responde
+    a cada prompt con su longitud en un JSON.
+    """
+
+    ficheros = {}
+    lotes = {}
+    consultas_hasta_terminar = 2
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, datos, tipo="application/json"):
+        cuerpo = datos if isinstance(datos, bytes) else json.dumps(datos).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _lote(self, lote):
+        return {
+            "id": lote["id"],
+            "object": "batch",
+            "endpoint": "/v1/chat/completions",
+            "input_file_id": lote["input_file_id"],
+            "completion_window": "24h",
+            "created_at": 0,
+            "status": lote["status"],
+            "output_file_id": lote.get("output_file_id"),
+            "request_counts": {
+                "total": lote["total"],
+                "completed": lote["total"],
+                "failed": 0,
+            },
+        }
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/v1/files":
+            cabecera = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n"
+            mensaje = BytesParser().parsebytes(cabecera.encode() + cuerpo)
+            partes = {
+                p.get_param("name", header="content-disposition"): p
+                for p in mensaje.get_payload()
+            }
+            contenido = partes["file"].get_payload(decode=True)
+            id_fichero = f"file-{len(self.ficheros)}"
+            self.ficheros[id_fichero] = contenido
+            self._responder(
+                {
+                    "id": id_fichero,
+                    "object": "file",
+                    "bytes": len(contenido),
+                    "created_at": 0,
+                    "filename": "lote.jsonl",
+                    "purpose": "batch",
+                    "status": "processed",
+                }
+            )
+        elif self.path == "/v1/batches":
+            datos = json.loads(cuerpo)
+            lote = {
+                "id": f"batch-{len(self.lotes)}",
+                "input_file_id": datos["input_file_id"],
+                "status": "validating",
+                "consultas": 0,
+                "total": len(self.ficheros[datos["input_file_id"]].splitlines()),
+            }
+            self.lotes[lote["id"]] = lote
+            self._responder(self._lote(lote))
+
+    def do_GET(self):
+        if self.path.startswith("/v1/batches/"):
+            lote = self.lotes[self.path.rsplit("/", 1)[-1]]
+            lote["consultas"] += 1
+            if lote["consultas"] >= self.consultas_hasta_terminar:
+                lote["status"] = "completed"
+                lote["output_file_id"] = f"{lote['id']}-salida"
+                self.ficheros[lote["output_file_id"]] = self._resultados(lote)
+            else:
+                lote["status"] = "in_progress"
+            self._responder(self._lote(lote))
+        elif self.path.startswith("/v1/files/") and self.path.endswith("/content"):
+            id_fichero = self.path.split("/")[3]
+            self._responder(self.ficheros[id_fichero], "application/jsonl")
+
+    def _resultados(self, lote) -> bytes:
+        lineas = []
+        for linea in self.ficheros[lote["input_file_id"]].splitlines():
+            peticion = json.loads(linea)
+            prompt = peticion["body"]["messages"][0]["content"]
+            contenido = json.dumps({"titulo_spotify": f"{len(prompt)} caracteres"})
+            lineas.append(
+                json.dumps(
+                    {
+                        "id": "respuesta",
+                        "custom_id": peticion["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "body": {
+                                "choices": [{"message": {"content": contenido}}]
+                            },
+                        },
+                        "error": None,
+                    }
+                )
+            )
+        return "\n".join(lineas).encode()
+
+
+@pytest.fixture
+def cliente_openai():
+    ServidorBatch.ficheros, ServidorBatch.lotes = {}, {}
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), ServidorBatch)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield OpenAI(
+        base_url=f"http://127.0.0.1:{servidor.server_port}/v1", api_key="sk-test"
+    )
+    servidor.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def cache_temporal(tmp_path, monkeypatch):
+    cache = llm_utils.CacheLLM(str(tmp_path / "llm.sqlite"))
+    monkeypatch.setattr(llm_utils, "_cache", cache)
+
+
+def test_lote_guarda_las_respuestas_en_la_cache(tmp_path, cliente_openai):
+    llm = SimpleNamespace(model="openai/gpt-4.1-nano", temperature=0.2)
+    lote = LoteLLM("prueba", llm, "v1", str(tmp_path), cliente_openai)
+    prompts = ["Primer texto", "Segundo texto más largo"]
+
+    assert lote.ejecutar(prompts, intervalo=0.01)
+    peticion = json.loads(open(lote.ruta_jsonl).readline())
+    assert peticion["body"]["model"] == "gpt-4.1-nano"
+    assert peticion["body"]["temperature"] == 0.2
+
+    # El código síncrono encuentra las respuestas del lote sin llamar al LLM
+    def sin_llamadas():
+        raise AssertionError("No debería llamarse al LLM")
+
+    respuesta = llm_utils.llamar_llm_cacheado(
+        sin_llamadas, "openai/gpt-4.1-nano@0.2", "v1", "Segundo texto más largo", 10
+    )
+    assert json.loads(respuesta) == {"titulo_spotify": "23 caracteres"}
+
+    # Una segunda ejecución no envía otro lote
+    assert lote.ejecutar(prompts, intervalo=0.01)
+    assert len(ServidorBatch.lotes) == 1
+
+
+def test_lote_sin_esperar_se_retoma_en_otra_ejecucion(tmp_path, cliente_openai):
+    llm = SimpleNamespace(model="gpt-4.1-nano", temperature=None)
+    lote = LoteLLM("prueba", llm, "v1", str(tmp_path), cliente_openai)
+
+    assert not lote.ejecutar(["Un texto"], esperar=False)
+    assert lote.en_curso() == "batch-0"
+
+    otro = LoteLLM("prueba", llm, "v1", str(tmp_path), cliente_openai)
+    assert otro.ejecutar(["Un texto"], esperar=False)
+    assert otro.en_curso() is None
+    assert len(ServidorBatch.lotes) == 1
+    assert llm_utils.obtener_cache_llm().get(otro.clave("Un texto")) is not None
+
+
+def test_lote_rechaza_la_cache_desactivada(tmp_path, monkeypatch):
+    # Las respuestas del lote no llegarían al código síncrono: se pagarían dos veces
+    monkeypatch.setattr(llm_utils, "USAR_CACHE_LLM", False)
+    llm = SimpleNamespace(model="gpt-4.1-nano", temperature=None)
+    lote = LoteLLM("prueba", llm, "v1", str(tmp_path), cliente=object())
+
+    with pytest.raises(ValueError):
+        lote.ejecutar(["Un texto"])
+    assert not (tmp_path / "prueba.jsonl").exists()
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from iglesia import llm_utils
+
+
+class ErrorDeCuota(Exception):
+    status_code = 429
+
+
+@pytest.fixture(autouse=True)
+def limitador_rapido(monkeypatch):
+    monkeypatch.setattr(llm_utils, "_limitador", llm_utils.LimitadorLLM(60000, 10**8))
+
+
+def test_llamar_llm_reintenta_los_429():
+    intentos = []
+
+    def llamada():
+        intentos.append(1)
+        if len(intentos) < 3:
+            raise ErrorDeCuota("Rate limit reached")
+        return "ok"
+
+    assert llm_utils.llamar_llm(llamada, tokens=10, backoff=0.01) == "ok"
+    assert len(intentos) == 3
+
+
+def test_llamar_llm_propaga_otros_errores():
+    def llamada():
+        raise ValueError("JSON inválido")
+
+    with pytest.raises(ValueError):
+        llm_utils.llamar_llm(llamada, tokens=10)
+
+
+def test_limitador_respeta_los_tokens_por_minuto():
+    # 6000 TPM = 100 tokens/s con un cubo de 100: la segunda llamada espera ~0.5 s
+    limitador = llm_utils.LimitadorLLM(rpm=60000, tpm=6000)
+    inicio = time.monotonic()
+    limitador.esperar(100)
+    limitador.esperar(50)
+    assert 0.4 < time.monotonic() - inicio < 1.0
+
+
+def test_mapear_llm_mantiene_el_orden():
+    def lenta(n):
+        time.sleep(0.01 * (5 - n))
+        return llm_utils.llamar_llm(lambda: n * 2, tokens=1)
+
+    assert llm_utils.mapear_llm(lenta, range(5), max_workers=5) == [0, 2, 4, 6, 8]
+
+
+def test_cache_llm_evita_repetir_llamadas(tmp_path, monkeypatch):
+    cache = llm_utils.CacheLLM(str(tmp_path / "llm.sqlite"))
+    monkeypatch.setattr(llm_utils, "_cache", cache)
+    llamadas = []
+
+    def llamada():
+        llamadas.append(1)
+        return "Queridos hermanos"
+
+    for _ in range(3):
+        respuesta = llm_utils.llamar_llm_cacheado(llamada, "gpt-4o", "v1", "texto", 10)
+        assert respuesta == "Queridos hermanos"
+    assert len(llamadas) == 1
+
+    # Otra versión del prompt no reutiliza la respuesta, y el bypass vuelve a llamar
+    llm_utils.llamar_llm_cacheado(llamada, "gpt-4o", "v2", "texto", 10)
+    monkeypatch.setattr(llm_utils, "USAR_CACHE_LLM", False)
+    llm_utils.llamar_llm_cacheado(llamada, "gpt-4o", "v1", "texto", 10)
+    assert len(llamadas) == 3
+
+
+def test_cache_llm_no_guarda_respuestas_invalidas(tmp_path, monkeypatch):
+    cache = llm_utils.CacheLLM(str(tmp_path / "llm.sqlite"))
+    monkeypatch.setattr(llm_utils, "_cache", cache)
+    respuestas = ['{"titulo_spotify": "Trunc', '{"titulo_spotify": "Bien"}']
+    llamadas = []
+
+    def llamada():
+        llamadas.append(1)
+        return respuestas[len(llamadas) - 1]
+
+    def validar(respuesta):
+        return llm_utils.extraer_json(respuesta, ["titulo_spotify"])
+
+    with pytest.raises(ValueError):
+        llm_utils.llamar_llm_cacheado(llamada, "m", "v1", "texto", 10, validar)
+    # La respuesta truncada no se sirve desde la caché: se vuelve a pedir
+    respuesta = llm_utils.llamar_llm_cacheado(llamada, "m", "v1", "texto", 10, validar)
+    assert respuesta == '{"titulo_spotify": "Bien"}'
+    llm_utils.llamar_llm_cacheado(llamada, "m", "v1", "texto", 10, validar)
+    assert len(llamadas) == 2
+
+    # Una respuesta inválida guardada antes de validar también se repite
+    cache.put(llm_utils.CacheLLM.clave("m", "v2", "texto"), "m", "v2", "sin JSON")
+    respuestas.append('{"titulo_spotify": "Nuevo"}')
+    respuesta = llm_utils.llamar_llm_cacheado(llamada, "m", "v2", "texto", 10, validar)
+    assert respuesta == '{"titulo_spotify": "Nuevo"}'
+    assert len(llamadas) == 3
+
+
+def test_cache_llm_desaloja_lo_menos_usado(tmp_path):
+    cache = llm_utils.CacheLLM(str(tmp_path / "llm.sqlite"), max_bytes=250)
+    for i in range(3):
+        cache.put(f"k{i}", "m", "v", "x" * 100)
+        time.sleep(0.01)
+    assert cache.get("k0") is None
+    assert cache.get("k2") == "x" * 100
@@ -0,0 +1,22 @@
+from iglesia.mp3_utils import duracion_mp3, formatear_duracion
+
+# Cabecera de un frame MPEG-2 Layer III a 48 kbps y 22050 Hz (como los de Polly)
+FRAME_48K = bytes([0xFF, 0xF3, 0x64, 0xC4])
+
+
+def test_duracion_mp3_de_bitrate_constante():
+    # 48 kbps = 6000 bytes por segundo
+    assert duracion_mp3(FRAME_48K + b"\0" * 100, 600_000) == 100
+
+
+def test_duracion_mp3_descuenta_la_etiqueta_id3():
+    id3 = b"ID3\x04\x00\x00\x00\x00\x00\x0a" + b"\0" * 10
+    assert duracion_mp3(id3 + FRAME_48K, 6000 + len(id3)) == 1
+
+
+def test_duracion_mp3_sin_cabecera_reconocible():
+    assert duracion_mp3(b"<Fra><Fra>", 1000) is None
+
+
+def test_formatear_duracion():
+    assert formatear_duracion(3725) == "01:02:05"
@@ -0,0 +1,28 @@
+from iglesia.page_store import PageStore
+
+HTML = (
+    "<html><body><div class='testo'>"
+    + "<p>Queridos hermanos</p>" * 200
+    + "</div></body></html>"
+).encode("utf-8")
+
+
+def test_guarda_comprimido_y_deduplica(tmp_path):
+    store = PageStore(str(tmp_path))
+    sha_es = store.put("https://www.vatican.va/content/a/es.html", HTML, etag='"v1"')
+    sha_it = store.put("https://www.vatican.va/content/a/it.html", HTML)
+
+    assert sha_es == sha_it
+    assert store.get("https://www.vatican.va/content/a/es.html") == HTML
+    assert store.info("https://www.vatican.va/content/a/es.html")["etag"] == '"v1"'
+    assert "https://www.vatican.va/content/a/fr.html" not in store
+
+    stats = store.stats()
+    assert (stats["urls"], stats["objects"]) == (2, 1)
+    assert stats["stored_bytes"] < len(HTML)
+
+
+def test_reabre_el_indice(tmp_path):
+    PageStore(str(tmp_path)).put("https://x/1", b"uno")
+    PageStore(str(tmp_path)).put("https://x/1", b"dos")
+    assert PageStore(str(tmp_path)).get("https://x/1") == b"dos"
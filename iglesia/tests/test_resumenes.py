@@ -0,0 +1,91 @@
+import json
+import os
+import sys
+
+# web/ no es un paquete: app.py importa 'resumenes' desde su propia carpeta
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "web"))
+
+import resumenes  # noqa: E402
+from resumenes import RepositorioResumenes  # noqa: E402
+
+
+def _semana(directorio, slug, titulo="Resumen", idea="**Paz**"):
+    semana = directorio / slug
+    semana.mkdir(parents=True, exist_ok=True)
+    (semana / "resumen_semanal_igles-ia.txt").write_text(
+        f"---\ntitle: {titulo}\nexcerpt: Extracto\n---\n# Semana\n", encoding="utf-8"
+    )
+    doc = {"fuente_documento": "Homilía en San Pedro", "ideas_clave": [idea]}
+    (semana / "doc.json").write_text(json.dumps(doc), encoding="utf-8")
+    return semana
+
+
+def test_indice_por_slug_y_carga_perezosa(tmp_path, monkeypatch):
+    for slug in ["2025-06-02", "2025-06-16", "2025-06-09"]:
+        _semana(tmp_path / "summaries", slug)
+    (tmp_path / "summaries" / "no-es-una-semana").mkdir()
+    cargadas = []
+    original = resumenes.cargar_semana
+    monkeypatch.setattr(
+        resumenes,
+        "cargar_semana",
+        lambda path, slug: cargadas.append(slug) or original(path, slug),
+    )
+
+    repositorio = RepositorioResumenes(tmp_path / "summaries", tmp_path / "cache")
+
+    assert repositorio.slugs() == ["2025-06-16", "2025-06-09", "2025-06-02"]
+    assert cargadas == []
+    resumen = repositorio.get("2025-06-09")
+    assert resumen["title"] == "Resumen"
+    assert resumen["date"].day == 9
+    assert resumen["documents"][0]["ideas_clave"] == ["<p><strong>Paz</strong></p>"]
+    assert resumen["documents"][0]["doc_slug"] == "2025-06-09-homil-a-en-san-pedro"
+    assert repositorio.get("2025-01-01") is None
+    assert [r["slug"] for r in repositorio.ultimos(1)] == ["2025-06-16"]
+    assert cargadas == ["2025-06-09", "2025-06-16"]
+
+
+def test_cache_en_disco_se_invalida_al_cambiar_los_ficheros(tmp_path, monkeypatch):
+    semana = _semana(tmp_path / "summaries", "2025-06-02", titulo="Primero")
+    RepositorioResumenes(tmp_path / "summaries", tmp_path / "cache").todos()
+
+    cargadas = []
+    original = resumenes.cargar_semana
+    monkeypatch.setattr(
+        resumenes,
+        "cargar_semana",
+        lambda path, slug: cargadas.append(slug) or original(path, slug),
+    )
+    repositorio = RepositorioResumenes(tmp_path / "summaries", tmp_path / "cache")
+    assert repositorio.get("2025-06-02")["title"] == "Primero"
+    assert cargadas == []
+
+    _semana(tmp_path / "summaries", "2025-06-02", titulo="Corregido")
+    os.utime(semana / "resumen_semanal_igles-ia.txt", ns=(1, 1))
+    repositorio = RepositorioResumenes(tmp_path / "summaries", tmp_path / "cache")
+    assert repositorio.get("2025-06-02")["title"] == "Corregido"
+    assert cargadas == ["2025-06-02"]
+
+
+def test_fechas_del_yaml_se_guardan_en_la_cache(tmp_path):
+    semana = _semana(tmp_path / "summaries", "2025-06-02")
+    # YAML convierte las fechas sin comillas en datetime.date
+    (semana / "resumen_semanal_igles-ia.txt").write_text(
+        "---\ntitle: Resumen\nweek_of: 2025-06-02\n---\n# Semana\n", encoding="utf-8"
+    )
+    repositorio = RepositorioResumenes(tmp_path / "summaries", tmp_path / "cache")
+    assert repositorio.get("2025-06-02") is not None
+
+    entrada = json.loads((tmp_path / "cache" / "2025-06-02.json").read_text())
+    assert entrada["resumen"]["week_of"] == "2025-06-02"
+
+
+def test_fallo_al_guardar_la_cache_no_descarta_la_semana(tmp_path, capsys):
+    _semana(tmp_path / "summaries", "2025-06-02")
+    # La ruta de la caché es un fichero: no se puede crear el directorio
+    (tmp_path / "cache").write_text("")
+    repositorio = RepositorioResumenes(tmp_path / "summaries", tmp_path / "cache")
+
+    assert repositorio.get("2025-06-02")["title"] == "Resumen"
+    assert "No se pudo guardar la caché de 2025-06-02" in capsys.readouterr().out
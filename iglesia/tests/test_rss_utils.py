@@ -0,0 +1,101 @@
+import xml.etree.ElementTree as ET
+
+from iglesia.rss_utils import FeedPodcast, cdata
+
+
+def _feed(tmp_path):
+    return FeedPodcast(
+        titulo="Homilías",
+        enlace="https://igles-ia.es",
+        descripcion="Podcast & más",
+        idioma="es-ES",
+        autor="igles-ia.es",
+        email="igles-ia@igles-ia.es",
+        imagen="https://igles-ia.es/portada.png",
+        ruta_cache=str(tmp_path / "rss_items.json"),
+    )
+
+
+def _episodio(numero, descripcion="Resumen <b>del</b> episodio ]]> fin"):
+    return {
+        "titulo_spotify": f"[{numero}] Homilía & paz",
+        "descripcion_spotify": descripcion,
+        "url_audio": f"https://audio.example/{numero}.mp3",
+        "audio_bytes": 1357288,
+        "audio_duracion": 226,
+        "fecha": "2025-12-26",
+        "numero_episodio": numero,
+    }
+
+
+def test_cdata_parte_el_terminador():
+    texto = "a ]]> b"
+    assert ET.fromstring(f"<d>{cdata(texto)}</d>").text == texto
+
+
+def test_feed_es_xml_valido_con_cdata(tmp_path):
+    ruta = str(tmp_path / "podcast.xml")
+    _feed(tmp_path).escribir([_episodio("34.5")], ruta)
+
+    canal = ET.parse(ruta).getroot().find("channel")
+    item = canal.find("item")
+    assert canal.find("description").text == "Podcast & más"
+    assert item.find("description").text == "Resumen <b>del</b> episodio ]]> fin"
+    assert item.find("enclosure").attrib["length"] == "1357288"
+    ns = {"itunes": "http://www.itunes.com/dtds/podcast-1.0.dtd"}
+    assert item.find("itunes:duration", ns).text == "00:03:46"
+
+
+def test_feed_solo_genera_los_episodios_nuevos_o_modificados(tmp_path):
+    ruta = str(tmp_path / "podcast.xml")
+    episodios = [_episodio("34.5"), _episodio("34.4")]
+    _feed(tmp_path).escribir(episodios, ruta)
+    primero = open(ruta, encoding="utf-8").read()
+
+    feed = _feed(tmp_path)
+    feed.escribir(episodios, ruta)
+    assert (feed.generados, feed.reutilizados) == (0, 2)
+    assert open(ruta, encoding="utf-8").read() == primero
+
+    episodios[1] = _episodio("34.4", descripcion="Otro resumen")
+    feed.escribir([_episodio("34.6")] + episodios, ruta)
+    assert (feed.generados, feed.reutilizados) == (2, 1)
+    assert "Otro resumen" in open(ruta, encoding="utf-8").read()
+
+
+def test_episodio_sin_tamano_de_audio_usa_length_1(tmp_path):
+    episodio = _episodio("34.5")
+    del episodio["audio_bytes"], episodio["audio_duracion"]
+    ruta = str(tmp_path / "podcast.xml")
+    _feed(tmp_path).escribir([episodio], ruta)
+
+    item = ET.parse(ruta).getroot().find("channel/item")
+    assert item.find("enclosure").attrib["length"] == "1"
+    ns = {"itunes": "http://www.itunes.com/dtds/podcast-1.0.dtd"}
+    assert item.find("itunes:duration", ns) is None
+
+
+def test_generar_rss_no_hace_peticiones_de_red(tmp_path, monkeypatch):
+    import json
+
+    import generar_rss
+    from iglesia import audio_utils
+
+    semana = tmp_path / "json-rss" / "2025-12-26"
+    semana.mkdir(parents=True)
+    episodios = [dict(_episodio("34.5"), filename="a"), dict(_episodio("34.4"))]
+    episodios[1].update(filename="b", audio_bytes=None, audio_duracion=None)
+    (semana / "episodes_metadata.json").write_text(json.dumps(episodios))
+
+    def sin_red(*args, **kwargs):
+        raise AssertionError("El RSS no debería consultar S3")
+
+    monkeypatch.setattr(audio_utils.boto3, "client", sin_red)
+    monkeypatch.chdir(tmp_path)  # cache/rss_items.json
+    ruta = str(tmp_path / "podcast.xml")
+    generar_rss.generar_rss(str(tmp_path / "json-rss"), ruta)
+
+    longitudes = [
+        e.attrib["length"] for e in ET.parse(ruta).getroot().iter("enclosure")
+    ]
+    assert longitudes == ["1357288", "1"]
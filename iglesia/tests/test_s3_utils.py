@@ -0,0 +1,137 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from iglesia import audio_utils
+from iglesia import s3_utils
+from iglesia.catalogo import CatalogoEpisodios
+from iglesia.s3_utils import (
+    S3_TAM_PARTE_MIN,
+    InventarioS3,
+    subir_en_partes,
+    url_publica,
+)
+from iglesia.tests.test_audio_utils import PollyFalso
+
+BUCKET = "igles-ia-test"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        cliente = boto3.client("s3", region_name="us-east-1")
+        cliente.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(s3_utils, "_regiones", {})
+        yield cliente
+
+
+def test_subir_en_partes_sube_en_orden_y_por_partes(s3):
+    bloques = [bytes([i]) * (2 * 1024 * 1024) for i in range(6)]  # 12 MiB
+
+    total = subir_en_partes(
+        s3, BUCKET, "a.mp3", iter(bloques), tam_parte=S3_TAM_PARTE_MIN
+    )
+
+    # ETag de una subida multiparte: "<md5>-<número de partes>" (5 + 5 + 2 MiB)
+    assert s3.head_object(Bucket=BUCKET, Key="a.mp3")["ETag"].endswith('-3"')
+    completo = s3.get_object(Bucket=BUCKET, Key="a.mp3")
+    assert completo["ContentType"] == "audio/mpeg"
+    assert completo["Body"].read() == b"".join(bloques)
+    assert total == 12 * 1024 * 1024
+
+
+def test_subir_en_partes_aborta_si_falla_la_sintesis(s3):
+    def bloques():
+        yield b"x" * 1024
+        raise RuntimeError("ThrottlingException")
+
+    with pytest.raises(RuntimeError):
+        subir_en_partes(s3, BUCKET, "b.mp3", bloques())
+
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+    assert "Contents" not in s3.list_objects_v2(Bucket=BUCKET)
+
+
+def test_sintetizar_y_subir_audio_en_streaming(s3):
+    texto = "Frase de prueba. " * 400
+    polly = PollyFalso(latencia=0)
+
+    audio = audio_utils.sintetizar_y_subir_audio(
+        texto, "episodio", s3, polly, BUCKET
+    )
+
+    url = f"https://{BUCKET}.s3.us-east-1.amazonaws.com/episodio.mp3"
+    assert audio["url_audio"] == url
+    cuerpo = s3.get_object(Bucket=BUCKET, Key="episodio.mp3")["Body"].read()
+    assert cuerpo == b"<Fra>" * len(polly.llamadas)
+    assert audio["audio_bytes"] == len(cuerpo)
+
+
+class ContadorS3:
+    """Envuelve un cliente de S3 y cuenta las llamadas a la API por operación."""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.llamadas = {}
+        cliente.meta.events.register("before-call.s3.*", self._contar)
+
+    def _contar(self, model, **kwargs):
+        self.llamadas[model.name] = self.llamadas.get(model.name, 0) + 1
+
+
+def test_inventario_un_listado_paginado_y_region_memorizada(s3, tmp_path):
+    for i in range(1005):
+        s3.put_object(Bucket=BUCKET, Key=f"2025-06-{i:04d}.mp3", Body=b"")
+    s3.put_object(Bucket=BUCKET, Key="2024-otro.mp3", Body=b"")
+    contador = ContadorS3(s3)
+
+    inventario = InventarioS3(s3, BUCKET, "2025-06-", ruta_cache="")
+    presentes = [f"2025-06-{i:04d}.mp3" in inventario for i in range(0, 1010, 5)]
+    urls = {url_publica(s3, BUCKET, f"{i}.mp3") for i in range(50)}
+
+    assert presentes == [i < 1005 for i in range(0, 1010, 5)]
+    assert "2024-otro.mp3" not in inventario
+    assert contador.llamadas == {"ListObjectsV2": 2, "GetBucketLocation": 1}
+    assert len(urls) == 50
+
+
+def test_inventario_persistido_se_reutiliza(s3, tmp_path):
+    ruta = str(tmp_path / "inventario.json")
+    s3.put_object(Bucket=BUCKET, Key="2025-06-01_a.mp3", Body=b"")
+    InventarioS3(s3, BUCKET, "2025-", ruta_cache=ruta).anadir("2025-06-02_b.mp3")
+    contador = ContadorS3(s3)
+
+    inventario = InventarioS3(s3, BUCKET, "2025-06-", ruta_cache=ruta)
+    assert inventario.claves() == {"2025-06-01_a.mp3": 0, "2025-06-02_b.mp3": None}
+    assert contador.llamadas == {}
+
+    # Caducado u otro prefijo: se vuelve a listar
+    assert "2025-06-01_a.mp3" in InventarioS3(
+        s3, BUCKET, "2025-06-", ruta_cache=ruta, max_horas=0
+    )
+    assert "2024-01.mp3" not in InventarioS3(s3, BUCKET, "2024-", ruta_cache=ruta)
+    assert contador.llamadas == {"ListObjectsV2": 2}
+
+
+def test_completar_datos_audio_de_episodios_antiguos(s3, tmp_path, monkeypatch):
+    import json
+
+    from iglesia.tests.test_mp3_utils import FRAME_48K
+
+    s3.put_object(Bucket=BUCKET, Key="a.mp3", Body=FRAME_48K + b"\0" * 11996)
+    url = f"https://{BUCKET}.s3.us-east-1.amazonaws.com/a.mp3"
+    ruta = tmp_path / "2025-08-04" / "episodes_metadata.json"
+    ruta.parent.mkdir()
+    episodio = {"url_audio": url, "numero_episodio": "13.1", "filename": "a"}
+    ruta.write_text(json.dumps([episodio]))
+    monkeypatch.setattr(audio_utils.boto3, "client", lambda nombre, **kw: s3)
+
+    assert audio_utils.completar_datos_audio(str(tmp_path)) == 1
+
+    episodio = json.loads(ruta.read_text())[0]
+    assert episodio["audio_bytes"] == 12000
+    assert episodio["audio_duracion"] == 2
+    catalogo = CatalogoEpisodios(json_base_dir=str(tmp_path))
+    assert catalogo.episodios()[0]["audio_duracion"] == 2
@@ -0,0 +1,43 @@
+import re
+
+from iglesia.tts_utils import a_ssml, split_text
+
+PARRAFO = (
+    "Queridos hermanos y hermanas, buenos días. Hoy el Evangelio nos habla "
+    "de la misericordia. «¿Quién es mi prójimo?», pregunta el maestro de la "
+    "Ley. Jesús responde con una parábola!"
+)
+
+
+def _palabras(texto):
+    return texto.split()
+
+
+def test_split_text_no_supera_el_limite_ni_parte_palabras():
+    texto = "\n".join([PARRAFO] * 40 + [" ".join([PARRAFO] * 30)])
+    fragmentos = split_text(texto, max_length=500)
+
+    assert all(len(f) <= 500 for f in fragmentos)
+    assert _palabras(" ".join(fragmentos)) == _palabras(texto)
+    # Cada fragmento termina en fin de frase: ninguna frase queda partida
+    assert all(re.search(r"[.!?…][»”]?$", f) for f in fragmentos)
+
+
+def test_split_text_agrupa_parrafos_completos():
+    fragmentos = split_text("Uno.\n\nDos.\nTres.", max_length=3000)
+    assert fragmentos == ["Uno.\nDos.\nTres."]
+
+
+def test_split_text_corta_entre_palabras_una_frase_demasiado_larga():
+    frase = " ".join(["palabra"] * 100)
+    fragmentos = split_text(frase, max_length=50)
+    assert all(len(f) <= 50 for f in fragmentos)
+    assert _palabras(" ".join(fragmentos)) == _palabras(frase)
+
+
+def test_a_ssml_escapa_y_pausa_entre_parrafos():
+    ssml = a_ssml("Fe & razón <hoy>.\nSegundo párrafo.")
+    assert ssml == (
+        "<speak><p>Fe &amp; razón &lt;hoy&gt;.</p>"
+        '<break time="600ms"/><p>Segundo párrafo.</p></speak>'
+    )
@@ -0,0 +1,119 @@
+import pytest
+
+from iglesia import utils
+
+INDICE_URL = "https://www.vatican.va/content/leo-xiv/es/homilies/2025.html"
+
+INDICE_HTML = """<html><body><div class="vaticanindex"><ul>
+<li><a href="/content/leo-xiv/es/homilies/2025/documents/20250518-inizio-pontificato.html">Santa Misa de inicio del pontificado</a></li>
+<li><a href="/content/leo-xiv/es/homilies/2025/documents/20250511-messa-grotte.html">Santa Misa en las Grutas Vaticanas</a></li>
+</ul></div></body></html>"""
+
+
+def documento_html(texto):
+    return f"""<html><body><div class="testo"><div class="text">
+<p>{texto}</p><p>Segundo párrafo.</p>
+</div></div></body></html>"""
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200, headers=None):
+        self.content = content.encode("utf-8")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, paginas):
+        self.paginas = paginas
+        self.pedidas = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.pedidas.append((url, headers or {}))
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            return FakeResponse("", status_code=304)
+        return FakeResponse(self.paginas[url], headers={"ETag": '"v1"'})
+
+
+@pytest.fixture
+def sesion_falsa(monkeypatch, tmp_path):
+    base = "https://www.vatican.va/content/leo-xiv/es/homilies/2025/documents/"
+    sesion = FakeSession(
+        {
+            INDICE_URL: INDICE_HTML,
+            base + "20250518-inizio-pontificato.html": documento_html("Queridos hermanos"),
+            base + "20250511-messa-grotte.html": documento_html("Queridos amigos"),
+        }
+    )
+    monkeypatch.setattr(utils, "_sesion", sesion)
+    monkeypatch.setattr(utils, "_limitador", utils.LimitadorPorHost(1000))
+    monkeypatch.setattr(utils, "_cache", utils.CacheHTTP(str(tmp_path / "http")))
+    monkeypatch.setattr(utils, "MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    return sesion
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_obtener_todos_los_textos(sesion_falsa, max_workers):
+    df = utils.obtener_todos_los_textos(
+        {"Homilia": [INDICE_URL]}, max_workers, manifest_path=utils.MANIFEST_PATH
+    )
+
+    assert list(df.columns) == ["tipo", "fecha", "titulo", "url", "texto"]
+    assert list(df["fecha"]) == ["2025-05-18", "2025-05-11"]
+    assert list(df["tipo"]) == ["Homilia", "Homilia"]
+    assert df.loc[0, "texto"] == "Queridos hermanos\nSegundo párrafo."
+    assert len(sesion_falsa.pedidas) == 3
+
+
+def test_cache_http_revalida_y_congela(sesion_falsa, monkeypatch):
+    monkeypatch.setattr(utils._cache, "dias_congelado", 100000)
+    utils.obtener_todos_los_textos({"Homilia": [INDICE_URL]}, manifest_path=None)
+    sesion_falsa.pedidas.clear()
+
+    # Segunda ejecución: todo se revalida con If-None-Match y llega un 304
+    df = utils.obtener_todos_los_textos({"Homilia": [INDICE_URL]}, manifest_path=None)
+    assert len(sesion_falsa.pedidas) == 3
+    assert all(h["If-None-Match"] == '"v1"' for _, h in sesion_falsa.pedidas)
+    assert df.loc[1, "texto"] == "Queridos amigos\nSegundo párrafo."
+
+    # Con los documentos ya congelados solo se revalida el índice
+    sesion_falsa.pedidas.clear()
+    utils._cache.dias_congelado = 0
+    utils.obtener_todos_los_textos({"Homilia": [INDICE_URL]}, manifest_path=None)
+    assert [url for url, _ in sesion_falsa.pedidas] == [INDICE_URL]
+
+
+def test_since_solo_descarga_documentos_nuevos_o_de_la_ventana(
+    sesion_falsa, monkeypatch
+):
+    monkeypatch.setattr(utils, "USAR_CACHE_HTTP", False)
+    monkeypatch.setattr(utils, "_cache", None)
+    manifest_path = utils.MANIFEST_PATH
+    utils.obtener_todos_los_textos({"Homilia": [INDICE_URL]}, manifest_path=manifest_path)
+    manifest = utils.cargar_manifest(manifest_path)
+    assert {m["fecha"] for m in manifest.values()} == {"2025-05-18", "2025-05-11"}
+
+    sesion_falsa.pedidas.clear()
+    df = utils.obtener_todos_los_textos(
+        {"Homilia": [INDICE_URL]}, since="2025-05-15", manifest_path=manifest_path
+    )
+    assert list(df["fecha"]) == ["2025-05-18"]
+    assert len(sesion_falsa.pedidas) == 2  # índice + documento de la ventana
+
+    sesion_falsa.pedidas.clear()
+    df = utils.obtener_todos_los_textos(
+        {"Homilia": [INDICE_URL]}, since="2025-06-01", manifest_path=manifest_path
+    )
+    assert df.empty
+    assert list(df.columns) == ["tipo", "fecha", "titulo", "url", "texto"]
+
+
+def test_snapshot_corpus_se_reutiliza_si_cubre_la_ventana(sesion_falsa, tmp_path):
+    df = utils.obtener_todos_los_textos({"Homilia": [INDICE_URL]}, manifest_path=None)
+    path = utils.ruta_snapshot_corpus("2025-05-19", base_dir=str(tmp_path))
+    utils.guardar_snapshot_corpus(df, path, since="2025-05-12")
+
+    recargado = utils.cargar_snapshot_corpus(path, since="2025-05-13")
+    assert recargado.equals(df)
+    # Una ventana más amplia que la guardada obliga a volver a descargar
+    assert utils.cargar_snapshot_corpus(path, since="2025-05-01") is None
@@ -0,0 +1,491 @@
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import requests
+
+# vatican-archiver/ no es un paquete: se importa desde su propia carpeta
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "vatican-archiver")
+)
+
+import vatican_archiver  # noqa: E402
+from vatican_archiver import DownloadLedger, VaticanArchiver  # noqa: E402
+
+BASE = "https://www.vatican.va/"
+
+
+class SesionFalsa:
+    """Imita requests.Session.get sirviendo un sitio de vatican.va en memoria."""
+
+    def __init__(self, paginas: dict):
+        self.paginas = paginas
+        self.pedidas = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.pedidas.append(url)
+        html = self.paginas.get(url)
+        resp = requests.Response()
+        resp.url = url
+        resp.status_code = 200 if html is not None else 404
+        resp._content = (html or "").encode()
+        if html is not None:
+            etag = '"' + hashlib.sha256(resp._content).hexdigest()[:16] + '"'
+            resp.headers["ETag"] = etag
+            if (headers or {}).get("If-None-Match") == etag:
+                resp.status_code = 304
+                resp._content = b""
+        return resp
+
+
+def _sitio(documentos, pope="leo-xiv", langs=("es",)):
+    """
+    Páginas de un Papa: la principal enlaza un índice por sección y cada
+    índice enlaza sus documentos. 'documentos' es [(sección, fecha, título)].
+    """
+    paginas = {}
+    for lang in langs:
+        secciones = sorted({seccion for seccion, _, _ in documentos})
+        paginas[f"{BASE}content/{pope}/{lang}.html"] = (
+            '<div class="document-container">'
+            + "".join(
+                f'<a href="/content/{pope}/{lang}/{s}.index.html">{s}</a>'
+                for s in secciones
+            )
+            + '<a href="https://www.vatican.va/externo.html">Fuera</a></div>'
+        )
+        for seccion in secciones:
+            enlaces = "".join(
+                f'<a href="/content/{pope}/{lang}/{seccion}/documents/'
+                f'{fecha}-{seccion}.html">{titulo}</a>'
+                for s, fecha, titulo in documentos
+                if s == seccion
+            )
+            paginas[f"{BASE}content/{pope}/{lang}/{seccion}.index.html"] = (
+                f'<div class="document-container">{enlaces}'
+                f'<a href="/content/{pope}/{lang}.html">{lang}</a></div>'
+            )
+    return paginas
+
+
+def _archivador(tmp_path, paginas, **kwargs):
+    archivador = VaticanArchiver(
+        store_dir=str(tmp_path / "http"),
+        links_dir=str(tmp_path / "links"),
+        csv_dir=str(tmp_path / "csv"),
+        ledger_path=str(tmp_path / "ledger.jsonl"),
+        requests_per_second=1000,
+        **kwargs,
+    )
+    archivador.session = SesionFalsa(paginas)
+    return archivador
+
+
+def _explorar(tmp_path, documentos, **kwargs):
+    archivador = _archivador(tmp_path, _sitio(documentos), **kwargs)
+    return archivador.find_and_save_links({"León XIV": "leo-xiv"}, ["es"])
+
+
+def _delta(tmp_path):
+    with open(tmp_path / "links" / "leo-xiv" / "es.delta.json", encoding="utf-8") as f:
+        delta = json.load(f)
+    return (
+        sorted(d["title_human"] for d in delta["added"]),
+        sorted(d["title_human"] for d in delta["removed"]),
+    )
+
+
+DOCUMENTOS = [
+    ("homilies", "20250601", "Homilía de Pentecostés"),
+    ("homilies", "20250608", "Homilía de la Trinidad"),
+    ("speeches", "20250602", "Discurso a los obispos"),
+]
+
+
+def test_paginas_sin_cambios_no_se_vuelven_a_parsear(tmp_path, monkeypatch):
+    primera = _explorar(tmp_path, DOCUMENTOS, parse_workers=1)
+    huellas = json.loads((tmp_path / "links" / "leo-xiv" / "es.pages.json").read_text())
+    assert len(huellas["pages"]) == 2
+    assert huellas["main"] is not None
+
+    parseadas = []
+    original = vatican_archiver.extraer_enlaces_contenido
+    monkeypatch.setattr(
+        vatican_archiver,
+        "extraer_enlaces_contenido",
+        lambda html: parseadas.append(html) or original(html),
+    )
+    segunda = _explorar(tmp_path, DOCUMENTOS, parse_workers=1)
+
+    assert parseadas == []
+    assert segunda == primera
+    assert [d["title_human"] for d in segunda["leo-xiv"]["es"]] == [
+        "Homilía de Pentecostés",
+        "Homilía de la Trinidad",
+        "Discurso a los obispos",
+    ]
+    # Sin fusión intermedia el delta sigue siendo el de la primera exploración
+    assert _delta(tmp_path) == (sorted(t for _, _, t in DOCUMENTOS), [])
+
+
+def test_delta_de_enlaces_anadidos_y_eliminados(tmp_path):
+    _explorar(tmp_path, DOCUMENTOS)
+    _archivador(tmp_path, {}).merge_links_to_csv()
+    assert not (tmp_path / "links" / "leo-xiv" / "es.delta.json").exists()
+
+    cambiados = DOCUMENTOS[1:] + [("homilies", "20250615", "Homilía del Corpus")]
+    _explorar(tmp_path, cambiados)
+
+    assert _delta(tmp_path) == (["Homilía del Corpus"], ["Homilía de Pentecostés"])
+
+
+def test_deltas_se_acumulan_hasta_la_fusion_incremental(tmp_path):
+    _explorar(tmp_path, DOCUMENTOS)
+    _archivador(tmp_path, {}).merge_links_to_csv()
+
+    # Dos exploraciones sin fusionar: la segunda deshace parte de la primera
+    corpus = ("homilies", "20250615", "Homilía del Corpus")
+    _explorar(tmp_path, DOCUMENTOS[1:] + [corpus])
+    asuncion = ("homilies", "20250815", "Homilía de la Asunción")
+    _explorar(tmp_path, DOCUMENTOS[:1] + DOCUMENTOS[2:] + [corpus, asuncion])
+    assert _delta(tmp_path) == (
+        ["Homilía de la Asunción", "Homilía del Corpus"],
+        ["Homilía de la Trinidad"],
+    )
+
+    incremental = _archivador(tmp_path, {}).merge_links_to_csv(incremental=True)
+    delta = pd.read_csv(tmp_path / "csv" / "links_delta.csv")
+    assert sorted(zip(delta["change"], delta["title_human"])) == [
+        ("added", "Homilía de la Asunción"),
+        ("added", "Homilía del Corpus"),
+        ("removed", "Homilía de la Trinidad"),
+    ]
+    # El delta ya aplicado se consume y no se vuelve a aplicar
+    assert not (tmp_path / "links" / "leo-xiv" / "es.delta.json").exists()
+    otra_vez = _archivador(tmp_path, {}).merge_links_to_csv(incremental=True)
+    pd.testing.assert_frame_equal(otra_vez, incremental)
+
+    completo = _archivador(tmp_path, {}).merge_links_to_csv()
+    pd.testing.assert_frame_equal(incremental, completo)
+    for nombre in ["all_links.parquet", "pivot_links.parquet"]:
+        assert pd.read_parquet(tmp_path / "csv" / nombre).shape[0] == 4
+
+
+def test_cada_fusion_reescribe_el_delta_de_enlaces(tmp_path):
+    _explorar(tmp_path, DOCUMENTOS)
+    _archivador(tmp_path, {}).merge_links_to_csv()
+    corpus = ("homilies", "20250615", "Homilía del Corpus")
+    _explorar(tmp_path, DOCUMENTOS + [corpus])
+    _archivador(tmp_path, {}).merge_links_to_csv(incremental=True)
+    delta = pd.read_parquet(tmp_path / "csv" / "links_delta.parquet")
+    assert delta["title_human"].tolist() == ["Homilía del Corpus"]
+
+    # Sin cambios, ni la fusión incremental ni la completa dejan el delta anterior
+    _archivador(tmp_path, {}).merge_links_to_csv(incremental=True)
+    assert pd.read_parquet(tmp_path / "csv" / "links_delta.parquet").empty
+    _explorar(tmp_path, DOCUMENTOS)
+    _archivador(tmp_path, {}).merge_links_to_csv()
+    delta = pd.read_csv(tmp_path / "csv" / "links_delta.csv")
+    assert delta[["change", "title_human"]].values.tolist() == [
+        ["removed", "Homilía del Corpus"]
+    ]
+    _archivador(tmp_path, {}).merge_links_to_csv()
+    assert pd.read_csv(tmp_path / "csv" / "links_delta.csv").empty
+
+
+def test_revalida_los_indices_sin_force_refresh(tmp_path):
+    _explorar(tmp_path, DOCUMENTOS)
+    _archivador(tmp_path, {}).merge_links_to_csv()
+    # Sin cambios en el sitio: el servidor responde 304 a las peticiones condicionales
+    sesion = SesionFalsa(_sitio(DOCUMENTOS))
+    archivador = _archivador(tmp_path, {})
+    archivador.session = sesion
+    sesion.get = _espiar_cabeceras(sesion.get, cabeceras := [])
+    archivador.find_and_save_links({"León XIV": "leo-xiv"}, ["es"])
+    assert len(cabeceras) == 3
+    assert all("If-None-Match" in c for c in cabeceras)
+    assert _delta(tmp_path) == ([], [])
+
+    corpus = ("homilies", "20250615", "Homilía del Corpus")
+    _explorar(tmp_path, DOCUMENTOS + [corpus])
+    assert _delta(tmp_path) == (["Homilía del Corpus"], [])
+
+
+def _espiar_cabeceras(get, cabeceras):
+    def espia(url, headers=None, timeout=None):
+        cabeceras.append(dict(headers or {}))
+        return get(url, headers=headers, timeout=timeout)
+
+    return espia
+
+
+def test_crawl_con_pool_de_procesos_encuentra_los_mismos_enlaces(
+    tmp_path, monkeypatch
+):
+    pools = []
+
+    class PoolEspia(vatican_archiver.ProcessPoolExecutor):
+        def __init__(self, **kwargs):
+            pools.append(kwargs)
+            super().__init__(**kwargs)
+
+    monkeypatch.setattr(vatican_archiver, "ProcessPoolExecutor", PoolEspia)
+    documentos = [
+        (seccion, f"2025{mes:02d}{dia:02d}", f"{seccion} {mes}-{dia}")
+        for seccion in ["homilies", "speeches", "angelus", "letters"]
+        for mes in range(1, 4)
+        for dia in range(1, 6)
+    ]
+    langs = ["es", "en", "it"]
+    paginas = _sitio(documentos, langs=langs)
+
+    enlaces = {}
+    for parse_workers in [1, 2]:
+        archivador = _archivador(
+            tmp_path / str(parse_workers), paginas, parse_workers=parse_workers
+        )
+        enlaces[parse_workers] = archivador.find_and_save_links(
+            {"León XIV": "leo-xiv"}, langs
+        )
+
+    # El pool 'spawn' parsea en otros procesos, y el resultado es el mismo
+    assert [pool["max_workers"] for pool in pools] == [2, 2]
+    assert pools[0]["mp_context"].get_start_method() == "spawn"
+    assert enlaces[2] == enlaces[1]
+    assert [len(enlaces[2]["leo-xiv"][lang]) for lang in langs] == [60, 60, 60]
+
+
+def _linea(url, updated_at, status="ok", **extra):
+    entry = {"url": url, "kind": "document", "status": status, "updated_at": updated_at}
+    return json.dumps({**entry, **extra}) + "\n"
+
+
+def test_ledger_is_done_con_since_y_caducidad(tmp_path):
+    ahora = datetime.now(timezone.utc)
+    hace = lambda dias: (ahora - timedelta(days=dias)).isoformat()  # noqa: E731
+    (tmp_path / "doc.html").write_text("x")
+    (tmp_path / "ledger.jsonl").write_text(
+        _linea("reciente", hace(1))
+        + _linea("antiguo", hace(40))
+        + _linea("fallido", hace(1), status="error")
+        + _linea("borrado", hace(1), path=str(tmp_path / "no-existe.html"))
+        + _linea("en-disco", hace(1), path=str(tmp_path / "doc.html"))
+    )
+    ledger = DownloadLedger(str(tmp_path / "ledger.jsonl"))
+
+    assert ledger.is_done("reciente") and ledger.is_done("antiguo")
+    assert ledger.is_done("en-disco")
+    assert not ledger.is_done("fallido")
+    assert not ledger.is_done("borrado")
+    assert not ledger.is_done("desconocido")
+    # since: solo cuenta lo hecho en la ejecución actual
+    assert ledger.is_done("reciente", since=hace(2))
+    assert not ledger.is_done("antiguo", since=hace(2))
+    # max_age_days (stale_after_days del archivador): lo caducado se repite
+    assert ledger.is_done("reciente", max_age_days=30)
+    assert not ledger.is_done("antiguo", max_age_days=30)
+
+
+def test_ledger_descarta_la_ultima_linea_truncada(tmp_path):
+    ruta = tmp_path / "ledger.jsonl"
+    ruta.write_text(_linea("a", "2025-01-01") + '{"url": "b", "sta')
+
+    ledger = DownloadLedger(str(ruta))
+    assert ledger.get("a")["status"] == "ok"
+    assert ledger.get("b") is None
+
+    # La siguiente línea no queda pegada al trozo truncado
+    ledger.record("c", "document", "ok", content=b"hola")
+    recargado = DownloadLedger(str(ruta))
+    assert recargado.get("c")["bytes"] == 4
+    assert recargado.get("c")["sha256"] == hashlib.sha256(b"hola").hexdigest()
+    assert len(ruta.read_text().splitlines()) == 2
+
+
+def test_ledger_marcas_de_ejecucion_y_compactacion(tmp_path):
+    ruta = str(tmp_path / "ledger.jsonl")
+    ledger = DownloadLedger(ruta)
+    inicio = ledger.start_run()
+    ledger.record("a", "document", "error", error="timeout")
+    ledger.record("a", "document", "ok", content=b"a")
+    ledger.record("b", "index", "ok", content=b"b")
+
+    # Caída antes de finish_run: la siguiente ejecución reanuda la anterior
+    ledger = DownloadLedger(ruta)
+    assert ledger.start_run() == inicio
+    assert ledger.summary() == {"ok": 2}
+    ledger.finish_run()
+    assert DownloadLedger(ruta).start_run() > inicio
+
+    ledger = DownloadLedger(ruta)
+    entradas = dict(ledger._entries)
+    ledger.compact()
+    with open(ruta, encoding="utf-8") as f:
+        urls = [json.loads(linea)["url"] for linea in f]
+    assert sorted(urls) == ["__run__", "a", "b"]
+    assert DownloadLedger(ruta)._entries == entradas
+
+
+def test_descarga_reanuda_sin_repetir_lo_ya_descargado(tmp_path):
+    links = pd.DataFrame(
+        {
+            "link": [f"{BASE}doc{i}.html" for i in range(4)],
+            "pope": "leo-xiv",
+            "lang": "es",
+            "title": [f"doc{i}" for i in range(4)],
+            "type": "homilies",
+        }
+    )
+    paginas = {url: f"<p>{url}</p>" for url in links["link"]}
+    # doc3 falla en la primera ejecución, que además se interrumpe
+    archivador = _archivador(
+        tmp_path, {u: h for u, h in paginas.items() if "doc3" not in u}
+    )
+    archivador.run_started_at = archivador.ledger.start_run()
+    archivador.download_documents(links)
+    assert len(archivador.session.pedidas) == 4
+
+    archivador = _archivador(tmp_path, paginas)
+    archivador.run_started_at = archivador.ledger.start_run()
+    archivador.download_documents(links)
+    assert archivador.session.pedidas == [f"{BASE}doc3.html"]
+    assert archivador.ledger.summary() == {"ok": 4}
+
+    # Terminada la ejecución, con stale_after_days se repite lo caducado
+    archivador.ledger.finish_run()
+    archivador = _archivador(tmp_path, paginas, stale_after_days=0)
+    archivador.force_refresh = False
+    archivador.download_documents(links)
+    assert len(archivador.session.pedidas) == 4
+
+
+def test_descarga_exporta_a_docs_dir(tmp_path):
+    links = pd.DataFrame(
+        {
+            "link": [f"{BASE}doc{i}.html" for i in range(2)],
+            "pope": "leo-xiv",
+            "lang": "es",
+            "title": [f"doc{i}.html" for i in range(2)],
+            "type": "homilies",
+        }
+    )
+    paginas = {url: f"<h1>{url}</h1>" for url in links["link"]}
+    _archivador(tmp_path, paginas).download_documents(links)
+    assert not (tmp_path / "docs").exists()
+
+    # Lo ya descargado se exporta desde el almacén, sin volver a pedirlo
+    archivador = _archivador(tmp_path, paginas, docs_dir=str(tmp_path / "docs"))
+    archivador.download_documents(links, save_markdown=True)
+    assert archivador.session.pedidas == []
+    carpeta = tmp_path / "docs" / "leo-xiv" / "es"
+    assert (carpeta / "doc0.html.html").read_text() == f"<h1>{BASE}doc0.html</h1>"
+    assert (carpeta / "doc1.html.md").read_text().startswith("# ")
+
+    nuevo = links.assign(link=f"{BASE}doc2.html", title="doc2.html").head(1)
+    paginas[f"{BASE}doc2.html"] = "<p>Nuevo</p>"
+    archivador = _archivador(tmp_path, paginas, docs_dir=str(tmp_path / "docs"))
+    archivador.download_documents(nuevo)
+    assert (carpeta / "doc2.html.html").read_text() == "<p>Nuevo</p>"
+
+
+def _fusion_por_filas(links_dir):
+    """Fusión fila a fila anterior a la vectorización (referencia de paridad)."""
+
+    def fecha(title):
+        match = re.search(r"(\d{8})", title)
+        if not match:
+            return None
+        digits = match.group(1)
+        if digits[:4].startswith(("19", "20")):
+            dt = pd.to_datetime(digits, format="%Y%m%d", errors="coerce")
+        elif digits[-4:].startswith(("19", "20")):
+            dt = pd.to_datetime(digits, format="%d%m%Y", errors="coerce")
+        else:
+            return None
+        return dt.strftime("%Y-%m-%d") if pd.notna(dt) else None
+
+    rows = []
+    for pope_slug in sorted(os.listdir(links_dir)):
+        for file in sorted(os.listdir(os.path.join(links_dir, pope_slug))):
+            with open(os.path.join(links_dir, pope_slug, file), encoding="utf-8") as f:
+                links_data = json.load(f)
+            lang = file.replace(".json", "")
+            for doc in links_data:
+                if isinstance(doc, str):
+                    doc = {"link": doc, "title_human": None}
+                rows.append(
+                    {
+                        "pope": pope_slug,
+                        "lang": lang,
+                        "link": doc.get("link"),
+                        "title_human": doc.get("title_human"),
+                    }
+                )
+    df = pd.DataFrame(rows).dropna(subset=["link"])
+    df["parts"] = df["link"].str.split("/")
+    df["title"] = df["parts"].apply(lambda parts: max(parts, key=len))
+    df["type"] = df["parts"].apply(lambda parts: parts[6] if len(parts) > 6 else None)
+    df["date"] = df["title"].apply(fecha)
+    df = df.drop(columns=["parts"])
+    df["title_human"] = df["title_human"].fillna(pd.NA)
+    df = df.sort_values(by=["date", "title", "lang"], ascending=[True, True, True])
+    df = df.dropna(subset=["date"])
+    df_pivot = df.pivot_table(
+        index=["pope", "type", "title", "date"],
+        columns="lang",
+        values="link",
+        aggfunc="first",
+    ).reset_index()
+    df_pivot = df_pivot.sort_values(by=["date", "title"], ascending=[True, True])
+    return df, df_pivot
+
+
+def test_fusion_vectorizada_igual_que_la_fusion_por_filas(tmp_path):
+    doc = BASE + "content/{}/{}/{}/documents/{}.html"
+    enlaces = {
+        ("leo-xiv", "es"): [
+            (doc.format("leo-xiv", "es", "homilies", "20250601-omelia"), "Homilía"),
+            (doc.format("leo-xiv", "es", "speeches", "20250601-vescovi"), None),
+            # DDMMYYYY, sin fecha, fecha imposible y sin enlace
+            (doc.format("leo-xiv", "es", "letters", "lettera_01062025"), "Carta"),
+            (doc.format("leo-xiv", "es", "letters", "sin-fecha"), "Sin fecha"),
+            (doc.format("leo-xiv", "es", "letters", "20251399-x"), "Imposible"),
+            (None, "Sin enlace"),
+            # Pocos segmentos: sin 'type'
+            (BASE + "content/20250602-discorso-senza-tipo.html", "Raíz"),
+        ],
+        ("leo-xiv", "it"): [
+            (doc.format("leo-xiv", "it", "homilies", "20250601-omelia"), "Omelia"),
+        ],
+        # Formato antiguo: lista de strings sin título
+        ("francesco", "la"): [
+            doc.format("francesco", "la", "homilies", "20130319_omelia-inizio"),
+            doc.format("francesco", "la", "angelus", "angelus_20130317"),
+        ],
+    }
+    for (pope, lang), datos in enlaces.items():
+        datos = [
+            {"link": d[0], "title_human": d[1]} if isinstance(d, tuple) else d
+            for d in datos
+        ]
+        (tmp_path / "links" / pope).mkdir(parents=True, exist_ok=True)
+        with open(tmp_path / "links" / pope / f"{lang}.json", "w") as f:
+            json.dump(datos, f)
+
+    df = _archivador(tmp_path, {}).merge_links_to_csv()
+
+    all_links, pivot = _fusion_por_filas(str(tmp_path / "links"))
+    csv = tmp_path / "csv"
+    for nombre, referencia in [("all_links", all_links), ("pivot_links", pivot)]:
+        esperado = referencia.to_csv(index=False, encoding="utf-8")
+        assert (csv / f"{nombre}.csv").read_text(encoding="utf-8") == esperado
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(csv / f"{nombre}.parquet"),
+            referencia.reset_index(drop=True).rename_axis(columns=None),
+            check_dtype=False,
+        )
+    assert len(df) == 7
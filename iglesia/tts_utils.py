@@ -0,0 +1,154 @@
+import os
+import re
+from xml.sax.saxutils import escape
+
+# Máximo de caracteres facturables por llamada a synthesize_speech de Polly
+POLLY_MAX_CHARS = 3000
+
+# Fin de frase: espacio tras la puntuación final (o tras un cierre de comillas
+# o paréntesis que la sigue)
+FIN_DE_FRASE = re.compile(r"(?:(?<=[.!?…])|(?<=[.!?…][»”\"')\]]))\s+")
+
+
+def _frases(parrafo: str) -> list:
+    return [f for f in FIN_DE_FRASE.split(parrafo) if f]
+
+
+def _partir_por_palabras(frase: str, max_length: int) -> list:
+    """Último recurso para una frase que no cabe sola: cortar entre palabras."""
+    trozos = []
+    while len(frase) > max_length:
+        corte = frase.rfind(" ", 0, max_length + 1)
+        if corte <= 0:
+            corte = max_length
+        trozos.append(frase[:corte].rstrip())
+        frase = frase[corte:].lstrip()
+    return trozos + [frase] if frase else trozos
+
+
+def split_text(texto: str, max_length: int = POLLY_MAX_CHARS) -> list:
+    """
+    Divide el texto en fragmentos de como mucho 'max_length' caracteres sin
+    partir frases ni palabras: se agrupan párrafos completos y el párrafo que
+    no cabe entero se reparte por frases. Los párrafos se separan con "\\n"
+    dentro del fragmento.
+    """
+    fragmentos = []
+    actual = ""
+
+    def _cabe(trozo, separador):
+        return len(actual) + len(separador) + len(trozo) <= max_length
+
+    def _anadir(trozo, separador):
+        nonlocal actual
+        if actual and _cabe(trozo, separador):
+            actual += separador + trozo
+            return
+        if actual:
+            fragmentos.append(actual)
+        actual = trozo
+
+    for parrafo in (p.strip() for p in texto.split("\n")):
+        if not parrafo:
+            continue
+        if not actual or _cabe(parrafo, "\n"):
+            if len(parrafo) <= max_length:
+                _anadir(parrafo, "\n")
+                continue
+        separador = "\n"
+        for frase in _frases(parrafo):
+            for trozo in _partir_por_palabras(frase, max_length):
+                _anadir(trozo, separador)
+                separador = " "
+    if actual:
+        fragmentos.append(actual)
+    return fragmentos
+
+
+def a_ssml(fragmento: str, pausa_parrafo: str = "600ms") -> str:
+    """
+    SSML de un fragmento de split_text: cada párrafo en un <p> seguido de
+    una pausa. Las etiquetas no cuentan para el límite facturable de Polly.
+    """
+    parrafos = [escape(p) for p in fragmento.split("\n") if p.strip()]
+    pausa = f'<break time="{pausa_parrafo}"/>'
+    return "<speak>" + pausa.join(f"<p>{p}</p>" for p in parrafos) + "</speak>"
+
+
+def split_text_fijo(texto: str, max_length: int = POLLY_MAX_CHARS) -> list:
+    """División anterior a cortes fijos de 'max_length' caracteres (referencia)."""
+    return [texto[i : i + max_length] for i in range(0, len(texto), max_length)]
+
+
+def _corta_palabra(izquierda: str, derecha: str) -> bool:
+    if not (izquierda and derecha):
+        return False
+    return izquierda[-1].isalnum() and derecha[0].isalnum()
+
+
+def estadisticas_fragmentos(textos, max_length: int = POLLY_MAX_CHARS) -> dict:
+    """
+    Compara split_text con los cortes fijos sobre una colección de textos:
+    llamadas a Polly (fragmentos) y cortes que parten una palabra.
+    """
+    resultado = {
+        "documentos": 0,
+        "caracteres": 0,
+        "llamadas_fijo": 0,
+        "llamadas_frases": 0,
+        "palabras_cortadas_fijo": 0,
+        "fragmento_max": 0,
+    }
+    for texto in textos:
+        fijo = split_text_fijo(texto, max_length)
+        frases = split_text(texto, max_length)
+        resultado["documentos"] += 1
+        resultado["caracteres"] += len(texto)
+        resultado["llamadas_fijo"] += len(fijo)
+        resultado["llamadas_frases"] += len(frases)
+        resultado["palabras_cortadas_fijo"] += sum(
+            _corta_palabra(a, b) for a, b in zip(fijo, fijo[1:])
+        )
+        resultado["fragmento_max"] = max(
+            [resultado["fragmento_max"]] + [len(f) for f in frases]
+        )
+    return resultado
+
+
+if __name__ == "__main__":
+    # Fragmentos por documento con cortes fijos y por frases sobre los HTML
+    # cacheados: python -m iglesia.tts_utils [carpeta] [max_chars_episodio]
+    import glob
+    import sys
+
+    from iglesia.clean_text import extract_clean_text
+    from iglesia.html_utils import extraer_texto_documento
+
+    carpeta = "vatican-archiver/documents/vatican_html"
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else carpeta
+    limite_antiguo = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    rutas = sorted(glob.glob(os.path.join(carpeta, "**", "*.html"), recursive=True))
+    textos = []
+    for ruta in rutas:
+        with open(ruta, "rb") as f:
+            texto = extraer_texto_documento(f.read())
+        textos.append(extract_clean_text(texto, usar_llm=False))
+
+    total = estadisticas_fragmentos(textos)
+    largos = estadisticas_fragmentos(t for t in textos if len(t) > limite_antiguo)
+    n = max(total["documentos"], 1)
+    print(f"Documentos: {total['documentos']} en '{carpeta}'")
+    print(
+        f"Fragmentos por documento: {total['llamadas_fijo'] / n:.2f} con cortes fijos, "
+        f"{total['llamadas_frases'] / n:.2f} por frases "
+        f"({total['llamadas_frases'] - total['llamadas_fijo']:+d} llamadas a Polly)"
+    )
+    print(
+        f"Palabras partidas por los cortes fijos: {total['palabras_cortadas_fijo']} "
+        f"(por frases: 0). Fragmento más largo: {total['fragmento_max']} caracteres"
+    )
+    print(
+        f"Documentos de más de {limite_antiguo} caracteres (antes se saltaban): "
+        f"{largos['documentos']}, {largos['llamadas_frases']} llamadas a Polly "
+        f"({largos['caracteres']} caracteres)"
+    )
@@ -1,46 +1,111 @@
+import json
+import os
 import re
 from datetime import datetime
 
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 
+from iglesia.html_utils import extraer_enlaces_indice, extraer_texto_documento
+from iglesia.http_utils import (
+    CacheHTTP,
+    LimitadorPorHost,
+    crear_sesion,
+    mapear_en_paralelo,
+)
+
+# Sesión y limitador compartidos por todas las descargas del módulo
+MAX_WORKERS = 8
+PETICIONES_POR_SEGUNDO = 4.0
+HTTP_TIMEOUT = 30
+
+# Caché HTTP en disco. Los documentos con más de DIAS_CONGELADO días no se
+# vuelven a pedir; el resto se revalida con GET condicional.
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", "cache/http")
+DIAS_CONGELADO = int(os.environ.get("HTTP_CACHE_DIAS_CONGELADO", "30"))
+USAR_CACHE_HTTP = os.environ.get("HTTP_CACHE", "1") != "0"
+
+# Manifiesto de documentos ya vistos (url -> fecha, título, tipo)
+MANIFEST_PATH = "json-rss/manifest.json"
+
+_sesion = None
+_limitador = None
+_cache = None
+
+
+def obtener_sesion():
+    """Devuelve la sesión HTTP compartida (pool de conexiones) del módulo."""
+    global _sesion
+    if _sesion is None:
+        _sesion = crear_sesion(pool_maxsize=MAX_WORKERS)
+    return _sesion
+
+
+def obtener_limitador():
+    """Devuelve el limitador de tasa por host compartido del módulo."""
+    global _limitador
+    if _limitador is None:
+        _limitador = LimitadorPorHost(PETICIONES_POR_SEGUNDO)
+    return _limitador
+
+
+def obtener_cache():
+    """Devuelve la caché HTTP en disco del módulo, o None si está desactivada."""
+    global _cache
+    if _cache is None and USAR_CACHE_HTTP:
+        _cache = CacheHTTP(HTTP_CACHE_DIR, dias_congelado=DIAS_CONGELADO)
+    return _cache
+
+
+def _fecha_desde_url(url):
+    match = re.search(r"/(\d{8})-", url)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d")
+        except ValueError:
+            pass
+    return None
+
+
+def _descargar(url):
+    cache = obtener_cache()
+    if cache is None:
+        obtener_limitador().esperar(url)
+        return obtener_sesion().get(url, timeout=HTTP_TIMEOUT)
+
+    fecha_documento = _fecha_desde_url(url)
+    # Los documentos archivados se sirven desde disco sin consumir turno
+    if not (cache.esta_congelado(fecha_documento) and cache.contiene(url)):
+        obtener_limitador().esperar(url)
+    return cache.get(obtener_sesion(), url, fecha_documento, HTTP_TIMEOUT)
+
 
 def obtener_homilias_vaticano(url):
-    response = requests.get(url)
+    response = _descargar(url)
     if response.status_code != 200:
         print("Error:", response.status_code)
         return []
 
-    soup = BeautifulSoup(response.content, "html.parser")
-    homilias = []
-
-    # Busca dentro de <div class="vaticanindex">
-    contenedor = soup.find("div", class_="vaticanindex")
-    if not contenedor:
+    # Entradas <li><a> dentro de <div class="vaticanindex">
+    enlaces = extraer_enlaces_indice(response.content)
+    if enlaces is None:
         print("No se encontró el contenedor principal.")
         return []
 
-    # Encuentra todas las entradas <li> dentro del <ul>
-    for li in contenedor.find_all("li"):
-        enlace = li.find("a")
-        if enlace and enlace["href"]:
-            titulo = enlace.get_text(strip=True)
-            href = enlace["href"]
-            if href.startswith("/"):
-                href = "https://www.vatican.va" + href
-            homilias.append({"titulo": titulo, "url": href})
+    homilias = []
+    for enlace in enlaces:
+        href = enlace["href"]
+        if href.startswith("/"):
+            href = "https://www.vatican.va" + href
+        homilias.append({"titulo": enlace["titulo"], "url": href})
 
     return homilias
 
 
 # Función para extraer y formatear la fecha desde la URL
 def extraer_fecha_desde_url(url):
-    match = re.search(r"/(\d{8})-", url)
-    if match:
-        fecha_str = match.group(1)
-        fecha_dt = datetime.strptime(fecha_str, "%Y%m%d")
+    fecha_dt = _fecha_desde_url(url)
+    if fecha_dt:
         return fecha_dt.strftime("%d de %B de %Y")  # Por ejemplo: "11 de mayo de 2025"
     return ""
 
@@ -48,18 +113,10 @@ def extraer_fecha_desde_url(url):
 def extraer_homilia(homilia):
     url = homilia["url"]
     titulo_homilia = homilia["titulo"]
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, "html.parser")
+    response = _descargar(url)
 
-    div_testo = soup.find("div", class_="testo")
-
-    # Texto principal de la homilía
-    texto_container = div_testo.find_all("div", class_="text")
-    texto = "\n".join(
-        p.get_text(separator=" ", strip=True)
-        for div in texto_container
-        for p in div.find_all("p")
-    )
+    # Texto principal de la homilía (<div class="testo"> / <div class="text">)
+    texto = extraer_texto_documento(response.content)
 
     # Fecha desde la URL
     fecha = extraer_fecha_desde_url(url)
@@ -72,22 +129,80 @@ def extraer_homilia(homilia):
     }
 
 
-def obtener_todos_los_textos(urls):
-    all_homilias = []
+def cargar_manifest(path: str = MANIFEST_PATH) -> dict:
+    """Carga el manifiesto de documentos ya vistos, o uno vacío si no existe."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"ADVERTENCIA: No se pudo leer el manifiesto {path}: {e}")
+        return {}
+
+
+def guardar_manifest(manifest: dict, path: str = MANIFEST_PATH) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
 
-    for tipo, lista_urls in tqdm(urls.items()):
-        for url in lista_urls:
-            homilias = obtener_homilias_vaticano(url)
-            homilias_df = [extraer_homilia(h) for h in homilias]
+def _hay_que_descargar(url, manifest, since):
+    """Un documento se descarga si es nuevo o si cae dentro de la ventana."""
+    if since is None or url not in manifest:
+        return True
+    fecha_dt = _fecha_desde_url(url)
+    return fecha_dt is None or fecha_dt >= since
+
+
+def obtener_todos_los_textos(
+    urls,
+    max_workers: int = MAX_WORKERS,
+    since=None,
+    manifest_path: str = MANIFEST_PATH,
+):
+    """
+    Descarga todos los textos de las páginas de índice de 'urls'.
+
+    Con 'since' (fecha) solo se descargan los documentos nuevos (no presentes
+    en el manifiesto) o publicados a partir de esa fecha; los índices se
+    siguen leyendo siempre para descubrir documentos nuevos.
+    """
+    since = pd.to_datetime(since).to_pydatetime() if since is not None else None
+    manifest = cargar_manifest(manifest_path) if manifest_path else {}
+
+    # 1. Descargar las páginas de índice en paralelo, conservando el orden
+    indices = [(tipo, url) for tipo, lista_urls in urls.items() for url in lista_urls]
+    listados = mapear_en_paralelo(
+        lambda indice: obtener_homilias_vaticano(indice[1]), indices, max_workers
+    )
+    pendientes = [
+        (tipo, h)
+        for (tipo, _), homilias in zip(indices, listados)
+        for h in homilias
+        if _hay_que_descargar(h["url"], manifest, since)
+    ]
+    if since is not None:
+        print(f"Documentos a descargar desde {since:%Y-%m-%d}: {len(pendientes)}")
 
-            # Añadir el tipo de homilía al DataFrame
-            for h in homilias_df:
-                h["tipo"] = tipo
+    # 2. Descargar todos los documentos con el mismo pool de conexiones
+    documentos = mapear_en_paralelo(
+        lambda pendiente: extraer_homilia(pendiente[1]), pendientes, max_workers
+    )
 
-            all_homilias.extend(homilias_df)
+    all_homilias = []
+    for (tipo, _), h in tqdm(
+        zip(pendientes, documentos), total=len(pendientes), desc="Descargando textos"
+    ):
+        # Añadir el tipo de homilía al DataFrame
+        h["tipo"] = tipo
+        all_homilias.append(h)
 
     # Convertir a DataFrame
-    all_homilias = pd.DataFrame(all_homilias)
+    all_homilias = pd.DataFrame(
+        all_homilias, columns=["tipo", "fecha", "titulo_homilia", "url", "texto"]
+    )
 
     # Reordenar columnas y renombrar
     all_homilias = all_homilias.rename(columns={"titulo_homilia": "titulo"})
@@ -102,4 +217,58 @@ def obtener_todos_los_textos(urls):
     )
     all_homilias["fecha"] = all_homilias["fecha"].dt.strftime("%Y-%m-%d")
 
+    # 3. Registrar en el manifiesto los documentos descargados
+    if manifest_path:
+        visto = datetime.now().isoformat(timespec="seconds")
+        for row in all_homilias.itertuples():
+            manifest.setdefault(row.url, {"visto": visto}).update(
+                {
+                    "fecha": row.fecha if isinstance(row.fecha, str) else None,
+                    "titulo": row.titulo,
+                    "tipo": row.tipo,
+                }
+            )
+        guardar_manifest(manifest, manifest_path)
+
     return all_homilias
+
+
+# --- Snapshot del corpus por fecha de ejecución ---
+def ruta_snapshot_corpus(run_date: str, base_dir: str = "json-rss") -> str:
+    return os.path.join(base_dir, run_date, "corpus.jsonl")
+
+
+def guardar_snapshot_corpus(df: pd.DataFrame, path: str, since=None) -> None:
+    """
+    Guarda el corpus descargado en JSONL junto a un pequeño fichero de
+    metadatos que indica desde qué fecha ('since') está completo.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    df.to_json(path + ".tmp", orient="records", lines=True, force_ascii=False)
+    os.replace(path + ".tmp", path)
+    meta = {
+        "since": pd.Timestamp(since).strftime("%Y-%m-%d") if since is not None else None,
+        "creado": datetime.now().isoformat(timespec="seconds"),
+        "documentos": len(df),
+    }
+    with open(path + ".meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def cargar_snapshot_corpus(path: str, since=None):
+    """
+    Devuelve el corpus guardado en 'path' si existe y cubre la ventana pedida
+    (su 'since' es anterior o igual al solicitado). Si no, devuelve None.
+    """
+    if not os.path.exists(path) or not os.path.exists(path + ".meta.json"):
+        return None
+    with open(path + ".meta.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("since") is not None and (
+        since is None or pd.Timestamp(meta["since"]) > pd.Timestamp(since)
+    ):
+        return None
+    df = pd.read_json(path, orient="records", lines=True, dtype=False, convert_dates=False)
+    if df.empty:
+        df = pd.DataFrame(columns=["tipo", "fecha", "titulo", "url", "texto"])
+    return df
@@ -10,11 +10,18 @@ from crewai import LLM
 from dotenv import find_dotenv, load_dotenv
 from typer import Typer
 
+from iglesia import llm_utils
 from iglesia.agents import create_iglesia_content_crew
-from iglesia.audio_utils import procesar_y_generar_episodios
+from iglesia.audio_utils import completar_datos_audio, procesar_y_generar_episodios
+from iglesia.catalogo import CatalogoEpisodios
 from iglesia.cognito_utils import cognito_get_verified_emails
 from iglesia.email_utils_3 import enviar_correos_todos
-from iglesia.utils import obtener_todos_los_textos
+from iglesia.utils import (
+    cargar_snapshot_corpus,
+    guardar_snapshot_corpus,
+    obtener_todos_los_textos,
+    ruta_snapshot_corpus,
+)
 from iglesia.telegram_utils import send_telegram_notification
 
 app = Typer()
@@ -56,10 +63,34 @@ def limpiar_nombre_archivo(nombre):
     return nombre.strip("_").lower()[:100]
 
 
+def obtener_corpus(run_date: str, since=None, refresh_corpus: bool = False):
+    """
+    Devuelve el corpus de textos para 'run_date'. La primera etapa que lo
+    necesita lo descarga y lo guarda en json-rss/<run_date>/corpus.jsonl; las
+    siguientes etapas y comandos para la misma fecha lo reutilizan.
+    """
+    snapshot_path = ruta_snapshot_corpus(run_date)
+    if not refresh_corpus:
+        df = cargar_snapshot_corpus(snapshot_path, since)
+        if df is not None:
+            print(f"Reutilizando corpus ya descargado: {snapshot_path} ({len(df)} textos)")
+            return df
+
+    df = obtener_todos_los_textos(URLS_VATICANO, since=since)
+    guardar_snapshot_corpus(df, snapshot_path, since)
+    print(f"Corpus guardado en {snapshot_path} ({len(df)} textos)")
+    return df
+
+
 @app.command()
-def generar_audios_diarios(run_date: str = None):
+def generar_audios_diarios(
+    run_date: str = None, since: str = None, refresh_corpus: bool = False
+):
     """
     Scrapea textos para una fecha y crea el 'episodes.json' para los audios. No ejecuta agentes de IA.
+    Con --since (YYYY-MM-DD) solo se descargan documentos nuevos o posteriores a esa fecha;
+    por defecto, el inicio de la ventana de 7 días.
+    Con --refresh-corpus se ignora el corpus ya descargado para esa fecha.
     """
     if run_date is None:
         run_date = pd.Timestamp.now()
@@ -79,12 +110,14 @@ def generar_audios_diarios(run_date: str = None):
     print(f"Preparando datos de audio para la fecha: {run_date}")
     os.makedirs(f"json-rss/{run_date}", exist_ok=True)
 
-    # Asegúrate de que URLS_VATICANO esté definida fuera de esta función
-    df = obtener_todos_los_textos(URLS_VATICANO)
+    run_date_dt = pd.to_datetime(run_date)
+    if since is None:
+        since = run_date_dt - pd.Timedelta(days=7)
+
+    df = obtener_corpus(run_date, since=since, refresh_corpus=refresh_corpus)
     df = df[df["titulo"].str.len() > 10].reset_index(drop=True)
 
     df["fecha_dt"] = pd.to_datetime(df["fecha"])
-    run_date_dt = pd.to_datetime(run_date)
     df = df[
         (df["fecha_dt"] >= (run_date_dt - pd.Timedelta(days=7)))
         & (df["fecha_dt"] < run_date_dt)
@@ -108,7 +141,10 @@ def generar_audios_diarios(run_date: str = None):
     df.to_json(f"json-rss/{run_date}/episodes.json", orient="index")
     print("Datos de audio preparados con éxito.")
     print("Generando audios:")
-    generar_audios(run_date=run_date, index_files=None)
+    # Llamada directa: hay que pasar las opciones de typer con su valor real
+    generar_audios(
+        run_date=run_date, index_files=None, no_llm_cache=False, batch_llm=False
+    )
 
 
 def save_wordcloud(text, path_save="wordcloud.png"):
@@ -136,6 +172,8 @@ def run_agents(
     calculate_wordcloud=False,
     run_domingo: bool = False,
     run_date: str = None,
+    since: str = None,
+    refresh_corpus: bool = False,
 ):
     print(os.getcwd())
     LLM_used = LLM(
@@ -154,7 +192,11 @@ def run_agents(
     os.makedirs(f"{os.environ.get('SUMMARIES_FOLDER')}/{run_date}", exist_ok=True)
     os.makedirs(f"json-rss/{run_date}", exist_ok=True)
     print(f"{os.environ.get('SUMMARIES_FOLDER')}/{run_date}")
-    df = obtener_todos_los_textos(URLS_VATICANO)
+    run_date_dt = pd.to_datetime(run_date)
+    if since is None:
+        # Solo hace falta descargar la ventana que se va a resumir
+        since = run_date_dt - pd.Timedelta(days=6 if run_domingo else 7)
+    df = obtener_corpus(run_date, since=since, refresh_corpus=refresh_corpus)
     df = df[df["titulo"].str.len() > 10]
     df = df.reset_index(drop=True)
     print(df)
@@ -171,7 +213,6 @@ def run_agents(
 
     df["fecha_dt"] = pd.to_datetime(df["fecha"])
 
-    run_date_dt = pd.to_datetime(run_date)
     if run_domingo:
         # incluir los textos del mismo día
         df = df[
@@ -226,14 +267,20 @@ def pipeline_semanal(debug: bool = True, fecha_de_hoy: str = None):
 
 @app.command()
 def pipeline_diaria(
-    debug: bool = False, calculate_wordcloud: bool = False, run_domingo: bool = False
+    debug: bool = False,
+    calculate_wordcloud: bool = False,
+    run_domingo: bool = False,
+    refresh_corpus: bool = False,
 ):
     """
     Ejecutar el pipeline diario de la iglesia. Generar web y enviar correo prueba.
     """
     fecha_de_hoy = pd.Timestamp.now().strftime("%Y-%m-%d")
     run_agents(
-        debug=debug, calculate_wordcloud=calculate_wordcloud, run_domingo=run_domingo
+        debug=debug,
+        calculate_wordcloud=calculate_wordcloud,
+        run_domingo=run_domingo,
+        refresh_corpus=refresh_corpus,
     )
 
     contacts = cognito_get_verified_emails()
@@ -254,6 +301,8 @@ def pipeline_date(
     debug: bool = False,
     calculate_wordcloud: bool = False,
     run_domingo: bool = False,
+    since: str = None,  # solo descargar documentos nuevos o desde esta fecha
+    refresh_corpus: bool = False,  # ignorar el corpus ya descargado para la fecha
 ):
     """
     Ejecutar el pipeline para una fecha específica y generar web. No enviar correos.
@@ -268,6 +317,8 @@ def pipeline_date(
         calculate_wordcloud=calculate_wordcloud,
         run_domingo=run_domingo,
         run_date=run_date,
+        since=since,
+        refresh_corpus=refresh_corpus,
     )
 
     contacts = cognito_get_verified_emails()
@@ -286,10 +337,23 @@ def generar_audios(
     index_files: Optional[List[int]] = typer.Option(
         None, help="Lista de índices de archivos"
     ),
+    no_llm_cache: bool = typer.Option(
+        False, help="Vuelve a consultar al LLM aunque la respuesta esté en caché"
+    ),
+    batch_llm: bool = typer.Option(
+        False, help="Genera los metadatos con la Batch API de OpenAI (más barata)"
+    ),
 ):
     """
     Genera los archivos de audio para una fecha específica y los sube a S3.
     """
+    if no_llm_cache and batch_llm:
+        # Las respuestas del lote llegan a través de la caché: se pagarían dos veces
+        raise typer.BadParameter(
+            "no se puede combinar con --no-llm-cache", param_hint="--batch-llm"
+        )
+    if no_llm_cache:
+        llm_utils.USAR_CACHE_LLM = False
     if run_date is None:
         tomorrow = pd.Timestamp.now() + pd.Timedelta(days=1)
         run_date = tomorrow.strftime("%Y-%m-%d")
@@ -316,39 +380,58 @@ def generar_audios(
         temperature=0.2,
     )
     resultados = procesar_y_generar_episodios(
-        json_path, llm_real, only_metadata, force_create_audio, index_files
+        json_path,
+        llm_real,
+        only_metadata,
+        force_create_audio,
+        index_files,
+        modo_batch=batch_llm,
     )
 
-    # 🔔 Notificación a Telegram para nuevas Homilías
-    token = os.environ.get("TELEGRAM_BOT_TOKEN")
-    chat_id = "@HomiliasPapa"
-
-    print("📢 Verificando si hay homilías nuevas para notificar en Telegram...")
-    for item in resultados:
-        # Verificar si es tipo Homilia (ajustar mayúsculas según data real) y si es nuevo
-        if item.get("is_new") is True: # 
-            titulo = item.get("titulo_spotify", "Nueva Homilía")
-            url_audio = item.get("url_audio", "")
-            resumen_spotify = item.get("descripcion_spotify", "")
-            vatican_url = item.get("vatican_url", "")
-            tipo = item.get("tipo", "")
-            
-            # Mensaje simple sin Markdown complicado para asegurar entrega
-            msg = f"*🎧 Nueva intervención del Papa León XIV*: {tipo}\n\n*{titulo}*\n\n*Escúchala aquí*: {url_audio}\n\n*Resumen*:\n{resumen_spotify}\n\n*Docucumento original*: {vatican_url}"
-            
-            print(f"  -> Enviando notificación para: {titulo}")
-            send_telegram_notification(token, chat_id, msg)
-            
     print("\n\n--- RESULTADOS DEL LLM ---")
     print(json.dumps(resultados, indent=4, ensure_ascii=False))
     print("---------------------------")
 
-    # Guardar los metadatos en el archivo correspondiente
+    # El catálogo se abre (y se sincroniza con json-rss) antes de sobrescribir
+    # el JSON de esta fecha, y solo se actualiza una vez guardado
+    catalogo = CatalogoEpisodios()
     output_metadata_path = f"json-rss/{run_date}/episodes_metadata.json"
     print(f"Guardando metadatos en: {output_metadata_path}")
     with open(output_metadata_path, "w", encoding="utf-8") as f:
         json.dump(resultados, f, ensure_ascii=False, indent=4)
     print("✅ Metadatos guardados.")
+    catalogo.registrar(run_date, resultados)
+
+    # 🔔 Notificación a Telegram para nuevas Homilías
+    token = os.environ.get("TELEGRAM_BOT_TOKEN")
+    chat_id = "@HomiliasPapa"
+
+    print("📢 Verificando si hay homilías nuevas para notificar en Telegram...")
+    # Solo los episodios nuevos que el catálogo no tiene ya como notificados
+    # (p. ej. al regenerar el audio con --force-create-audio)
+    nuevos = [item["filename"] for item in resultados if item.get("is_new") is True]
+    for item in catalogo.pendientes_de_notificar(nuevos):
+        titulo = item.get("titulo_spotify", "Nueva Homilía")
+        url_audio = item.get("url_audio", "")
+        resumen_spotify = item.get("descripcion_spotify", "")
+        vatican_url = item.get("vatican_url", "")
+        tipo = item.get("tipo", "")
+
+        # Mensaje simple sin Markdown complicado para asegurar entrega
+        msg = f"*🎧 Nueva intervención del Papa León XIV*: {tipo}\n\n*{titulo}*\n\n*Escúchala aquí*: {url_audio}\n\n*Resumen*:\n{resumen_spotify}\n\n*Docucumento original*: {vatican_url}"
+
+        print(f"  -> Enviando notificación para: {titulo}")
+        if send_telegram_notification(token, chat_id, msg):
+            catalogo.marcar_notificado(item["filename"])
+
+
+@app.command()
+def completar_datos_audio_rss(json_base_dir: str = "json-rss"):
+    """
+    Añade el tamaño y la duración del audio a los episodes_metadata.json de
+    episodios antiguos, para que generar_rss.py no tenga que consultar S3.
+    """
+    completar_datos_audio(json_base_dir)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 import math
 import os
+import sys
 from datetime import datetime, timedelta
 
 import pandas as pd
@@ -99,16 +100,27 @@ def batch_upsert(table_name: str, data: list, on_conflict: str, chunk_size: int
 
 # --- Punto de Entrada Principal (Lógica de Batching) ---
 if __name__ == "__main__":
-    CSV_PATH = "vatican-archiver/documents/links/all_links.csv"
-
-    print(f"Iniciando carga masiva desde: {CSV_PATH}")
-    if not os.path.exists(CSV_PATH):
-        print(f"Error: No se encuentra el archivo {CSV_PATH}")
+    LINKS_PATH = "vatican-archiver/documents/links/all_links.parquet"
+    # Con --delta solo se cargan los enlaces añadidos en la última exploración
+    DELTA = "--delta" in sys.argv
+    if DELTA:
+        LINKS_PATH = "vatican-archiver/documents/links/links_delta.parquet"
+
+    print(f"Iniciando carga masiva desde: {LINKS_PATH}")
+    if not os.path.exists(LINKS_PATH):
+        print(f"Error: No se encuentra el archivo {LINKS_PATH}")
         exit()
 
     try:
-        df = pd.read_csv(CSV_PATH)
-        print(f"Se encontraron {len(df)} enlaces en el CSV.")
+        df = pd.read_parquet(LINKS_PATH)
+        if DELTA:
+            eliminados = df[df["change"] == "removed"]
+            if not eliminados.empty:
+                print(
+                    f"Aviso: {len(eliminados)} enlaces ya no aparecen en el Vaticano (no se borran)."
+                )
+            df = df[df["change"] == "added"].drop(columns="change")
+        print(f"Se encontraron {len(df)} enlaces en el Parquet.")
 
         # --- 0. Limpieza y Preparación del DataFrame ---
         df = df.dropna(subset=["date", "title"])
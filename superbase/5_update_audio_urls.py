@@ -1,14 +1,14 @@
-import json
 import math
 import os
 import re
-from pathlib import Path
 
 import pandas as pd  # Usaremos pandas para manejar los datos fácilmente
 from dotenv import load_dotenv
 from supabase import Client, create_client
 from tqdm import tqdm
 
+from iglesia.catalogo import CatalogoEpisodios
+
 load_dotenv()
 
 # --- Configuración de Supabase ---
@@ -89,33 +89,11 @@ def batch_upsert(table_name: str, data: list, on_conflict: str, chunk_size: int
 
 # --- Punto de Entrada Principal ---
 if __name__ == "__main__":
-    BASE_DIR = Path("json-rss")
-    print(
-        f"Buscando archivos 'episodes_metadata.json' en subcarpetas de: {BASE_DIR.resolve()}"
-    )
-
-    # 1. Encontrar y leer todos los JSON
-    all_episodes = []
-    json_files = list(BASE_DIR.glob("**/episodes_metadata.json"))
-
-    if not json_files:
-        print("No se encontraron archivos 'episodes_metadata.json'.")
-        exit()
-
-    print(f"Se encontraron {len(json_files)} archivos JSON.")
-    for file_path in json_files:
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    all_episodes.extend(data)
-                elif isinstance(data, dict):
-                    all_episodes.append(data)
-        except Exception as e:
-            print(f"⚠️ Error leyendo {file_path}: {e}")
+    # 1. Leer todos los episodios del catálogo (sincronizado con json-rss)
+    all_episodes = CatalogoEpisodios().episodios()
 
     if not all_episodes:
-        print("No se pudo leer ningún dato de los archivos JSON.")
+        print("No hay episodios en el catálogo.")
         exit()
 
     df = pd.DataFrame(all_episodes)
@@ -1,6 +1,7 @@
 import json
 import os
 import re
+import sys
 import unicodedata
 from datetime import datetime
 
@@ -10,40 +11,189 @@ from tqdm import tqdm
 
 from iglesia.audio_utils import calculate_pontificate_week
 from iglesia.clean_text import extract_clean_text
-from iglesia.utils import extraer_homilia
-
-tqdm.pandas()
+from iglesia.http_utils import mapear_en_paralelo
+from iglesia.llm_batch import LoteLLM
+from iglesia.llm_utils import (
+    LLM_MAX_WORKERS,
+    estimar_tokens,
+    extraer_json,
+    llamar_llm_cacheado,
+    mapear_llm,
+    nombre_modelo,
+)
+from iglesia.utils import MAX_WORKERS, extraer_homilia
 
 llm_client = LLM(model="gpt-4.1-nano")
 
+# Cambiar la versión al modificar el prompt invalida la caché de respuestas
+PROMPT_METADATOS_VERSION = "metadatos-enriquecidos-v1"
+
+COLUMNAS_METADATOS = [
+    "titulo_spotify",
+    "descripcion_spotify",
+    "titulo_youtube",
+    "mensaje_instagram",
+    "frases_seleccionadas",
+]
+# Claves sin las que la respuesta del LLM no se acepta (ni se guarda en caché)
+CLAVES_METADATOS = ("titulo_spotify", "titulo_youtube")
+# Columnas del LLM que son listas de frases; el resto son textos
+COLUMNAS_LISTA = ["frases_seleccionadas"]
+
+
+# --- SALIDA INCREMENTAL ---
+# Cada lote enriquecido se escribe como un Parquet nuevo en <path_output>/parts/
+# (solo se añaden ficheros). compactar_enriquecidos() los consolida en
+# all_links_enriched.parquet y exporta all_links_enriched.json.
+def _rutas_salida(path_output: str) -> dict:
+    return {
+        "parts": os.path.join(path_output, "parts"),
+        "parquet": os.path.join(path_output, "all_links_enriched.parquet"),
+        "json": os.path.join(path_output, "all_links_enriched.json"),
+    }
+
+
+def _partes(path_output: str) -> list:
+    carpeta = _rutas_salida(path_output)["parts"]
+    if not os.path.isdir(carpeta):
+        return []
+    return sorted(
+        os.path.join(carpeta, f) for f in os.listdir(carpeta) if f.endswith(".parquet")
+    )
+
+
+def slugs_enriquecidos(path_output: str) -> set:
+    """Slugs ('title') ya enriquecidos, leyendo solo esa columna."""
+    rutas = _rutas_salida(path_output)
+    ficheros = _partes(path_output)
+    slugs = set()
+    if os.path.exists(rutas["parquet"]):
+        ficheros.append(rutas["parquet"])
+    elif os.path.exists(rutas["json"]):
+        # Formato anterior: solo el JSON (se migra en la próxima compactación)
+        try:
+            slugs.update(pd.read_json(rutas["json"], orient="records")["title"])
+        except (ValueError, KeyError):
+            print("El JSON existente parece estar corrupto. Se ignorará.")
+    for fichero in ficheros:
+        slugs.update(pd.read_parquet(fichero, columns=["title"])["title"])
+    return slugs
+
+
+def _texto(valor):
+    if valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, float) and valor != valor:  # NaN
+        return None
+    return json.dumps(valor, ensure_ascii=False)
+
+
+def _lista_de_textos(valor):
+    if hasattr(valor, "tolist") and not isinstance(valor, str):
+        valor = valor.tolist()  # Arrays de numpy (listas leídas de Parquet)
+    if isinstance(valor, (list, tuple)):
+        return [_texto(v) or "" for v in valor]
+    valor = _texto(valor)
+    return None if valor is None else [valor]
+
+
+def normalizar_metadatos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Unifica el tipo de las columnas que genera el LLM (list[str] para las
+    frases, str para el resto): el LLM a veces devuelve una frase suelta o
+    un objeto, y Parquet no admite tipos mezclados en una columna.
+    """
+    # Los NaN de columnas de objetos (p. ej. sin frases) se guardan como nulos
+    df = df.astype(object).where(df.notna(), None)
+    for columna in COLUMNAS_METADATOS:
+        if columna in df.columns:
+            convertir = _lista_de_textos if columna in COLUMNAS_LISTA else _texto
+            df[columna] = df[columna].map(convertir)
+    return df
+
+
+def guardar_lote(df: pd.DataFrame, path_output: str) -> str:
+    """Escribe un lote enriquecido como un nuevo Parquet en parts/ (atómico)."""
+    carpeta = _rutas_salida(path_output)["parts"]
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, f"part-{datetime.now():%Y%m%dT%H%M%S%f}.parquet")
+    df = normalizar_metadatos(df)
+    df.to_parquet(ruta + ".tmp", index=False)
+    os.replace(ruta + ".tmp", ruta)
+    return ruta
+
+
+def compactar_enriquecidos(path_output: str) -> pd.DataFrame:
+    """
+    Consolida el fichero anterior y todos los lotes de parts/ (gana el último
+    por 'title') en all_links_enriched.parquet y all_links_enriched.json, y
+    después borra los lotes ya consolidados.
+    """
+    rutas = _rutas_salida(path_output)
+    partes = _partes(path_output)
+    frames = []
+    if os.path.exists(rutas["parquet"]):
+        frames.append(pd.read_parquet(rutas["parquet"]))
+    elif os.path.exists(rutas["json"]):
+        try:
+            frames.append(pd.read_json(rutas["json"], orient="records"))
+        except ValueError:
+            print("El JSON existente parece estar corrupto. Se ignorará.")
+    frames.extend(pd.read_parquet(parte) for parte in partes)
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=["title"])
+
+    df_final = pd.concat(frames, ignore_index=True)
+    df_final = df_final.drop_duplicates(subset=["title"], keep="last")
+    # Los lotes y el JSON anteriores pueden traer tipos sin normalizar
+    df_final = normalizar_metadatos(df_final)
+
+    df_final.to_parquet(rutas["parquet"] + ".tmp", index=False)
+    os.replace(rutas["parquet"] + ".tmp", rutas["parquet"])
+    df_final.to_json(rutas["json"] + ".tmp", orient="records")
+    os.replace(rutas["json"] + ".tmp", rutas["json"])
+    for parte in partes:
+        os.remove(parte)
+
+    print(f"Compactadas {len(df_final)} homilías ({len(partes)} lotes) en {rutas['json']}")
+    return df_final
+
+
+def numerar_episodios(homilias: pd.DataFrame) -> pd.Series:
+    """
+    Número de episodio ('<semana de pontificado>.<orden en la semana>') de
+    cada homilía, indexado por 'title'. Se calcula sobre todas las homilías
+    y no solo las nuevas, para que las de una ejecución reanudada continúen
+    la numeración de su semana.
+    """
+    fechas = pd.to_datetime(homilias["date"], errors="coerce")
+    homilias = homilias.assign(date_dt=fechas).dropna(subset=["date_dt"])
+    homilias["pontificate_week"] = homilias["date"].apply(calculate_pontificate_week)
+    homilias = homilias.sort_values(["lang", "pontificate_week", "date_dt"])
+    orden = homilias.groupby(["lang", "pontificate_week"]).cumcount() + 1
+    numeros = homilias["pontificate_week"].astype(str) + "." + orden.astype(str)
+    return pd.Series(numeros.to_numpy(), index=homilias["title"].to_numpy())
+
 
 def enriquecer_episodios(
-    path_all_links: str = "vatican-archiver/documents/links/all_links.csv",
+    path_all_links: str = "vatican-archiver/documents/links/all_links.parquet",
     path_types_list: str = "assets/types_list.csv",
     path_output: str = "vatican-archiver/documents/links_enriched",
     pope: str = "leo-xiv",
     language: str = "es",
+    max_workers: int = LLM_MAX_WORKERS,
+    tamano_lote: int = 20,
+    modo_batch: bool = False,
+    esperar_batch: bool = True,
 ):
     os.makedirs(path_output, exist_ok=True)
-    output_file = os.path.join(path_output, "all_links_enriched.json") # Define el path del archivo de salida
 
     # --- [PASO 1: LEER DATOS YA ENRIQUECIDOS] ---
-    # Carga el archivo JSON si existe, para saber qué hemos procesado ya.
-    if os.path.exists(output_file):
-        print(f"Cargando {output_file} existente para evitar duplicados...")
-        try:
-            df_enriched = pd.read_json(output_file, orient="records")
-            # Usamos 'title' (el slug/filename) como clave única
-            enriched_slugs = set(df_enriched['title'])
-            print(f"Encontrados {len(enriched_slugs)} slugs ya enriquecidos.")
-        except ValueError:
-            print("El JSON existente parece estar corrupto. Se procesará todo de nuevo.")
-            df_enriched = pd.DataFrame(columns=['title']) # DataFrame vacío
-            enriched_slugs = set()
-    else:
-        print(f"No se encontró {output_file}. Se procesará todo.")
-        df_enriched = pd.DataFrame(columns=['title']) # DataFrame vacío
-        enriched_slugs = set()
+    # Solo se lee la columna 'title' (el slug/filename), que es la clave única.
+    # Los lotes de una ejecución interrumpida también cuentan como hechos.
+    enriched_slugs = slugs_enriquecidos(path_output)
+    print(f"Encontrados {len(enriched_slugs)} slugs ya enriquecidos.")
     # --- [FIN PASO 1] ---
 
 
@@ -61,15 +211,12 @@ def enriquecer_episodios(
         return nombre.strip("_").lower()[:100]
 
 
-    def _generar_metadatos_episodio_new(texto_limpio, episodio_info, llm_client):
-        # ... (tu función de LLM no cambia) ...
-        print("🎙️  Generando título y descripción con IA...")
-        try:
-            fecha_dt = datetime.strptime(episodio_info["fecha"], "%Y-%m-%d")
-            fecha_simple = fecha_dt.strftime("%d/%m")
-            numero_formateado = episodio_info["numero_episodio"]
+    def _prompt_metadatos(texto_limpio, episodio_info):
+        fecha_dt = datetime.strptime(episodio_info["fecha"], "%Y-%m-%d")
+        fecha_simple = fecha_dt.strftime("%d/%m")
+        numero_formateado = episodio_info["numero_episodio"]
 
-            prompt = f"""
+        return f"""
             Eres un experto en comunicación para podcasts religiosos. Todo el texto que generes debe de estar en el idioma: {episodio_info["lang"]}
             Basado en el siguiente texto, genera un título y una descripción optimizados para Spotify.
             El formato de salida DEBE ser un JSON válido con las claves "titulo_spotify", "descripcion_spotify", "titulo_youtube", "mensaje_instagram", "frases_seleccionadas".
@@ -91,12 +238,21 @@ def enriquecer_episodios(
             {texto_limpio[:4000]}
             ---
             """
-            respuesta_llm = llm_client.call(prompt)
-            json_match = re.search(r"\{.*\}", respuesta_llm, re.DOTALL)
-            if not json_match:
-                raise ValueError("La respuesta del LLM no contenía un JSON válido.")
 
-            metadata = json.loads(json_match.group(0))
+    def _generar_metadatos_episodio_new(texto_limpio, episodio_info, llm_client):
+        print("🎙️  Generando título y descripción con IA...")
+        try:
+            prompt = _prompt_metadatos(texto_limpio, episodio_info)
+            respuesta_llm = llamar_llm_cacheado(
+                lambda: llm_client.call(prompt),
+                modelo=nombre_modelo(llm_client),
+                version=PROMPT_METADATOS_VERSION,
+                entrada=prompt,
+                tokens=estimar_tokens(prompt),
+                # Un JSON truncado o incompleto no se guarda en la caché
+                validar=lambda r: extraer_json(r, CLAVES_METADATOS),
+            )
+            metadata = extraer_json(respuesta_llm)
             print(f"  -> Título generado: {metadata['titulo_spotify']}")
             print(f"{metadata['titulo_youtube']}")
             return metadata
@@ -112,11 +268,14 @@ def enriquecer_episodios(
 
     # --- [PASO 2: FILTRAR EL CSV DE ENTRADA] ---
     print(f"Cargando {path_all_links}...")
-    homilias = pd.read_csv(path_all_links)
-    homilias = homilias[(homilias["pope"] == pope) & (homilias["lang"] == language)]
+    # Parquet permite filtrar por papa e idioma al leer, sin cargar todo
+    homilias = pd.read_parquet(
+        path_all_links, filters=[("pope", "==", pope), ("lang", "==", language)]
+    )
     homilias = homilias.dropna(subset=["date"]) # Asegura que tengamos fecha
     
     print(f"Total de homilías en CSV (filtradas): {len(homilias)}")
+    numeros_episodio = numerar_episodios(homilias)
 
     # ¡LA CLAVE! Filtramos el DataFrame para procesar solo las filas
     # cuyo 'title' (slug) NO esté en el set de slugs ya enriquecidos.
@@ -126,6 +285,9 @@ def enriquecer_episodios(
     
     if homilias_a_procesar.empty:
         print("No hay homilías nuevas que enriquecer. Saliendo.")
+        if _partes(path_output):
+            # Lotes de una ejecución interrumpida aún sin consolidar
+            compactar_enriquecidos(path_output)
         return # Salimos de la función si no hay nada que hacer
     # --- [FIN PASO 2] ---
 
@@ -142,15 +304,24 @@ def enriquecer_episodios(
     all_homilias = []
 
     print("Iniciando extracción de texto (esto puede tardar)...")
-    for i, row in tqdm(homilias.iterrows(), total=len(homilias)):
-        homilias_df = extraer_homilia(row)
+    filas = [row for _, row in homilias.iterrows()]
+    for homilias_df in tqdm(
+        mapear_en_paralelo(extraer_homilia, filas, max_workers=MAX_WORKERS),
+        total=len(filas),
+    ):
         all_homilias.append(homilias_df)
 
     all_homilias = pd.DataFrame(all_homilias)
     all_homilias = pd.concat([homilias.reset_index(), all_homilias["texto"]], axis=1)
 
     # --- [PASO 4: Procesar y enriquecer (solo homilías nuevas)] ---
-    all_homilias["texto_limpio"] = all_homilias["texto"].apply(extract_clean_text)
+    # Las llamadas al LLM van en paralelo, limitadas por RPM/TPM (iglesia.llm_utils)
+    all_homilias["texto_limpio"] = mapear_llm(
+        extract_clean_text,
+        all_homilias["texto"],
+        max_workers=max_workers,
+        desc="Limpiando textos",
+    )
     
     # Convertimos 'date' a datetime para cálculos (manejando errores)
     all_homilias["date_dt"] = pd.to_datetime(all_homilias["date"], errors='coerce')
@@ -165,59 +336,63 @@ def enriquecer_episodios(
     all_homilias["fecha"] = all_homilias["date_dt"].dt.strftime("%Y-%m-%d")
 
     all_homilias = all_homilias.sort_values(["lang", "pontificate_week", "date_dt"])
+    all_homilias["numero_episodio"] = all_homilias["title"].map(numeros_episodio)
     all_homilias["week_order"] = (
-        all_homilias.groupby(["lang", "pontificate_week"]).cumcount() + 1
-    )
-    all_homilias["numero_episodio"] = (
-        all_homilias["pontificate_week"].astype(str)
-        + "."
-        + all_homilias["week_order"].astype(str)
+        all_homilias["numero_episodio"].str.split(".").str[1].astype(int)
     )
 
     # Devolvemos 'date' a string para el JSON
     all_homilias["date"] = all_homilias["date_dt"].dt.strftime("%Y-%m-%d")
     all_homilias = all_homilias.drop(columns=['date_dt']) # Limpiamos la col temporal
 
-    # --- [PASO 5: Llamada al LLM (solo para homilías nuevas)] ---
-    print(f"Iniciando enriquecimiento con LLM para {len(all_homilias)} episodios...")
-    metadata = all_homilias.progress_apply(
-        lambda row: _generar_metadatos_episodio_new(
-            row["texto_limpio"], row, llm_client
-        ),
-        axis=1,
-    )
-
-    all_homilias[
-        [
-            "titulo_spotify",
-            "descripcion_spotify",
-            "titulo_youtube",
-            "mensaje_instagram",
-            "frases_seleccionadas",
+    # --- [PASO 4b: Batch API (opcional)] ---
+    # Los metadatos se piden todos juntos a la Batch API; las respuestas quedan
+    # en la caché del LLM y el paso 5 las reutiliza sin nuevas llamadas.
+    if modo_batch:
+        prompts = [
+            _prompt_metadatos(row["texto_limpio"], row)
+            for _, row in all_homilias.iterrows()
         ]
-    ] = pd.DataFrame(metadata.to_list())
-    all_homilias["filename"] = all_homilias.apply(
-        lambda x: f"{x['fecha']}_{x['tipo'].replace(' ', '_').lower()}_{_limpiar_nombre_archivo(x['titulo'])}",
-        axis=1,
-    )
+        lote = LoteLLM(
+            f"enriquecer_{pope}_{language}", llm_client, PROMPT_METADATOS_VERSION
+        )
+        if not lote.ejecutar(prompts, esperar=esperar_batch):
+            print("El lote sigue en curso. Vuelve a ejecutar para recoger las respuestas.")
+            return
 
-    # --- [PASO 6: COMBINAR Y GUARDAR] ---
-    # Combinamos el DataFrame de homilías ya enriquecidas (del Paso 1)
-    # con el DataFrame 'all_homilias' (que contiene las nuevas).
-    df_final = pd.concat([df_enriched, all_homilias], ignore_index=True)
-    
-    # Opcional: limpiar duplicados por si acaso
-    df_final = df_final.drop_duplicates(subset=['title'], keep='last')
+    # --- [PASO 5: Llamada al LLM y guardado por lotes] ---
+    # Cada lote se guarda en cuanto termina: una caída no pierde lo ya pagado.
+    print(f"Iniciando enriquecimiento con LLM para {len(all_homilias)} episodios...")
+    for inicio in range(0, len(all_homilias), tamano_lote):
+        lote = all_homilias.iloc[inicio : inicio + tamano_lote].copy()
+        metadata = mapear_llm(
+            lambda row: _generar_metadatos_episodio_new(
+                row["texto_limpio"], row, llm_client
+            ),
+            [row for _, row in lote.iterrows()],
+            max_workers=max_workers,
+            desc=f"Generando metadatos {inicio + 1}-{inicio + len(lote)}",
+        )
+        lote[COLUMNAS_METADATOS] = pd.DataFrame(
+            metadata, index=lote.index, columns=COLUMNAS_METADATOS
+        )
+        lote["filename"] = lote.apply(
+            lambda x: f"{x['fecha']}_{x['tipo'].replace(' ', '_').lower()}_{_limpiar_nombre_archivo(x['titulo'])}",
+            axis=1,
+        )
+        guardar_lote(lote, path_output)
 
-    print(f"Guardando {len(df_final)} homilías en total ({len(df_enriched)} antiguas + {len(all_homilias)} nuevas) en {output_file}")
-    
-    # Guardamos el archivo JSON combinado
-    df_final.to_json(
-        output_file, 
-        orient="records"
+    # --- [PASO 6: COMPACTAR] ---
+    df_final = compactar_enriquecidos(path_output)
+    print(
+        f"Guardadas {len(df_final)} homilías en total ({len(all_homilias)} nuevas)"
     )
     # --- [FIN PASO 6] ---
 
 
 if __name__ == "__main__":
-    enriquecer_episodios()
\ No newline at end of file
+    # --batch usa la Batch API; con --no-esperar solo envía o consulta el lote
+    enriquecer_episodios(
+        modo_batch="--batch" in sys.argv,
+        esperar_batch="--no-esperar" not in sys.argv,
+    )
\ No newline at end of file
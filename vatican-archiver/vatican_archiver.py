@@ -1,20 +1,25 @@
+import hashlib
 import json
 import logging
+import multiprocessing
 import os
-import random
-import re
-import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Set, Tuple
 from urllib.parse import urljoin
 
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
 from markdownify import markdownify as md
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 from tqdm import tqdm
 
+from iglesia.html_utils import extraer_enlaces_contenido
+from iglesia.http_utils import LimitadorPorHost, get_con_reintentos
+from iglesia.page_store import PageStore
+
 # --- Configuración del Logging ---
 # Puedes ajustar el nivel de log si lo deseas (e.g., logging.DEBUG)
 logging.basicConfig(
@@ -22,6 +27,147 @@ logging.basicConfig(
 )
 
 
+# Marca de _crawl para las páginas cuyo contenido no ha cambiado
+UNCHANGED = object()
+
+# Columnas de links_delta.csv/.parquet
+DELTA_COLUMNS = [
+    "pope", "lang", "link", "title_human", "change", "title", "type", "date"
+]
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class DownloadLedger:
+    """
+    Registro duradero (JSONL, solo se añaden líneas) del estado de cada URL.
+
+    Cada línea guarda url, tipo, estado ('ok' o 'error'), tamaño en bytes,
+    hash SHA-256 del contenido, ruta local y fecha. La última línea de cada
+    URL es la que vale; compact() reescribe el fichero con solo esas.
+    Las entradas '__run__' marcan el inicio y el fin de cada ejecución, lo que
+    permite reanudar una ejecución interrumpida exactamente donde se quedó.
+    """
+
+    RUN_KEY = "__run__"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            complete = 0  # Bytes hasta la última línea completa
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Última línea truncada por una caída
+                    complete += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._entries[entry["url"]] = entry
+            if complete < os.path.getsize(path):
+                # Se descarta para que la siguiente línea no se pegue a ella
+                os.truncate(path, complete)
+
+    def _append(self, entry: dict) -> None:
+        with self._lock:
+            self._entries[entry["url"]] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def get(self, url: str) -> Optional[dict]:
+        return self._entries.get(url)
+
+    def record(
+        self,
+        url: str,
+        kind: str,
+        status: str,
+        content: Optional[bytes] = None,
+        path: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        entry = {"url": url, "kind": kind, "status": status, "updated_at": _now_iso()}
+        if content is not None:
+            entry["bytes"] = len(content)
+            entry["sha256"] = hashlib.sha256(content).hexdigest()
+        if path is not None:
+            entry["path"] = path
+        if error is not None:
+            entry["error"] = error
+        self._append(entry)
+
+    def is_done(
+        self,
+        url: str,
+        since: Optional[str] = None,
+        max_age_days: Optional[int] = None,
+    ) -> bool:
+        """
+        True si la URL se descargó bien, su fichero sigue en disco, es
+        posterior a 'since' (inicio de la ejecución) y no es más antigua
+        que 'max_age_days'.
+        """
+        entry = self._entries.get(url)
+        if not entry or entry.get("status") != "ok":
+            return False
+        if entry.get("path") and not os.path.exists(entry["path"]):
+            return False
+        if since is not None and entry["updated_at"] < since:
+            return False
+        if max_age_days is not None:
+            limit = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+            if entry["updated_at"] < limit.isoformat():
+                return False
+        return True
+
+    def start_run(self) -> str:
+        """Empieza una ejecución o reanuda la anterior si no terminó."""
+        run = self._entries.get(self.RUN_KEY)
+        if run and run.get("status") == "running":
+            logging.info(f"Reanudando la ejecución iniciada el {run['started_at']}")
+            return run["started_at"]
+        started_at = _now_iso()
+        self._append(
+            {
+                "url": self.RUN_KEY,
+                "status": "running",
+                "started_at": started_at,
+                "updated_at": started_at,
+            }
+        )
+        return started_at
+
+    def finish_run(self) -> None:
+        run = self._entries.get(self.RUN_KEY) or {}
+        self._append(
+            {**run, "url": self.RUN_KEY, "status": "finished", "updated_at": _now_iso()}
+        )
+
+    def summary(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for url, entry in self._entries.items():
+            if url != self.RUN_KEY:
+                counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+    def compact(self) -> None:
+        """Reescribe el fichero con una sola línea (la última) por URL."""
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+
+
 class VaticanArchiver:
     """
     Una clase para archivar documentos del Vaticano.
@@ -35,54 +181,93 @@ class VaticanArchiver:
     def __init__(
         self,
         base_url: str = "https://www.vatican.va/",
-        cache_dir: str = "cache",
+        store_dir: str = os.environ.get("HTTP_CACHE_DIR", "cache/http"),
         links_dir: str = "vatican-archiver/documents/links",
         csv_dir: str = "vatican-archiver/documents/links",
-        docs_dir: str = "documents",
         rate_limit_delay: Tuple[float, float] = (1.0, 3.0),
         force_refresh: bool = False,
+        max_workers: int = 4,
+        parse_workers: int = 2,
+        requests_per_second: Optional[float] = None,
+        ledger_path: str = "vatican-archiver/documents/ledger.jsonl",
+        stale_after_days: Optional[int] = None,
+        docs_dir: Optional[str] = None,
     ):
         """
         Inicializa el archivador.
 
         Args:
             base_url (str): La URL base del sitio del Vaticano.
-            cache_dir (str): Directorio para guardar las páginas HTML cacheadas (índices).
+            store_dir (str): Directorio del PageStore donde se guardan, comprimidas y
+                sin duplicados, las páginas de índice y los documentos. Es el mismo
+                que usa iglesia.utils, así extraer_homilia reaprovecha lo archivado.
             links_dir (str): Directorio para guardar los archivos JSON de enlaces.
             csv_dir (str): Directorio para guardar los informes CSV fusionados.
-            docs_dir (str): Directorio para guardar el contenido HTML final de los documentos.
             rate_limit_delay (Tuple[float, float]): Rango (min, max) de espera entre peticiones.
-            force_refresh (bool): Si es True, ignora la caché y vuelve a descargar todo.
+                Si no se indica 'requests_per_second', su media define la tasa permitida.
+            force_refresh (bool): Si es True, vuelve a descargar también los
+                documentos ya registrados. Las páginas de índice se revalidan en
+                cada ejecución (GET condicional) con o sin force_refresh.
+            max_workers (int): Número de descargas concurrentes.
+            parse_workers (int): Procesos para extraer enlaces de las páginas de
+                índice sin bloquear las descargas. 1 = un único hilo extractor.
+            requests_per_second (float): Tasa máxima de peticiones al Vaticano,
+                compartida por todos los workers (token bucket).
+            ledger_path (str): Registro JSONL con el estado de cada URL descargada.
+            stale_after_days (int): Días tras los que un documento ya descargado
+                se vuelve a descargar. None = nunca.
+            docs_dir (str): Si se indica, los documentos también se exportan como
+                <docs_dir>/<pope>/<lang>/<title>.html (y .md con save_markdown),
+                la carpeta que leen los benchmarks de html_utils y clean_text.
+                None = solo el almacén.
         """
         self.base_url = base_url
-        self.cache_dir = cache_dir
+        self.store = PageStore(store_dir)
         self.links_dir = links_dir
         self.csv_dir = csv_dir
-        self.docs_dir = docs_dir
         self.rate_limit_delay = rate_limit_delay
         self.force_refresh = force_refresh
+        self.max_workers = max_workers
+        self.parse_workers = parse_workers
+        self.stale_after_days = stale_after_days
+        self.docs_dir = docs_dir
+
+        # Registro de descargas para poder reanudar ejecuciones interrumpidas
+        self.ledger = DownloadLedger(ledger_path)
+        self.run_started_at = _now_iso()
+
+        # Presupuesto de cortesía compartido por todos los workers
+        if requests_per_second is None:
+            requests_per_second = 2.0 / (rate_limit_delay[0] + rate_limit_delay[1])
+        self.limiter = LimitadorPorHost(requests_per_second, rafaga=1)
 
         # Configura una sesión de Requests robusta con reintentos
         self.session = self._setup_session()
 
         # Asegura que los directorios de salida existan
-        os.makedirs(self.cache_dir, exist_ok=True)
         os.makedirs(self.links_dir, exist_ok=True)
         os.makedirs(self.csv_dir, exist_ok=True)
-        os.makedirs(self.docs_dir, exist_ok=True)
         logging.info(
-            f"Archivador inicializado. Caché: '{self.cache_dir}', Salida de Links: '{self.links_dir}'"
+            f"Archivador inicializado. Almacén: '{self.store.root}', Salida de Links: '{self.links_dir}'"
         )
 
     def _setup_session(self) -> requests.Session:
-        """Configura una sesión de requests con reintentos."""
+        """
+        Configura una sesión de requests con reintentos. Los 429/503 no se
+        reintentan aquí sino en get_con_reintentos, que pausa a todos los
+        workers respetando Retry-After.
+        """
         session = requests.Session()
         retries = Retry(
             total=5,
             backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504],
+            status_forcelist=[500, 502, 504],
+        )
+        adapter = HTTPAdapter(
+            max_retries=retries,
+            pool_connections=self.max_workers,
+            pool_maxsize=self.max_workers,
         )
-        adapter = HTTPAdapter(max_retries=retries)
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         session.headers.update(
@@ -90,82 +275,153 @@ class VaticanArchiver:
         )
         return session
 
-    def _safe_filename(self, url: str) -> str:
-        """Convierte una URL en un nombre de archivo seguro para la caché."""
-        return url.replace("https://", "").replace("http://", "").replace("/", "_")
+    def _refresh_since(self) -> Optional[str]:
+        """
+        Con force_refresh, solo cuenta como hecho lo descargado en la
+        ejecución actual (o en la interrumpida que se está reanudando).
+        """
+        return self.run_started_at if self.force_refresh else None
 
     def _get_cached_page(
         self, url: str, pope_slug: str, language: str
-    ) -> Optional[str]:
+    ) -> Optional[bytes]:
         """
-        Recupera una página de la caché si está disponible, si no, la descarga
-        con limitación de tasa (rate limiting).
+        Recupera una página de índice. Si ya se descargó en esta ejecución (o
+        en la interrumpida que se reanuda) se sirve del almacén; si no, se
+        revalida con un GET condicional para detectar cambios (un 304 no
+        descarga nada) y se guarda en él, con limitación de tasa.
         """
-        pope_cache_dir = os.path.join(self.cache_dir, pope_slug, language)
-        os.makedirs(pope_cache_dir, exist_ok=True)
-        filename = os.path.join(pope_cache_dir, self._safe_filename(url) + ".html")
-
-        if not self.force_refresh and os.path.exists(filename):
-            try:
-                with open(filename, "r", encoding="utf-8") as f:
-                    return f.read()
-            except Exception as e:
-                logging.warning(f"No se pudo leer el archivo de caché {filename}: {e}")
-
-        # Limitación de tasa
-        time.sleep(random.uniform(self.rate_limit_delay[0], self.rate_limit_delay[1]))
+        if self.ledger.is_done(url, since=self.run_started_at):
+            html = self.store.get(url)
+            if html is not None:
+                return html
+
+        # Revalidación condicional con los validadores guardados (304 = sin cambios)
+        headers = {}
+        stored = self.store.info(url)
+        if stored is not None:
+            if stored.get("etag"):
+                headers["If-None-Match"] = stored["etag"]
+            if stored.get("last_modified"):
+                headers["If-Modified-Since"] = stored["last_modified"]
 
         try:
-            resp = self.session.get(url, timeout=15)
+            # Limitación de tasa compartida (token bucket)
+            resp = get_con_reintentos(
+                self.session, url, self.limiter, headers=headers, timeout=15
+            )
+            if resp.status_code == 304 and stored is not None:
+                content = self.store.get(url)
+                if content is not None:
+                    self.ledger.record(
+                        url,
+                        "index",
+                        "ok",
+                        content=content,
+                        path=self.store.object_path(stored["sha256"]),
+                    )
+                    return content
+                # La copia local se ha perdido: se pide de nuevo sin validadores
+                resp = get_con_reintentos(self.session, url, self.limiter, timeout=15)
             resp.raise_for_status()
-            resp.encoding = resp.apparent_encoding  # Intenta detectar la codificación
 
-            with open(filename, "w", encoding=resp.encoding) as f:
-                f.write(resp.text)
-            return resp.text
+            sha256 = self.store.put(
+                url,
+                resp.content,
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+            )
+            self.ledger.record(
+                url,
+                "index",
+                "ok",
+                content=resp.content,
+                path=self.store.object_path(sha256),
+            )
+            return resp.content
 
         except requests.RequestException as e:
             logging.error(f"Fallo al descargar {url}: {e}")
+            self.ledger.record(url, "index", "error", error=str(e))
             return None
 
-    def _get_soup(
+    def _fetch_fingerprinted(
         self, url: str, pope_slug: str, language: str
-    ) -> Optional[BeautifulSoup]:
-        """Wrapper para devolver un objeto BeautifulSoup de una página cacheada."""
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """Descarga (o revalida) una página y devuelve (html, sha256 del contenido)."""
         html = self._get_cached_page(url, pope_slug, language)
-        if not html:
-            return None
-        return BeautifulSoup(html, "html.parser")
+        info = self.store.info(url) if html else None
+        return html, info["sha256"] if info else None
+
+    def _crawl(
+        self,
+        jobs: List[Tuple[str, str, str]],
+        desc: str,
+        known: Optional[Dict[str, str]] = None,
+    ) -> Dict[Tuple[str, str, str], Tuple[Optional[str], object]]:
+        """
+        Procesa una frontera de trabajos (pope_slug, language, url): descarga las
+        páginas con max_workers hilos, todos bajo el mismo limitador de tasa, y
+        extrae sus enlaces (href, texto) en un pool de procesos mientras siguen
+        las descargas.
+
+        Devuelve {trabajo: (sha256, enlaces)}. 'enlaces' es None si la página
+        falló, y UNCHANGED si su hash coincide con el de 'known' (url -> sha256),
+        en cuyo caso no se vuelve a parsear.
+        """
+        known = known or {}
+        results: Dict[Tuple[str, str, str], Tuple[Optional[str], object]] = {}
+        if not jobs:
+            return results
+
+        if self.parse_workers > 1 and len(jobs) > 1:
+            parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            parse_pool = ThreadPoolExecutor(max_workers=1)
+
+        parses = {}
+        with parse_pool, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            fetches = {
+                executor.submit(self._fetch_fingerprinted, url, pope_slug, lang): (
+                    pope_slug,
+                    lang,
+                    url,
+                )
+                for pope_slug, lang, url in jobs
+            }
+            for future in tqdm(as_completed(fetches), total=len(fetches), desc=desc):
+                job = fetches[future]
+                html, sha256 = future.result()
+                if not html:
+                    results[job] = (None, None)
+                elif sha256 is not None and known.get(job[2]) == sha256:
+                    results[job] = (sha256, UNCHANGED)
+                else:
+                    future = parse_pool.submit(extraer_enlaces_contenido, html)
+                    parses[future] = (job, sha256)
+
+            for future, (job, sha256) in parses.items():
+                try:
+                    results[job] = (sha256, future.result())
+                except Exception as e:
+                    logging.warning(f"No se pudieron extraer enlaces de {job[2]}: {e}")
+                    results[job] = (sha256, None)
+        return results
 
     def _get_pope_main_page_url(self, pope_slug: str, language: str) -> str:
         """Construye la URL de la página principal para un Papa e idioma."""
         return urljoin(self.base_url, f"content/{pope_slug}/{language}.html")
 
     def _process_pope_index_pages(
-        self, pope_name: str, pope_slug: str, language: str
+        self, pope_slug: str, language: str, links: List[Tuple[str, str]]
     ) -> Set[str]:
-        """Recupera todas las páginas de índice o categorías para un Papa."""
-        logging.info(
-            f"--- Procesando página principal del Papa {pope_name} [{language}] ---"
-        )
+        """Filtra, de los enlaces de la página principal, las páginas de índice."""
         pope_main_page_url = self._get_pope_main_page_url(pope_slug, language)
-        soup = self._get_soup(pope_main_page_url, pope_slug, language)
-
-        if not soup:
-            logging.error(
-                f"No se pudo acceder a la página principal de {pope_name}. Saltando."
-            )
-            return set()
-
         urls_to_visit: Set[str] = set()
-        content_area = (
-            soup.find("div", class_="document-container")
-            or soup.find("div", id="main-container")
-            or soup.body
-        )
-
-        for link in content_area.find_all("a", href=True):
-            href = link["href"]
+        for href, _ in links:
             if (
                 pope_slug in href
                 and ".html" in href
@@ -176,17 +432,15 @@ class VaticanArchiver:
         return urls_to_visit
 
     def _extract_document_links(
-        self, index_url: str, pope_slug: str, language: str
+        self,
+        index_url: str,
+        pope_slug: str,
+        language: str,
+        links: List[Tuple[str, str]],
     ) -> Set[Tuple[str, str]]:
-        """Extrae todos los enlaces a documentos y sus títulos de una página de índice."""
+        """Filtra los enlaces a documentos (y sus títulos) de una página de índice."""
         full_slug = f"{pope_slug}/{language}"
         pope_main_page_url = self._get_pope_main_page_url(pope_slug, language)
-
-        soup = self._get_soup(index_url, pope_slug, language)
-        if not soup:
-            logging.error(f"No se pudo acceder a la página {index_url}. Saltando.")
-            return set()
-
         documents_found: Set[Tuple[str, str]] = set()
 
         try:
@@ -194,17 +448,8 @@ class VaticanArchiver:
             url_without_index = index_url.replace(".index.html", "") + "/documents"
             url_without_index = url_without_index.split(full_slug)[1]
 
-            content_area = (
-                soup.find("div", class_="document-container")
-                or soup.find("div", id="main-container")
-                or soup.body
-            )
-
-            for link in content_area.find_all("a", href=True):
-                href = link["href"]
-                # Obtenemos el título humano del texto del enlace
-                titulo = link.get_text(strip=True)
-
+            # Cada enlace trae su título humano (texto del enlace)
+            for href, titulo in links:
                 if (
                     full_slug in href
                     and url_without_index in href
@@ -223,184 +468,412 @@ class VaticanArchiver:
 
         return documents_found
 
+    def _fingerprints_path(self, pope_slug: str, language: str) -> str:
+        return os.path.join(self.links_dir, pope_slug, f"{language}.pages.json")
+
+    def _load_fingerprints(self, pope_slug: str, language: str) -> dict:
+        """
+        Huellas de la última exploración: hash de la página principal y, por
+        cada página de índice, su hash y los documentos que se extrajeron.
+        """
+        try:
+            with open(self._fingerprints_path(pope_slug, language), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"main": None, "pages": {}}
+
+    def _save_fingerprints(self, pope_slug: str, language: str, fingerprints: dict) -> None:
+        path = self._fingerprints_path(pope_slug, language)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(fingerprints, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
     def _get_all_pope_documents(
-        self, pope_name: str, pope_slug: str, language: str
-    ) -> List[Tuple[str, str]]:
-        """Recupera todos los enlaces de documentos y títulos para un Papa e idioma."""
-        # Este set ahora guardará tuplas (url, titulo)
-        all_documents: Set[Tuple[str, str]] = set()
-        index_urls = self._process_pope_index_pages(pope_name, pope_slug, language)
-
-        if not index_urls:
-            logging.warning(
-                f"No se encontraron páginas de índice para {pope_name} [{language}]"
-            )
-            return []
+        self, targets: List[Tuple[str, str, str]]
+    ) -> Dict[Tuple[str, str], List[Tuple[str, str]]]:
+        """
+        Recupera los enlaces de documentos y títulos de varios (pope_name,
+        pope_slug, language) a la vez: primero todas las páginas principales
+        y después la frontera completa de páginas de índice.
 
-        logging.info(
-            f"Escaneando {len(index_urls)} páginas de índice para {pope_name} [{language}]..."
+        Las páginas cuyo hash no ha cambiado desde la última exploración no se
+        vuelven a parsear: se reutilizan los enlaces guardados en sus huellas.
+        """
+        names = {(slug, lang): name for name, slug, lang in targets}
+        previous = {
+            (slug, lang): self._load_fingerprints(slug, lang) for _, slug, lang in targets
+        }
+        main_urls = {
+            (slug, lang): self._get_pope_main_page_url(slug, lang) for _, slug, lang in targets
+        }
+        main_pages = self._crawl(
+            [(slug, lang, main_urls[(slug, lang)]) for _, slug, lang in targets],
+            desc="Páginas principales",
+            known={main_urls[key]: fp["main"] for key, fp in previous.items() if fp["main"]},
         )
-        for url in tqdm(index_urls, desc=f"Scraping {pope_name} [{language}]"):
-            # document_data es ahora un set de tuplas (url, titulo)
-            document_data = self._extract_document_links(url, pope_slug, language)
-            all_documents.update(document_data)
+
+        fingerprints = {key: {"main": None, "pages": {}} for key in previous}
+        frontier: List[Tuple[str, str, str]] = []
+        known_pages: Dict[str, str] = {}
+        for (slug, lang, _), (sha256, links) in main_pages.items():
+            key = (slug, lang)
+            if links is None:
+                logging.error(
+                    f"No se pudo acceder a la página principal de {names[key]} [{lang}]. Saltando."
+                )
+                fingerprints[key] = previous[key]
+                continue
+            fingerprints[key]["main"] = sha256
+            if links is UNCHANGED:
+                index_urls = set(previous[key]["pages"])
+            else:
+                index_urls = self._process_pope_index_pages(slug, lang, links)
+            if not index_urls:
+                logging.warning(
+                    f"No se encontraron páginas de índice para {names[key]} [{lang}]"
+                )
+            frontier.extend((slug, lang, url) for url in sorted(index_urls))
+            known_pages.update(
+                (url, page["sha256"]) for url, page in previous[key]["pages"].items()
+            )
 
         logging.info(
-            f"Total de documentos encontrados para {pope_name} [{language}]: {len(all_documents)}"
+            f"Escaneando {len(frontier)} páginas de índice de {len(targets)} Papas/idiomas..."
         )
-        # Devolvemos una lista ordenada de tuplas
-        return sorted(list(all_documents))
+        pages = self._crawl(frontier, desc="Scraping índices", known=known_pages)
+        unchanged = 0
+        for (slug, lang, url), (sha256, links) in pages.items():
+            key = (slug, lang)
+            if links is UNCHANGED:
+                unchanged += 1
+                fingerprints[key]["pages"][url] = previous[key]["pages"][url]
+            elif links is None:
+                logging.error(f"No se pudo acceder a la página {url}. Saltando.")
+                # Se conservan sus documentos anteriores para no darlos por eliminados
+                if url in previous[key]["pages"]:
+                    fingerprints[key]["pages"][url] = previous[key]["pages"][url]
+            else:
+                documents = self._extract_document_links(url, slug, lang, links)
+                fingerprints[key]["pages"][url] = {
+                    "sha256": sha256,
+                    "documents": sorted(documents),
+                }
+        logging.info(f"{unchanged}/{len(pages)} páginas de índice sin cambios.")
+
+        all_documents: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        for key, fp in fingerprints.items():
+            self._save_fingerprints(*key, fp)
+            documents = {
+                tuple(document)
+                for page in fp["pages"].values()
+                for document in page["documents"]
+            }
+            logging.info(
+                f"Total de documentos encontrados para {names[key]} [{key[1]}]: {len(documents)}"
+            )
+            # Devolvemos listas ordenadas de tuplas
+            all_documents[key] = sorted(documents)
+        return all_documents
 
     def find_and_save_links(
         self, pope_map: Dict[str, str], languages: List[str]
     ) -> Dict[str, dict]:
         """
         Paso 1: Genera y guarda todos los enlaces (y títulos) de documentos.
+        Todos los Papas e idiomas pendientes se rastrean a la vez en una
+        única frontera concurrente.
+
+        Junto a cada <lang>.json se escribe <lang>.delta.json con los enlaces
+        añadidos y eliminados desde la última fusión: si aún hay un delta sin
+        fusionar, el nuevo se acumula sobre él (merge_links_to_csv lo borra al
+        aplicarlo).
         """
         logging.info("--- INICIANDO PASO 1: Encontrar y Guardar Enlaces ---")
         all_links_found = {}
+        targets = []
         for pope_name, pope_slug in pope_map.items():
-            pope_dir = os.path.join(self.links_dir, pope_slug)
-            os.makedirs(pope_dir, exist_ok=True)
+            os.makedirs(os.path.join(self.links_dir, pope_slug), exist_ok=True)
             all_links_found[pope_slug] = {}
 
             for lang in languages:
-                logging.info(f"Buscando enlaces para {pope_name} [{lang}]...")
-                # links_data es una lista de tuplas (url, titulo)
-                links_data = self._get_all_pope_documents(pope_name, pope_slug, lang)
-
-                # Convertimos la lista de tuplas en una lista de diccionarios
-                links_json = [
-                    {"link": url, "title_human": title} for url, title in links_data
-                ]
-
-                all_links_found[pope_slug][lang] = links_json
+                output_path = os.path.join(self.links_dir, pope_slug, f"{lang}.json")
+                ledger_key = f"links://{pope_slug}/{lang}"
+                if self.ledger.is_done(ledger_key, since=self.run_started_at):
+                    # Ya completado en esta ejecución (reanudación tras una caída)
+                    with open(output_path, "r", encoding="utf-8") as f:
+                        all_links_found[pope_slug][lang] = json.load(f)
+                    logging.info(f"Enlaces de {pope_name} [{lang}] ya guardados. Saltando.")
+                    continue
+                targets.append((pope_name, pope_slug, lang))
+
+        if not targets:
+            return all_links_found
+
+        logging.info(f"Buscando enlaces para {len(targets)} Papas/idiomas...")
+        # Listas de tuplas (url, titulo) por (pope_slug, lang)
+        documents = self._get_all_pope_documents(targets)
+
+        for pope_name, pope_slug, lang in targets:
+            output_path = os.path.join(self.links_dir, pope_slug, f"{lang}.json")
+            ledger_key = f"links://{pope_slug}/{lang}"
+
+            # Convertimos la lista de tuplas en una lista de diccionarios
+            links_json = [
+                {"link": url, "title_human": title}
+                for url, title in documents[(pope_slug, lang)]
+            ]
+
+            all_links_found[pope_slug][lang] = links_json
+            delta_path = output_path.replace(".json", ".delta.json")
+            delta = self._accumulate_delta(
+                delta_path, self._links_delta(output_path, links_json)
+            )
 
-                output_path = os.path.join(pope_dir, f"{lang}.json")
-                try:
-                    with open(output_path, "w", encoding="utf-8") as f:
-                        # Guardamos la nueva estructura JSON
-                        json.dump(links_json, f, indent=2, ensure_ascii=False)
-                    logging.info(
-                        f"Guardados {len(links_json)} enlaces para {pope_name} [{lang}] -> {output_path}"
-                    )
-                except Exception as e:
-                    logging.error(f"No se pudo guardar el JSON en {output_path}: {e}")
+            try:
+                with open(output_path, "w", encoding="utf-8") as f:
+                    # Guardamos la nueva estructura JSON
+                    json.dump(links_json, f, indent=2, ensure_ascii=False)
+                with open(delta_path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(delta, f, indent=2, ensure_ascii=False)
+                os.replace(delta_path + ".tmp", delta_path)
+                logging.info(
+                    f"Guardados {len(links_json)} enlaces para {pope_name} [{lang}] -> {output_path} "
+                    f"(+{len(delta['added'])} / -{len(delta['removed'])})"
+                )
+                self.ledger.record(ledger_key, "links", "ok", path=output_path)
+            except Exception as e:
+                logging.error(f"No se pudo guardar el JSON en {output_path}: {e}")
 
         return all_links_found
 
-    def _extract_date_from_title(self, title: str) -> Optional[str]:
-        """Extrae la fecha de un título (formato YYYYMMDD o DDMMYYYY)."""
-        match = re.search(r"(\d{8})", title)
-        if not match:
-            return None
-        digits = match.group(1)
-
-        if digits[:4].startswith(("19", "20")):
-            dt = pd.to_datetime(digits, format="%Y%m%d", errors="coerce")
-        elif digits[-4:].startswith(("19", "20")):
-            dt = pd.to_datetime(digits, format="%d%m%Y", errors="coerce")
-        else:
-            return None
-        return dt.strftime("%Y-%m-%d") if pd.notna(dt) else None
-
-    def merge_links_to_csv(self) -> Optional[pd.DataFrame]:
+    @staticmethod
+    def _links_delta(previous_path: str, links_json: List[dict]) -> dict:
+        """Enlaces añadidos y eliminados respecto al JSON guardado anteriormente."""
+        try:
+            with open(previous_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = []
+        # Formato antiguo (lista de strings) -> sin título
+        previous = [
+            doc if isinstance(doc, dict) else {"link": doc, "title_human": None}
+            for doc in previous
+        ]
+        previous_links = {doc["link"] for doc in previous}
+        current_links = {doc["link"] for doc in links_json}
+        return {
+            "checked": _now_iso(),
+            "added": [doc for doc in links_json if doc["link"] not in previous_links],
+            "removed": [doc for doc in previous if doc["link"] not in current_links],
+        }
+
+    @staticmethod
+    def _accumulate_delta(delta_path: str, delta: dict) -> dict:
         """
-        Paso 2: Carga los JSON de enlaces/títulos, los fusiona y guarda como CSV.
-        Maneja tanto el formato antiguo (lista de strings) como el nuevo (lista de dicts).
-        El pivot_links.csv final SOLO contendrá los enlaces.
+        Combina 'delta' con el <lang>.delta.json aún sin fusionar, de modo que
+        el resultado sea el cambio neto desde la última fusión: un enlace
+        añadido y después eliminado (o al revés) desaparece del delta.
         """
-        logging.info("--- INICIANDO PASO 2: Fusionar Enlaces a CSV ---")
-        rows = []
+        try:
+            with open(delta_path, "r", encoding="utf-8") as f:
+                pending = json.load(f)
+        except (OSError, ValueError):
+            return delta
+        added = {doc["link"]: doc for doc in pending.get("added", [])}
+        removed = {doc["link"]: doc for doc in pending.get("removed", [])}
+        for doc in delta["removed"]:
+            if added.pop(doc["link"], None) is None:
+                removed[doc["link"]] = doc
+        for doc in delta["added"]:
+            if removed.pop(doc["link"], None) is None:
+                added[doc["link"]] = doc
+        return {
+            "since": pending.get("since", pending.get("checked")),
+            "checked": delta["checked"],
+            "added": list(added.values()),
+            "removed": list(removed.values()),
+        }
+
+    @staticmethod
+    def _extract_dates_from_titles(titles: pd.Series) -> pd.Series:
+        """
+        Extrae (vectorizado) la fecha de cada título, en formato YYYYMMDD o
+        DDMMYYYY, como 'YYYY-MM-DD'. Devuelve NaN si no hay fecha válida.
+        """
+        digits = titles.str.extract(r"(\d{8})", expand=False)
+        ymd = digits.str[:2].isin(["19", "20"])
+        dmy = ~ymd & digits.str[4:6].isin(["19", "20"])
+        dates = pd.to_datetime(digits.where(ymd), format="%Y%m%d", errors="coerce")
+        dates = dates.fillna(
+            pd.to_datetime(digits.where(dmy), format="%d%m%Y", errors="coerce")
+        )
+        return dates.dt.strftime("%Y-%m-%d")
+
+    def _links_files(self, suffix: str):
+        """Itera (pope_slug, lang, ruta) de los ficheros '<lang><suffix>' de links_dir."""
         for pope_slug in os.listdir(self.links_dir):
             pope_path = os.path.join(self.links_dir, pope_slug)
             if not os.path.isdir(pope_path):
                 continue
             for file in os.listdir(pope_path):
-                if file.endswith(".json"):
-                    lang = file.replace(".json", "")
-                    file_path = os.path.join(pope_path, file)
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            links_data = json.load(f)
-
-                            if not links_data:  # Si el JSON está vacío, saltar
-                                continue
-
-                            # --- INICIO DE LA LÓGICA DE DETECCIÓN ---
-                            if isinstance(links_data[0], str):
-                                # Es el FORMATO ANTIGUO (lista de strings)
-                                logging.warning(
-                                    f"Detectado formato JSON antiguo en {file_path}. No se cargarán 'title_human'."
-                                )
-                                for link in links_data:
-                                    rows.append(
-                                        {
-                                            "pope": pope_slug,
-                                            "lang": lang,
-                                            "link": link,
-                                            "title_human": None,  # No tenemos título
-                                        }
-                                    )
-                            elif isinstance(links_data[0], dict):
-                                # Es el FORMATO NUEVO (lista de diccionarios)
-                                for doc_info in links_data:
-                                    rows.append(
-                                        {
-                                            "pope": pope_slug,
-                                            "lang": lang,
-                                            "link": doc_info.get("link"),
-                                            "title_human": doc_info.get("title_human"),
-                                        }
-                                    )
-                            # --- FIN DE LA LÓGICA DE DETECCIÓN ---
-
-                    except Exception as e:
-                        logging.error(f"No se pudo cargar o procesar {file_path}: {e}")
-
-        if not rows:
+                lang = file[: -len(suffix)]
+                if file.endswith(suffix) and lang and "." not in lang:
+                    yield pope_slug, lang, os.path.join(pope_path, file)
+
+    @staticmethod
+    def _links_frame(links_data: list, file_path: str) -> Optional[pd.DataFrame]:
+        """Convierte una lista de enlaces (formato antiguo o nuevo) en DataFrame."""
+        if not links_data:  # Si la lista está vacía, saltar
+            return None
+        if isinstance(links_data[0], str):
+            # Es el FORMATO ANTIGUO (lista de strings)
             logging.warning(
-                "No se encontraron enlaces en JSON para fusionar. Saltando Paso 2."
+                f"Detectado formato JSON antiguo en {file_path}. No se cargarán 'title_human'."
             )
-            return None
+            return pd.DataFrame({"link": links_data, "title_human": None})
+        if isinstance(links_data[0], dict):
+            # Es el FORMATO NUEVO (lista de diccionarios)
+            return pd.DataFrame.from_records(links_data, columns=["link", "title_human"])
+        return None
+
+    def _load_links_json(self, delta: bool = False) -> List[pd.DataFrame]:
+        """
+        Carga cada JSON de enlaces como DataFrame. Con delta=True carga los
+        <lang>.delta.json, con una columna 'change' ('added' o 'removed').
+        """
+        frames = []
+        for pope_slug, lang, file_path in self._links_files(
+            ".delta.json" if delta else ".json"
+        ):
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    links_data = json.load(f)
+            except Exception as e:
+                logging.error(f"No se pudo cargar o procesar {file_path}: {e}")
+                continue
 
-        df = pd.DataFrame(rows)
+            if delta:
+                parts = [
+                    (change, self._links_frame(links_data.get(change, []), file_path))
+                    for change in ("added", "removed")
+                ]
+                parts = [frame.assign(change=change) for change, frame in parts if frame is not None]
+                frame = pd.concat(parts, ignore_index=True) if parts else None
+            else:
+                frame = self._links_frame(links_data, file_path)
+            if frame is None:
+                continue
+            frame.insert(0, "pope", pope_slug)
+            frame.insert(1, "lang", lang)
+            frames.append(frame)
+        return frames
+
+    def _derive_link_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Añade title, type y date (vectorizado) y ordena; descarta lo que no tiene fecha."""
         df = df.dropna(subset=["link"])  # Quitar filas donde el link sea nulo
 
-        # Procesar DataFrame (esto se mantiene igual)
-        df["parts"] = df["link"].str.split("/")
-        df["title"] = df["parts"].apply(lambda parts: max(parts, key=len))
-        df["type"] = df["parts"].apply(
-            lambda parts: parts[6] if len(parts) > 6 else None
-        )
-        df["date"] = df["title"].apply(self._extract_date_from_title)
-        df = df.drop(columns=["parts"])
+        # title = segmento más largo de la URL; type = séptimo segmento
+        parts = df["link"].str.split("/", expand=True)
+        lengths = parts.apply(lambda col: col.str.len()).fillna(-1).to_numpy()
+        df["title"] = parts.to_numpy()[range(len(parts)), lengths.argmax(axis=1)]
+        df["type"] = parts[6] if 6 in parts.columns else None
+        df["date"] = self._extract_dates_from_titles(df["title"])
         df["title_human"] = df["title_human"].fillna(pd.NA)
 
-        # Guardar CSV completo (all_links.csv SÍ tendrá 'title_human')
-        all_links_path = os.path.join(self.csv_dir, "all_links.csv")
         df = df.sort_values(by=["date", "title", "lang"], ascending=[True, True, True])
-        df = df.dropna(subset=["date"])
+        return df.dropna(subset=["date"]).reset_index(drop=True)
+
+    def _links_delta_frame(self) -> pd.DataFrame:
+        """Los <lang>.delta.json pendientes como DataFrame (vacío si no hay)."""
+        frames = self._load_links_json(delta=True)
+        if not frames:
+            return pd.DataFrame(columns=DELTA_COLUMNS)
+        return self._derive_link_columns(pd.concat(frames, ignore_index=True))
+
+    def _save_links_delta(self, delta: pd.DataFrame) -> str:
+        """
+        Guarda el delta en links_delta.csv/.parquet para los seeders. Se
+        reescribe en cada fusión, aunque esté vacío, para que nunca quede el
+        de una fusión anterior.
+        """
+        delta_path = os.path.join(self.csv_dir, "links_delta.csv")
+        delta.to_csv(delta_path, index=False, encoding="utf-8")
+        delta.to_parquet(delta_path.replace(".csv", ".parquet"), index=False)
+        return delta_path
+
+    def _apply_links_delta(
+        self, all_links_parquet: str, delta: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Aplica el delta pendiente sobre el all_links.parquet anterior."""
+        df = pd.read_parquet(all_links_parquet)
+        if delta.empty:
+            logging.info("No hay cambios en los enlaces desde la última fusión.")
+            return df
+
+        keys = ["pope", "lang", "link"]
+        removed = pd.MultiIndex.from_frame(delta.loc[delta["change"] == "removed", keys])
+        df = df[~pd.MultiIndex.from_frame(df[keys]).isin(removed)]
+        added = delta.loc[delta["change"] == "added"].drop(columns="change")
+        df = pd.concat([df, added], ignore_index=True).drop_duplicates(keys, keep="last")
+        df = df.sort_values(by=["date", "title", "lang"], ascending=[True, True, True])
+        logging.info(f"Delta aplicado: +{len(added)} / -{len(removed)} enlaces")
+        return df.reset_index(drop=True)
+
+    def merge_links_to_csv(self, incremental: bool = False) -> Optional[pd.DataFrame]:
+        """
+        Paso 2: Carga los JSON de enlaces/títulos, los fusiona y guarda como CSV
+        y Parquet (all_links y pivot_links). Todo el procesado es vectorizado.
+        El pivot_links final SOLO contendrá los enlaces.
+
+        Con incremental=True, si ya existe all_links.parquet solo se aplican los
+        enlaces añadidos y eliminados (<lang>.delta.json) desde la última fusión.
+        Tras guardar la fusión se borran los deltas, que ya están incluidos en
+        ella, para no volver a aplicarlos.
+        """
+        logging.info("--- INICIANDO PASO 2: Fusionar Enlaces a CSV ---")
+        all_links_path = os.path.join(self.csv_dir, "all_links.csv")
+        all_links_parquet = all_links_path.replace(".csv", ".parquet")
+        delta_files = [path for _, _, path in self._links_files(".delta.json")]
+        delta = self._links_delta_frame()
+
+        if incremental and os.path.exists(all_links_parquet):
+            df = self._apply_links_delta(all_links_parquet, delta)
+        else:
+            frames = self._load_links_json()
+            if not frames:
+                logging.warning(
+                    "No se encontraron enlaces en JSON para fusionar. Saltando Paso 2."
+                )
+                return None
+            df = self._derive_link_columns(pd.concat(frames, ignore_index=True))
+
+        # Guardar el fusionado completo (all_links SÍ tendrá 'title_human')
         df.to_csv(all_links_path, index=False, encoding="utf-8")
-        logging.info(f"Guardado CSV fusionado en {all_links_path}")
+        df.to_parquet(all_links_parquet, index=False)
+        logging.info(f"Guardado CSV y Parquet fusionado en {all_links_path}")
 
-        # --- ¡CAMBIO CLAVE AQUÍ! ---
-        # Pivotar DataFrame
+        # Pivotar DataFrame: una fila por documento, una columna de enlace por idioma
         df_pivot = df.pivot_table(
             index=["pope", "type", "title", "date"],  # 'title' es el slug (común)
             columns="lang",
-            # Volvemos a poner 'link' como único valor
             values="link",
             aggfunc="first",
         ).reset_index()
+        df_pivot.columns.name = None
 
         # sort by date
         df_pivot = df_pivot.sort_values(by=["date", "title"], ascending=[True, True])
 
-        # Guardar CSV pivotado (ahora solo con enlaces)
+        # Guardar pivotado (ahora solo con enlaces)
         pivot_path = os.path.join(self.csv_dir, "pivot_links.csv")
         df_pivot.to_csv(pivot_path, index=False, encoding="utf-8")
-        logging.info(f"Guardado CSV pivotado (solo enlaces) en {pivot_path}")
+        df_pivot.to_parquet(pivot_path.replace(".csv", ".parquet"), index=False)
+        logging.info(f"Guardado CSV y Parquet pivotado (solo enlaces) en {pivot_path}")
+
+        delta_path = self._save_links_delta(delta)
+        logging.info(f"Guardado el delta ({len(delta)} cambios) en {delta_path}")
+        for path in delta_files:
+            os.remove(path)
 
         logging.info(f"Resumen: {len(df)} enlaces totales procesados.")
         logging.info("\nEnlaces por Papa:\n" + str(df.groupby("pope")["link"].count()))
@@ -410,34 +883,79 @@ class VaticanArchiver:
 
         return df
 
+    def _export_document(
+        self, pope: str, lang: str, title: str, html: str, save_markdown: bool
+    ) -> None:
+        """Escribe el documento (y su Markdown) en docs_dir/<pope>/<lang>/."""
+        folder = os.path.join(self.docs_dir, pope, lang)
+        os.makedirs(folder, exist_ok=True)
+        # El título de la URL ya es un nombre de archivo seguro
+        html_path = os.path.join(folder, f"{title}.html")
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        if save_markdown:
+            with open(os.path.join(folder, f"{title}.md"), "w", encoding="utf-8") as f:
+                f.write(md(html, heading_style="ATX"))
+
+    def _export_missing(self, df: pd.DataFrame, save_markdown: bool) -> None:
+        """
+        Exporta a docs_dir, desde el almacén y sin peticiones, los documentos ya
+        descargados que aún no están en la carpeta.
+        """
+        exported = 0
+        for row in df.itertuples(index=False):
+            html_path = os.path.join(
+                self.docs_dir, row.pope, row.lang, f"{row.title}.html"
+            )
+            if os.path.exists(html_path):
+                continue
+            content = self.store.get(row.link)
+            if content is not None:
+                html = content.decode("utf-8", errors="replace")
+                self._export_document(row.pope, row.lang, row.title, html, save_markdown)
+                exported += 1
+        if exported:
+            logging.info(f"{exported} documentos exportados a '{self.docs_dir}'.")
+
     def _download_single_html(
         self, url: str, pope: str, lang: str, title: str, save_markdown: bool = False
-    ) -> None:
-        """Descarga y guarda el contenido HTML de un documento final."""
+    ) -> bool:
+        """
+        Descarga un documento final y lo guarda en el almacén. Con
+        save_markdown, la versión Markdown se guarda como '<url>#markdown'.
+        Con docs_dir, también se exporta como archivo.
+        """
         try:
-            resp = self.session.get(url, timeout=15)
+            resp = get_con_reintentos(self.session, url, self.limiter, timeout=15)
             resp.raise_for_status()
             resp.encoding = "utf-8"  # Vaticano usa utf-8 para documentos
-            html = resp.text
 
-            folder = os.path.join(self.docs_dir, pope, lang)
-            os.makedirs(folder, exist_ok=True)
-
-            safe_title = title  # El título de la URL ya es un nombre de archivo seguro
-            html_path = os.path.join(folder, f"{safe_title}.html")
-
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(html)
-            logging.info(f"[OK] Guardado HTML: {html_path}")
+            sha256 = self.store.put(
+                url,
+                resp.content,
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+            )
+            logging.info(f"[OK] Guardado HTML: {pope}/{lang}/{title} ({sha256[:12]})")
+            self.ledger.record(
+                url,
+                "document",
+                "ok",
+                content=resp.content,
+                path=self.store.object_path(sha256),
+            )
 
             if save_markdown:
-                md_path = os.path.join(folder, f"{safe_title}.md")
-                with open(md_path, "w", encoding="utf-8") as f:
-                    f.write(md(html, heading_style="ATX"))
-                logging.info(f"[OK] Guardado Markdown: {md_path}")
+                markdown = md(resp.text, heading_style="ATX")
+                self.store.put(f"{url}#markdown", markdown.encode("utf-8"))
+            if self.docs_dir:
+                self._export_document(pope, lang, title, resp.text, save_markdown)
+            return True
 
         except Exception as e:
             logging.error(f"[ERROR] Descargando {url}: {e}")
+            self.ledger.record(url, "document", "error", error=str(e))
+            return False
 
     def download_documents(
         self,
@@ -477,20 +995,43 @@ class VaticanArchiver:
             )
             return
 
-        logging.info(f"Se descargarán {len(df_filtered)} documentos...")
-        for _, row in tqdm(
-            df_filtered.iterrows(),
-            total=df_filtered.shape[0],
-            desc="Descargando documentos",
-        ):
-            self._download_single_html(
-                row["link"],
-                row["pope"],
-                row["lang"],
-                row["title"],
-                save_markdown=save_markdown,
+        # Reanudar: saltar lo ya descargado (y no caducado) según el registro
+        pending = ~df_filtered["link"].map(
+            lambda url: self.ledger.is_done(
+                url, since=self._refresh_since(), max_age_days=self.stale_after_days
             )
-        logging.info("--- Descarga de documentos completada ---")
+        )
+        skipped = len(df_filtered) - int(pending.sum())
+        if skipped:
+            logging.info(f"{skipped} documentos ya descargados según el registro. Saltando.")
+            if self.docs_dir:
+                self._export_missing(df_filtered[~pending], save_markdown)
+        df_filtered = df_filtered[pending]
+
+        logging.info(
+            f"Se descargarán {len(df_filtered)} documentos con {self.max_workers} workers..."
+        )
+        errores = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self._download_single_html,
+                    row.link,
+                    row.pope,
+                    row.lang,
+                    row.title,
+                    save_markdown=save_markdown,
+                )
+                for row in df_filtered.itertuples(index=False)
+            ]
+            for future in tqdm(
+                as_completed(futures), total=len(futures), desc="Descargando documentos"
+            ):
+                if not future.result():
+                    errores += 1
+        logging.info(
+            f"--- Descarga de documentos completada ({errores} errores) ---"
+        )
 
     def run_full_archive(
         self,
@@ -499,17 +1040,21 @@ class VaticanArchiver:
         download: bool = False,
         download_filters: Optional[dict] = None,
         save_markdown: bool = False,
+        incremental: bool = False,
     ) -> None:
         """
         Ejecuta el pipeline completo: Encontrar, Fusionar y (opcionalmente) Descargar.
+        Con incremental=True la fusión solo aplica los cambios detectados.
         """
         logging.info("====== INICIANDO ARCHIVO COMPLETO DEL VATICANO ======")
+        # Si la ejecución anterior no terminó, se reanuda desde donde se quedó
+        self.run_started_at = self.ledger.start_run()
 
         # Paso 1: Encontrar y guardar enlaces
         self.find_and_save_links(pope_map, languages)
 
         # Paso 2: Fusionar enlaces a CSV
-        links_df = self.merge_links_to_csv()
+        links_df = self.merge_links_to_csv(incremental=incremental)
 
         # Paso 3: Descargar documentos (opcional)
         if download:
@@ -527,6 +1072,9 @@ class VaticanArchiver:
                     "No se pudo ejecutar el Paso 3 (Descarga) porque el Paso 2 (Fusión) falló."
                 )
 
+        self.ledger.finish_run()
+        self.ledger.compact()
+        logging.info(f"Registro de descargas: {self.ledger.summary()}")
         logging.info("====== ARCHIVO COMPLETO FINALIZADO ======")
 
 
@@ -563,8 +1111,12 @@ if __name__ == "__main__":
 
     # 2. Inicializar y ejecutar el archivador
 
-    # force_refresh=True volverá a descargar todos los índices
-    archiver = VaticanArchiver(force_refresh=True)
+    # Los índices se revalidan siempre; force_refresh=True volverá a descargar
+    # también los documentos
+    # docs_dir: carpeta de documentos que leen los benchmarks de iglesia
+    archiver = VaticanArchiver(
+        force_refresh=True, docs_dir="vatican-archiver/documents/vatican_html"
+    )
 
     # Ejecuta el pipeline completo:
     archiver.run_full_archive(
@@ -573,4 +1125,5 @@ if __name__ == "__main__":
         download=False,  # Cambia a True para descargar los HTML
         download_filters=DOWNLOAD_FILTERS,
         save_markdown=True,  # Opcional: guardar versión Markdown
+        incremental=True,  # Solo fusiona los enlaces añadidos/eliminados
     )
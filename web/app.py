@@ -9,8 +9,6 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 
-import markdown
-import yaml  # Necesitarás PyYAML: pip install PyYAML
 from dotenv import load_dotenv
 from flask import (
     Flask,
@@ -23,6 +21,8 @@ from flask import (
 )
 from flask_frozen import Freezer
 
+from resumenes import RepositorioResumenes
+
 load_dotenv()
 
 # ==========================================================================
@@ -58,96 +58,21 @@ def callback():
     return app.send_static_file("callback.html")
 
 
-def slugify(text):
-    """
-    Convierte un texto en un 'slug' amigable para URLs o IDs.
-    Ej: "Un Título Genial!" -> "un-titulo-genial"
-    """
-    text = text.lower()
-    text = re.sub(
-        r"[^a-z0-9]+", "-", text
-    )  # Reemplaza todo lo que no sea letra o número por un guion
-    return text.strip("-")
-
-
 # ==========================================================================
 # 3. LÓGICA DE CARGA DE DATOS
 # ==========================================================================
 
 
 def load_all_summaries():
-    all_summaries = []
-    if not os.path.exists(SUMMARIES_DIR):
-        print(f"ADVERTENCIA: El directorio de resúmenes no existe: {SUMMARIES_DIR}")
-        return []
-
-    for week_folder in os.listdir(SUMMARIES_DIR):
-        week_path = os.path.join(SUMMARIES_DIR, week_folder)
-        if os.path.isdir(week_path):
-            try:
-                # 1. Leer el resumen principal y su frontmatter YAML
-                main_summary_path = os.path.join(
-                    week_path, "resumen_semanal_igles-ia.txt"
-                )
-                metadata = {}
-                main_md_content = ""
-
-                if os.path.exists(main_summary_path):
-                    with open(main_summary_path, "r", encoding="utf-8") as f:
-                        content_full = f.read()
-                        # Separar el frontmatter (YAML) del contenido (Markdown)
-                        parts = content_full.split("---", 2)
-                        if len(parts) >= 3:
-                            metadata = yaml.safe_load(parts[1]) or {}
-                            main_md_content = parts[2].strip()
-                        else:  # Si no hay frontmatter, usar todo el archivo como contenido
-                            main_md_content = content_full.strip()
-
-                # 2. Crear el objeto de resumen usando los metadatos del frontmatter
-                week_date = datetime.strptime(week_folder, "%Y-%m-%d")
-                summary_obj = {
-                    "slug": week_folder,
-                    "date": week_date,
-                    "title": metadata.get("title", f"Resumen del {week_folder}"),
-                    "week_of": metadata.get(
-                        "week_of", f"Semana del {week_date.strftime('%d de %B de %Y')}"
-                    ),
-                    "pontificate_week": metadata.get("pontificate_week"),
-                    "excerpt": metadata.get("excerpt", "Leer más..."),
-                    "main_content": markdown.markdown(main_md_content),
-                    "documents": [],
-                }
-
-                # 3. Leer los archivos JSON de detalle (sin cambios) sorted_doc_files = sorted(os.listdir(week_path), reverse=True)
-
-                for doc_file in sorted(os.listdir(week_path), reverse=True):
-                    if doc_file.endswith(".json"):
-                        doc_path = os.path.join(week_path, doc_file)
-                        with open(doc_path, "r", encoding="utf-8") as f:
-                            doc_data = json.load(f)
-                            doc_title = doc_data.get("fuente_documento", doc_file)
-                            doc_data["doc_slug"] = f"{week_folder}-{slugify(doc_title)}"
-                            doc_data["resumen_general"] = markdown.markdown(
-                                doc_data.get("resumen_general", "")
-                            )
-                            doc_data["ideas_clave"] = [
-                                markdown.markdown(idea)
-                                for idea in doc_data.get("ideas_clave", [])
-                            ]
-                            summary_obj["documents"].append(doc_data)
-
-                all_summaries.append(summary_obj)
-            except Exception as e:
-                print(f"Error procesando la carpeta {week_folder}: {e}")
-
-    all_summaries.sort(key=lambda s: s["date"], reverse=True)
-    return all_summaries
+    """Todos los resúmenes, el más reciente primero (ver RepositorioResumenes)."""
+    return RESUMENES.todos()
 
 
 # ==========================================================================
-# 4. CARGA INICIAL DE DATOS (Se ejecuta una vez al iniciar el script)
+# 4. ÍNDICE DE RESÚMENES (al iniciar solo se listan las carpetas de semanas;
+#    cada semana se carga al pedirla, desde cache/resumenes si no ha cambiado)
 # ==========================================================================
-ALL_SUMMARIES = load_all_summaries()
+RESUMENES = RepositorioResumenes(SUMMARIES_DIR)
 
 
 # ==========================================================================
@@ -321,11 +246,12 @@ def inject_global_vars():
 @app.route("/")
 def index():
     """Página de inicio con contenido para engagement y retención."""
-    # ALL_SUMMARIES ya está cargada y ordenada (la más nueva primero)
-    latest_summary_data = ALL_SUMMARIES[0] if ALL_SUMMARIES else None
-    featured_quotes = extract_featured_quotes(ALL_SUMMARIES, limit=8)
-    timeline = get_recent_documents_timeline(ALL_SUMMARIES, weeks=2, max_docs=6)
-    docs_by_type = get_documents_by_type(ALL_SUMMARIES, weeks=3)
+    # Solo se cargan las semanas que usa la portada (la más nueva primero)
+    recent_summaries = RESUMENES.ultimos(4)
+    latest_summary_data = recent_summaries[0] if recent_summaries else None
+    featured_quotes = extract_featured_quotes(recent_summaries, limit=8)
+    timeline = get_recent_documents_timeline(recent_summaries, weeks=2, max_docs=6)
+    docs_by_type = get_documents_by_type(recent_summaries, weeks=3)
 
     return render_template(
         "index.html",
@@ -339,13 +265,13 @@ def index():
 @app.route("/resumenes.html")
 def archive():
     """Página del archivo histórico con la lista de todos los resúmenes."""
-    return render_template("archivo.html", summaries=ALL_SUMMARIES)
+    return render_template("archivo.html", summaries=RESUMENES.todos())
 
 
 @app.route("/resumen/<slug>.html")
 def summary_detail(slug):
     """Página de detalle para un resumen semanal específico."""
-    summary = next((s for s in ALL_SUMMARIES if s["slug"] == slug), None)
+    summary = RESUMENES.get(slug)
     if summary is None:
         abort(404)
     return render_template("resumen_individual.html", summary=summary)
@@ -354,9 +280,10 @@ def summary_detail(slug):
 @app.route("/resumen-semanal.html")
 def latest_summary():
     """Ruta de conveniencia que redirige al último resumen disponible."""
-    if not ALL_SUMMARIES:
+    latest = RESUMENES.ultimos(1)
+    if not latest:
         abort(404)
-    latest_slug = ALL_SUMMARIES[0]["slug"]
+    latest_slug = latest[0]["slug"]
     return redirect(url_for("summary_detail", slug=latest_slug))
 
 
@@ -426,7 +353,7 @@ def sitemap():
         pages.append(url_info)
 
     # Añadir URLs dinámicas de los resúmenes
-    for summary in ALL_SUMMARIES:
+    for summary in RESUMENES.todos():
         url_info = {
             "loc": url_for("summary_detail", slug=summary["slug"], _external=True),
             "lastmod": summary["date"].strftime("%Y-%m-%d"),
@@ -467,7 +394,7 @@ def redirects():
 @freezer.register_generator
 def summary_detail():
     """Indica a Flask-Frozen cómo generar una página estática por cada resumen."""
-    for summary in ALL_SUMMARIES:
+    for summary in RESUMENES.todos():
         yield {"slug": summary["slug"]}
 
 
@@ -0,0 +1,230 @@
+import json
+import locale
+import os
+import re
+import threading
+import time
+from datetime import date, datetime
+
+import markdown
+import yaml
+
+# Resúmenes ya procesados (YAML + markdown), un JSON por semana
+RESUMENES_CACHE_DIR = os.environ.get("RESUMENES_CACHE_DIR", "cache/resumenes")
+# Cambiar la versión al modificar el formato de los resúmenes invalida la caché
+VERSION_CACHE = "resumen-v1"
+FICHERO_RESUMEN = "resumen_semanal_igles-ia.txt"
+PATRON_SEMANA = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def slugify(text):
+    """
+    Convierte un texto en un 'slug' amigable para URLs o IDs.
+    Ej: "Un Título Genial!" -> "un-titulo-genial"
+    """
+    text = text.lower()
+    text = re.sub(
+        r"[^a-z0-9]+", "-", text
+    )  # Reemplaza todo lo que no sea letra o número por un guion
+    return text.strip("-")
+
+
+def _a_json(valor):
+    """Valores que json no serializa, como las fechas que YAML ya convierte."""
+    if isinstance(valor, date):  # también datetime
+        return valor.isoformat()
+    return str(valor)
+
+
+def firma_semana(week_path: str) -> dict:
+    """mtime y tamaño de los ficheros de los que se construye el resumen."""
+    firma = {}
+    with os.scandir(week_path) as entradas:
+        for entrada in entradas:
+            if entrada.name == FICHERO_RESUMEN or entrada.name.endswith(".json"):
+                info = entrada.stat()
+                firma[entrada.name] = [info.st_mtime_ns, info.st_size]
+    return firma
+
+
+def cargar_semana(week_path: str, week_folder: str) -> dict:
+    """Lee el resumen semanal y los JSON de sus documentos, ya en HTML."""
+    # 1. Leer el resumen principal y su frontmatter YAML
+    main_summary_path = os.path.join(week_path, FICHERO_RESUMEN)
+    metadata = {}
+    main_md_content = ""
+
+    if os.path.exists(main_summary_path):
+        with open(main_summary_path, "r", encoding="utf-8") as f:
+            content_full = f.read()
+            # Separar el frontmatter (YAML) del contenido (Markdown)
+            parts = content_full.split("---", 2)
+            if len(parts) >= 3:
+                metadata = yaml.safe_load(parts[1]) or {}
+                main_md_content = parts[2].strip()
+            else:  # Si no hay frontmatter, usar todo el archivo como contenido
+                main_md_content = content_full.strip()
+
+    # 2. Crear el objeto de resumen usando los metadatos del frontmatter
+    week_date = datetime.strptime(week_folder, "%Y-%m-%d")
+    summary_obj = {
+        "slug": week_folder,
+        "title": metadata.get("title", f"Resumen del {week_folder}"),
+        "week_of": metadata.get(
+            "week_of", f"Semana del {week_date.strftime('%d de %B de %Y')}"
+        ),
+        "pontificate_week": metadata.get("pontificate_week"),
+        "excerpt": metadata.get("excerpt", "Leer más..."),
+        "main_content": markdown.markdown(main_md_content),
+        "documents": [],
+    }
+
+    # 3. Leer los archivos JSON de detalle
+    for doc_file in sorted(os.listdir(week_path), reverse=True):
+        if doc_file.endswith(".json"):
+            doc_path = os.path.join(week_path, doc_file)
+            with open(doc_path, "r", encoding="utf-8") as f:
+                doc_data = json.load(f)
+                doc_title = doc_data.get("fuente_documento", doc_file)
+                doc_data["doc_slug"] = f"{week_folder}-{slugify(doc_title)}"
+                doc_data["resumen_general"] = markdown.markdown(
+                    doc_data.get("resumen_general", "")
+                )
+                doc_data["ideas_clave"] = [
+                    markdown.markdown(idea) for idea in doc_data.get("ideas_clave", [])
+                ]
+                summary_obj["documents"].append(doc_data)
+
+    return summary_obj
+
+
+class RepositorioResumenes:
+    """
+    Resúmenes semanales de la web indexados por slug (la carpeta de la
+    semana). Al crearlo solo se listan las carpetas; cada semana se carga la
+    primera vez que se pide y se guarda ya procesada en 'ruta_cache', que se
+    reutiliza mientras no cambie el mtime o el tamaño de sus ficheros.
+    """
+
+    def __init__(self, directorio: str, ruta_cache: str = RESUMENES_CACHE_DIR):
+        self.directorio = directorio
+        self.ruta_cache = ruta_cache
+        self._lock = threading.Lock()
+        # slug -> resumen (None hasta que se carga la semana)
+        self._indice = {}
+        self._cargados = set()
+        # El texto por defecto de 'week_of' depende del locale
+        self._version = f"{VERSION_CACHE}:{locale.setlocale(locale.LC_TIME)}"
+        if not directorio or not os.path.isdir(directorio):
+            print(f"ADVERTENCIA: El directorio de resúmenes no existe: {directorio}")
+            return
+        with os.scandir(directorio) as entradas:
+            semanas = [e.name for e in entradas if e.is_dir()]
+        slugs = sorted(filter(PATRON_SEMANA.match, semanas), reverse=True)
+        self._indice = dict.fromkeys(slugs)
+        self._cargados = set()
+
+    def slugs(self) -> list:
+        """Slugs de todas las semanas, la más reciente primero."""
+        return list(self._indice)
+
+    def __contains__(self, slug) -> bool:
+        return slug in self._indice
+
+    def __len__(self) -> int:
+        return len(self._indice)
+
+    def _ruta_cache(self, slug: str) -> str:
+        return os.path.join(self.ruta_cache, f"{slug}.json")
+
+    def _leer_cache(self, slug: str, firma: dict):
+        if not self.ruta_cache:
+            return None
+        try:
+            with open(self._ruta_cache(slug), encoding="utf-8") as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entrada.get("version") != self._version or entrada.get("firma") != firma:
+            return None
+        return entrada["resumen"]
+
+    def _guardar_cache(self, slug: str, firma: dict, resumen: dict):
+        """Guarda la semana procesada. Un fallo se avisa pero no la descarta."""
+        if not self.ruta_cache:
+            return
+        ruta = self._ruta_cache(slug)
+        tmp = ruta + ".tmp"
+        entrada = {"version": self._version, "firma": firma, "resumen": resumen}
+        try:
+            os.makedirs(self.ruta_cache, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entrada, f, ensure_ascii=False, default=_a_json)
+            os.replace(tmp, ruta)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️  ADVERTENCIA: No se pudo guardar la caché de {slug}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _cargar(self, slug: str):
+        week_path = os.path.join(self.directorio, slug)
+        try:
+            firma = firma_semana(week_path)
+            resumen = self._leer_cache(slug, firma)
+            if resumen is None:
+                resumen = cargar_semana(week_path, slug)
+                self._guardar_cache(slug, firma, resumen)
+        except Exception as e:
+            print(f"Error procesando la carpeta {slug}: {e}")
+            return None
+        resumen["date"] = datetime.strptime(slug, "%Y-%m-%d")
+        return resumen
+
+    def get(self, slug: str):
+        """Resumen de la semana 'slug' (None si no existe o no se pudo leer)."""
+        if slug not in self._indice:
+            return None
+        with self._lock:
+            if slug not in self._cargados:
+                self._indice[slug] = self._cargar(slug)
+                self._cargados.add(slug)
+            return self._indice[slug]
+
+    def ultimos(self, n: int = None) -> list:
+        """Los 'n' resúmenes más recientes (todos si n es None)."""
+        resumenes = []
+        for slug in list(self._indice):
+            if n is not None and len(resumenes) >= n:
+                break
+            resumen = self.get(slug)
+            if resumen is not None:
+                resumenes.append(resumen)
+        return resumenes
+
+    def todos(self) -> list:
+        return self.ultimos()
+
+
+if __name__ == "__main__":
+    # Benchmark: carga completa sin caché y con caché, y arranque + una semana
+    import tempfile
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    directorio = os.environ.get("SUMMARIES_FOLDER")
+    with tempfile.TemporaryDirectory() as tmp:
+        for etiqueta, repositorio in [
+            ("sin caché", RepositorioResumenes(directorio, tmp)),
+            ("caché en disco", RepositorioResumenes(directorio, tmp)),
+        ]:
+            inicio = time.perf_counter()
+            resumenes = repositorio.todos()
+            print(
+                f"{etiqueta}: {len(resumenes)} semanas en "
+                f"{(time.perf_counter() - inicio) * 1000:.0f} ms"
+            )
+        inicio = time.perf_counter()
+        repositorio = RepositorioResumenes(directorio, tmp)
+        repositorio.get(repositorio.slugs()[-1])
+        print(f"arranque + una semana: {(time.perf_counter() - inicio) * 1000:.1f} ms")